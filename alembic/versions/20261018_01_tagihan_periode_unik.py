@@ -0,0 +1,77 @@
+"""Unik tagihan SPP per siswa dan periode
+
+Revision ID: 20261018_01
+Revises: 20241007_06
+Create Date: 2026-10-18 08:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_01"
+down_revision = "20241007_06"
+branch_labels = None
+depends_on = None
+
+
+# Tagihan SPP ganda yang belum punya pembayaran dihapus; dari setiap kelompok
+# disisakan tagihan yang sudah dibayar, atau yang paling awal dibuat.
+HAPUS_DUPLIKAT_SPP = """
+    WITH peringkat AS (
+        SELECT
+            t.id,
+            row_number() OVER (
+                PARTITION BY t.sekolah_id, t.siswa_id, t.periode_bulan, t.periode_tahun
+                ORDER BY
+                    EXISTS (SELECT 1 FROM pembayaran p WHERE p.tagihan_id = t.id) DESC,
+                    t.jumlah_terbayar DESC,
+                    t.dibuat_pada,
+                    t.id
+            ) AS urutan
+        FROM tagihan t
+        WHERE t.jenis_tagihan = 'spp'
+          AND t.periode_bulan IS NOT NULL
+          AND t.periode_tahun IS NOT NULL
+    )
+    DELETE FROM tagihan t
+    USING peringkat r
+    WHERE t.id = r.id
+      AND r.urutan > 1
+      AND NOT EXISTS (SELECT 1 FROM pembayaran p WHERE p.tagihan_id = t.id)
+"""
+
+
+def upgrade() -> None:
+    op.execute(HAPUS_DUPLIKAT_SPP)
+    sisa = op.get_bind().execute(
+        sa.text(
+            """
+            SELECT count(*) FROM (
+                SELECT 1 FROM tagihan
+                WHERE jenis_tagihan = 'spp'
+                GROUP BY sekolah_id, siswa_id, periode_bulan, periode_tahun
+                HAVING count(*) > 1
+                   AND periode_bulan IS NOT NULL
+                   AND periode_tahun IS NOT NULL
+            ) ganda
+            """
+        )
+    ).scalar_one()
+    if sisa:
+        raise RuntimeError(
+            f"{sisa} kelompok tagihan SPP ganda memiliki lebih dari satu tagihan "
+            "yang sudah dibayar; gabungkan pembayarannya secara manual lalu "
+            "jalankan ulang migrasi."
+        )
+    op.create_index(
+        "uq_tagihan_periode",
+        "tagihan",
+        ["sekolah_id", "siswa_id", "periode_bulan", "periode_tahun"],
+        unique=True,
+        postgresql_where=sa.text("jenis_tagihan = 'spp'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_tagihan_periode", table_name="tagihan")
@@ -0,0 +1,52 @@
+"""Tambah tabel job generate tagihan SPP
+
+Revision ID: 20261018_02
+Revises: 20261018_01
+Create Date: 2026-10-18 09:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_02"
+down_revision = "20261018_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    status_job = sa.Enum(
+        "menunggu", "berjalan", "selesai", "gagal", name="statusjob", native_enum=False
+    )
+
+    op.create_table(
+        "job_tagihan_spp",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("sekolah_id", sa.String(), nullable=False),
+        sa.Column("dibuat_oleh_id", sa.String(), nullable=True),
+        sa.Column("status", status_job, nullable=False),
+        sa.Column("parameter", sa.JSON(), nullable=False),
+        sa.Column("total_target", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("jumlah_diproses", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("jumlah_dibuat", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("jumlah_dilewati", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("pesan_error", sa.Text(), nullable=True),
+        sa.Column("dibuat_pada", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("dimulai_pada", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("selesai_pada", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["sekolah_id"], ["sekolah.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["dibuat_oleh_id"], ["pengguna.id"], ondelete="SET NULL"),
+    )
+
+    op.create_index(
+        "ix_job_tagihan_spp_sekolah_id",
+        "job_tagihan_spp",
+        ["sekolah_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_tagihan_spp_sekolah_id", table_name="job_tagihan_spp")
+    op.drop_table("job_tagihan_spp")
@@ -0,0 +1,29 @@
+"""Index parsial tagihan terbuka per jatuh tempo
+
+Revision ID: 20261018_03
+Revises: 20261018_02
+Create Date: 2026-10-18 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_03"
+down_revision = "20261018_02"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_tagihan_jatuh_tempo_terbuka",
+        "tagihan",
+        ["sekolah_id", "tanggal_jatuh_tempo"],
+        unique=False,
+        postgresql_where=sa.text("status_tagihan IN ('belum_dibayar', 'sebagian')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tagihan_jatuh_tempo_terbuka", table_name="tagihan")
@@ -0,0 +1,26 @@
+"""Tambah versi token pada pengguna
+
+Revision ID: 20261018_04
+Revises: 20261018_03
+Create Date: 2026-10-18 11:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_04"
+down_revision = "20261018_03"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "pengguna",
+        sa.Column("versi_token", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("pengguna", "versi_token")
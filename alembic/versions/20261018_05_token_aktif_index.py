@@ -0,0 +1,38 @@
+"""Index parsial token yang masih aktif
+
+Revision ID: 20261018_05
+Revises: 20261018_04
+Create Date: 2026-10-18 12:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_05"
+down_revision = "20261018_04"
+branch_labels = None
+depends_on = None
+
+
+_INDEX = [
+    ("ix_token_verifikasi_email_aktif", "token_verifikasi_email", "digunakan IS false"),
+    ("ix_token_reset_password_aktif", "token_reset_password", "digunakan IS false"),
+    ("ix_refresh_token_aktif", "refresh_token", "dicabut IS false"),
+]
+
+
+def upgrade() -> None:
+    for nama, tabel, kondisi in _INDEX:
+        op.create_index(
+            nama,
+            tabel,
+            ["token"],
+            unique=False,
+            postgresql_where=sa.text(kondisi),
+        )
+
+
+def downgrade() -> None:
+    for nama, tabel, _ in reversed(_INDEX):
+        op.drop_index(nama, table_name=tabel)
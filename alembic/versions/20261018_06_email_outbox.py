@@ -0,0 +1,50 @@
+"""Tambah tabel outbox email
+
+Revision ID: 20261018_06
+Revises: 20261018_05
+Create Date: 2026-10-18 13:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_06"
+down_revision = "20261018_05"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    status_email = sa.Enum(
+        "menunggu", "mengirim", "terkirim", "gagal", name="statusemail", native_enum=False
+    )
+
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("tujuan", sa.String(length=255), nullable=False),
+        sa.Column("subjek", sa.String(length=255), nullable=False),
+        sa.Column("isi_html", sa.Text(), nullable=False),
+        sa.Column("pengirim_email", sa.String(length=255), nullable=True),
+        sa.Column("pengirim_nama", sa.String(length=150), nullable=True),
+        sa.Column("status", status_email, nullable=False),
+        sa.Column("jumlah_percobaan", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("jadwal_kirim", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("pesan_error", sa.Text(), nullable=True),
+        sa.Column("dibuat_pada", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("terkirim_pada", sa.DateTime(timezone=True), nullable=True),
+    )
+
+    op.create_index(
+        "ix_email_outbox_antrean",
+        "email_outbox",
+        ["jadwal_kirim"],
+        unique=False,
+        postgresql_where=sa.text("status IN ('menunggu', 'mengirim')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_email_outbox_antrean", table_name="email_outbox")
+    op.drop_table("email_outbox")
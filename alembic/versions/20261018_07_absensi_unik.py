@@ -0,0 +1,48 @@
+"""Unik absensi per siswa, tanggal, dan mata pelajaran
+
+Revision ID: 20261018_07
+Revises: 20261018_06
+Create Date: 2026-10-18 15:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_07"
+down_revision = "20261018_06"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Buang duplikat lama, sisakan baris yang dicatat paling akhir.
+    op.execute(
+        """
+        DELETE FROM absensi_siswa a
+        USING absensi_siswa b
+        WHERE a.siswa_id = b.siswa_id
+          AND a.tanggal = b.tanggal
+          AND a.mata_pelajaran_id IS NOT DISTINCT FROM b.mata_pelajaran_id
+          AND (a.dibuat_pada, a.id) < (b.dibuat_pada, b.id)
+        """
+    )
+    op.create_index(
+        "uq_absensi_siswa_mapel",
+        "absensi_siswa",
+        ["siswa_id", "tanggal", "mata_pelajaran_id"],
+        unique=True,
+        postgresql_where=sa.text("mata_pelajaran_id IS NOT NULL"),
+    )
+    op.create_index(
+        "uq_absensi_siswa_harian",
+        "absensi_siswa",
+        ["siswa_id", "tanggal"],
+        unique=True,
+        postgresql_where=sa.text("mata_pelajaran_id IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_absensi_siswa_harian", table_name="absensi_siswa")
+    op.drop_index("uq_absensi_siswa_mapel", table_name="absensi_siswa")
@@ -0,0 +1,35 @@
+"""Ganti constraint unik tagihan menjadi index unik parsial khusus SPP
+
+Database yang sudah menjalankan versi awal 20261018_01 masih memiliki
+constraint ``uq_tagihan_periode`` untuk semua jenis tagihan; revisi ini
+menggantinya dengan index parsial. Pada database yang sudah memakai index
+parsial revisi ini tidak mengubah apa pun.
+
+Revision ID: 20261018_08
+Revises: 20261018_07
+Create Date: 2026-10-18 16:00:00.000000
+"""
+
+from alembic import op
+
+
+revision = "20261018_08"
+down_revision = "20261018_07"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Constraint lama mencakup jenis_tagihan sehingga tidak mungkin ada SPP
+    # ganda; tidak perlu langkah pembersihan di sini.
+    op.execute("ALTER TABLE tagihan DROP CONSTRAINT IF EXISTS uq_tagihan_periode")
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_tagihan_periode "
+        "ON tagihan (sekolah_id, siswa_id, periode_bulan, periode_tahun) "
+        "WHERE jenis_tagihan = 'spp'"
+    )
+
+
+def downgrade() -> None:
+    # Index parsial tetap dipakai; dihapus oleh downgrade 20261018_01.
+    pass
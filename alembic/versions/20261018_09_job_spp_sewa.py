@@ -0,0 +1,35 @@
+"""Tambah sewa dan checkpoint pada job tagihan SPP
+
+Revision ID: 20261018_09
+Revises: 20261018_08
+Create Date: 2026-10-18 16:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_09"
+down_revision = "20261018_08"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "job_tagihan_spp",
+        sa.Column("sewa_sampai", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.add_column("job_tagihan_spp", sa.Column("checkpoint", sa.JSON(), nullable=True))
+    op.create_index(
+        "ix_job_tagihan_spp_belum_selesai",
+        "job_tagihan_spp",
+        ["status"],
+        postgresql_where=sa.text("status IN ('menunggu', 'berjalan')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_tagihan_spp_belum_selesai", table_name="job_tagihan_spp")
+    op.drop_column("job_tagihan_spp", "checkpoint")
+    op.drop_column("job_tagihan_spp", "sewa_sampai")
@@ -0,0 +1,38 @@
+"""Tambah tabel generasi cache laporan
+
+Revision ID: 20261018_10
+Revises: 20261018_09
+Create Date: 2026-10-18 17:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_10"
+down_revision = "20261018_09"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "generasi_laporan",
+        sa.Column(
+            "sekolah_id",
+            sa.String(),
+            sa.ForeignKey("sekolah.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("generasi", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column(
+            "diubah_pada",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("generasi_laporan")
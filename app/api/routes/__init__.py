@@ -17,6 +17,7 @@ from . import (
     pendaftaran,
     catatan,
     kenaikan,
+    diagnostik,
 )
 
 
@@ -37,3 +38,4 @@ api_router.include_router(website.router)
 api_router.include_router(pendaftaran.router)
 api_router.include_router(catatan.router)
 api_router.include_router(kenaikan.router)
+api_router.include_router(diagnostik.router)
@@ -1,15 +1,33 @@
-from datetime import date
+import uuid
+from datetime import date, datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, selectinload
-from app.core.deps import get_db, require_peran
+from app.core.deps import (
+    get_async_db,
+    get_db,
+    require_peran,
+    require_peran_klaim,
+    require_peran_klaim_async,
+)
+from app.core.principal import KlaimToken
 from app.models import Pengguna, PeranPengguna
 from app.models.akademik import AbsensiSiswa, Kelas
-from app.models.siswa import Siswa
+from app.models.siswa import Siswa, SiswaKelas, StatusKeanggotaanKelas
 from app.models.mata_pelajaran import MataPelajaran
 from app.models.guru import Guru
-from app.schemas.absensi import AbsensiCreate, AbsensiDetail
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.absensi import (
+    AbsensiBulkCreate,
+    AbsensiBulkDicatat,
+    AbsensiBulkGagal,
+    AbsensiBulkHasil,
+    AbsensiCreate,
+    AbsensiDetail,
+)
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_keyset_async
 from app.core.responses import EnvelopeAPIRoute
 
 
@@ -18,12 +36,75 @@ router = APIRouter(
 )
 
 
-def _get_sekolah_id(pengguna: Pengguna) -> str:
+def _get_sekolah_id(pengguna: Pengguna | KlaimToken) -> str:
     if pengguna.sekolah_id is None:
         raise HTTPException(status_code=400, detail="Pengguna tidak terhubung ke sekolah")
     return pengguna.sekolah_id
 
 
+# Kolom yang ditimpa saat absensi siswa/tanggal/mata pelajaran sudah ada.
+_KOLOM_UPSERT = ("kelas_id", "status_kehadiran", "keterangan", "dicatat_oleh_id")
+
+
+def _upsert_absensi(baris: list[dict], mata_pelajaran_id: str | None):
+    """INSERT ... ON CONFLICT DO UPDATE absensi untuk satu mata pelajaran
+    (atau absensi harian bila ``mata_pelajaran_id`` kosong).
+
+    Target konflik adalah index unik parsial yang sesuai. Baris yang isinya
+    sama persis tidak ditulis ulang, sehingga request yang diulang tidak
+    menambah versi baris; baris seperti itu tidak ikut dikembalikan RETURNING.
+    """
+    tabel = AbsensiSiswa.__table__
+    statement = pg_insert(tabel).values(baris)
+    if mata_pelajaran_id is None:
+        index_elements = [tabel.c.siswa_id, tabel.c.tanggal]
+        index_where = tabel.c.mata_pelajaran_id.is_(None)
+    else:
+        index_elements = [tabel.c.siswa_id, tabel.c.tanggal, tabel.c.mata_pelajaran_id]
+        index_where = tabel.c.mata_pelajaran_id.is_not(None)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        index_where=index_where,
+        set_={kolom: statement.excluded[kolom] for kolom in _KOLOM_UPSERT},
+        where=or_(
+            *(
+                tabel.c[kolom].is_distinct_from(statement.excluded[kolom])
+                for kolom in _KOLOM_UPSERT
+            )
+        ),
+    ).returning(tabel.c.siswa_id, tabel.c.id)
+
+
+def _simpan_absensi(
+    db: Session, baris: list[dict], tanggal: date, mata_pelajaran_id: str | None
+) -> dict[str, str]:
+    """Upsert ``baris`` dan kembalikan ``{siswa_id: absensi_id}`` semuanya,
+    termasuk baris yang sudah ada dengan isi sama."""
+    hasil = dict(db.execute(_upsert_absensi(baris, mata_pelajaran_id)).all())
+    tidak_berubah = [item["siswa_id"] for item in baris if item["siswa_id"] not in hasil]
+    if tidak_berubah:
+        hasil.update(
+            db.execute(
+                select(AbsensiSiswa.siswa_id, AbsensiSiswa.id).where(
+                    AbsensiSiswa.siswa_id.in_(tidak_berubah),
+                    AbsensiSiswa.tanggal == tanggal,
+                    AbsensiSiswa.mata_pelajaran_id.is_not_distinct_from(
+                        mata_pelajaran_id
+                    ),
+                )
+            ).all()
+        )
+    return hasil
+
+
+def _guru_pencatat(pengguna: Pengguna) -> str | None:
+    if pengguna.peran != PeranPengguna.guru:
+        return None
+    if pengguna.guru is None:
+        raise HTTPException(status_code=403, detail="Data guru belum lengkap")
+    return pengguna.guru.id
+
+
 @router.post("", response_model=AbsensiDetail, status_code=status.HTTP_201_CREATED)
 def catat_absensi(
     payload: AbsensiCreate,
@@ -64,76 +145,189 @@ def catat_absensi(
         if mapel is None:
             raise HTTPException(status_code=404, detail="Mata pelajaran tidak ditemukan")
 
-    dicatat_oleh_id = None
-    if pengguna.peran == PeranPengguna.guru:
-        if pengguna.guru is None:
-            raise HTTPException(status_code=403, detail="Data guru belum lengkap")
-        dicatat_oleh_id = pengguna.guru.id
-
-    absensi = AbsensiSiswa(
-        sekolah_id=sekolah_id,
-        siswa_id=siswa.id,
-        kelas_id=kelas_id,
-        mata_pelajaran_id=mata_pelajaran_id,
-        tanggal=payload.tanggal,
-        status_kehadiran=payload.status_kehadiran,
-        keterangan=payload.keterangan,
-        dicatat_oleh_id=dicatat_oleh_id,
+    dicatat_oleh_id = _guru_pencatat(pengguna)
+
+    # Upsert agar request yang diulang (mis. jaringan seluler putus) tidak
+    # membuat absensi ganda untuk siswa, tanggal, dan mata pelajaran yang sama.
+    tersimpan = _simpan_absensi(
+        db,
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "sekolah_id": sekolah_id,
+                "siswa_id": siswa.id,
+                "kelas_id": kelas_id,
+                "mata_pelajaran_id": mata_pelajaran_id,
+                "tanggal": payload.tanggal,
+                "status_kehadiran": payload.status_kehadiran,
+                "keterangan": payload.keterangan,
+                "dicatat_oleh_id": dicatat_oleh_id,
+                "dibuat_pada": datetime.now(timezone.utc),
+            }
+        ],
+        payload.tanggal,
+        mata_pelajaran_id,
     )
-    db.add(absensi)
     db.commit()
-    db.refresh(absensi)
-    return absensi
+    return db.get(AbsensiSiswa, tersimpan[siswa.id])
+
+
+@router.post(
+    "/bulk", response_model=AbsensiBulkHasil, status_code=status.HTTP_201_CREATED
+)
+def catat_absensi_bulk(
+    payload: AbsensiBulkCreate,
+    db: Session = Depends(get_db),
+    pengguna: Pengguna = Depends(
+        require_peran(PeranPengguna.admin_sekolah, PeranPengguna.guru)
+    ),
+) -> AbsensiBulkHasil:
+    """Catat absensi satu kelas untuk satu tanggal (dan mata pelajaran).
+
+    Keanggotaan seluruh siswa divalidasi terhadap ``SiswaKelas`` dalam satu
+    query dan baris yang valid disimpan dengan satu INSERT ... ON CONFLICT DO
+    UPDATE multi-baris, sehingga mengirim ulang absensi kelas yang sama hanya
+    memperbarui statusnya. Baris yang tidak valid dilaporkan di ``gagal``
+    tanpa membatalkan baris lain.
+    """
+    sekolah_id = _get_sekolah_id(pengguna)
+    dicatat_oleh_id = _guru_pencatat(pengguna)
+
+    kelas_ada = db.execute(
+        select(Kelas.id).where(
+            Kelas.id == payload.kelas_id, Kelas.sekolah_id == sekolah_id
+        )
+    ).first()
+    if kelas_ada is None:
+        raise HTTPException(status_code=404, detail="Kelas tidak ditemukan")
+    if payload.mata_pelajaran_id:
+        mapel_ada = db.execute(
+            select(MataPelajaran.id).where(
+                MataPelajaran.id == payload.mata_pelajaran_id,
+                MataPelajaran.sekolah_id == sekolah_id,
+            )
+        ).first()
+        if mapel_ada is None:
+            raise HTTPException(status_code=404, detail="Mata pelajaran tidak ditemukan")
+
+    anggota = set(
+        db.execute(
+            select(SiswaKelas.siswa_id).where(
+                SiswaKelas.kelas_id == payload.kelas_id,
+                SiswaKelas.status_keanggotaan == StatusKeanggotaanKelas.aktif,
+                SiswaKelas.siswa_id.in_({item.siswa_id for item in payload.absensi}),
+            )
+        ).scalars()
+    )
+
+    now = datetime.now(timezone.utc)
+    baris: list[dict] = []
+    gagal: list[AbsensiBulkGagal] = []
+    terlihat: set[str] = set()
+    for indeks, item in enumerate(payload.absensi):
+        if item.siswa_id in terlihat:
+            pesan = "Siswa tercantum lebih dari sekali"
+        elif item.siswa_id not in anggota:
+            pesan = "Siswa bukan anggota aktif kelas ini"
+        else:
+            pesan = None
+        terlihat.add(item.siswa_id)
+        if pesan:
+            gagal.append(
+                AbsensiBulkGagal(indeks=indeks, siswa_id=item.siswa_id, pesan=pesan)
+            )
+            continue
+        baris.append(
+            {
+                "id": str(uuid.uuid4()),
+                "sekolah_id": sekolah_id,
+                "siswa_id": item.siswa_id,
+                "kelas_id": payload.kelas_id,
+                "mata_pelajaran_id": payload.mata_pelajaran_id,
+                "tanggal": payload.tanggal,
+                "status_kehadiran": item.status_kehadiran,
+                "keterangan": item.keterangan,
+                "dicatat_oleh_id": dicatat_oleh_id,
+                "dibuat_pada": now,
+            }
+        )
+
+    dicatat: list[AbsensiBulkDicatat] = []
+    if baris:
+        tersimpan = _simpan_absensi(
+            db, baris, payload.tanggal, payload.mata_pelajaran_id
+        )
+        db.commit()
+        dicatat = [
+            AbsensiBulkDicatat(
+                siswa_id=item["siswa_id"], absensi_id=tersimpan[item["siswa_id"]]
+            )
+            for item in baris
+        ]
+
+    return AbsensiBulkHasil(
+        kelas_id=payload.kelas_id,
+        tanggal=payload.tanggal,
+        mata_pelajaran_id=payload.mata_pelajaran_id,
+        jumlah_dicatat=len(dicatat),
+        jumlah_gagal=len(gagal),
+        dicatat=dicatat,
+        gagal=gagal,
+    )
 
 
 @router.get("", response_model=PaginatedResponse[AbsensiDetail])
-def daftar_absensi(
+async def daftar_absensi(
     tanggal: date | None = Query(default=None),
     siswa_id: str | None = Query(default=None),
     kelas_id: str | None = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    db: Session = Depends(get_db),
-    pengguna: Pengguna = Depends(
-        require_peran(PeranPengguna.admin_sekolah, PeranPengguna.guru)
+    cursor: str | None = Query(default=None),
+    mode_total: ModeTotal | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_db),
+    klaim: KlaimToken = Depends(
+        require_peran_klaim_async(PeranPengguna.admin_sekolah, PeranPengguna.guru)
     ),
 ) -> PaginatedResponse[AbsensiDetail]:
-    sekolah_id = _get_sekolah_id(pengguna)
+    sekolah_id = _get_sekolah_id(klaim)
     query = (
-        db.query(AbsensiSiswa)
+        select(AbsensiSiswa)
         .options(
             selectinload(AbsensiSiswa.siswa),
             selectinload(AbsensiSiswa.kelas),
             selectinload(AbsensiSiswa.mata_pelajaran),
             selectinload(AbsensiSiswa.dicatat_oleh).selectinload(Guru.pengguna),
         )
-        .filter(AbsensiSiswa.sekolah_id == sekolah_id)
+        .where(AbsensiSiswa.sekolah_id == sekolah_id)
     )
     if tanggal:
-        query = query.filter(AbsensiSiswa.tanggal == tanggal)
+        query = query.where(AbsensiSiswa.tanggal == tanggal)
     if siswa_id:
-        query = query.filter(AbsensiSiswa.siswa_id == siswa_id)
+        query = query.where(AbsensiSiswa.siswa_id == siswa_id)
     if kelas_id:
-        query = query.filter(AbsensiSiswa.kelas_id == kelas_id)
-    query = query.order_by(AbsensiSiswa.tanggal.desc())
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[AbsensiDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+        query = query.where(AbsensiSiswa.kelas_id == kelas_id)
+    items, meta = await paginate_keyset_async(
+        db,
+        query,
+        page,
+        limit,
+        sort_column=AbsensiSiswa.tanggal,
+        id_column=AbsensiSiswa.id,
+        descending=True,
+        cursor=cursor,
+        mode_total=mode_total or ModeTotal.cached,
+        tenant=sekolah_id,
     )
+    return PaginatedResponse[AbsensiDetail](items=items, meta=meta)
 
 
 @router.get("/{absensi_id}", response_model=AbsensiDetail)
 def detail_absensi(
     absensi_id: str,
     db: Session = Depends(get_db),
-    pengguna: Pengguna = Depends(
-        require_peran(PeranPengguna.admin_sekolah, PeranPengguna.guru)
+    klaim: KlaimToken = Depends(
+        require_peran_klaim(PeranPengguna.admin_sekolah, PeranPengguna.guru)
     ),
 ) -> AbsensiSiswa:
     absensi = (
@@ -146,7 +340,7 @@ def detail_absensi(
         )
         .filter(
             AbsensiSiswa.id == absensi_id,
-            AbsensiSiswa.sekolah_id == _get_sekolah_id(pengguna),
+            AbsensiSiswa.sekolah_id == _get_sekolah_id(klaim),
         )
         .first()
     )
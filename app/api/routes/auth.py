@@ -2,15 +2,17 @@ import logging
 import uuid
 import secrets
 from datetime import datetime, timedelta, timezone
+from typing import Awaitable, TypeVar
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
-from app.core.deps import get_db, get_pengguna_aktif
+from starlette.concurrency import run_in_threadpool
+from app.core.deps import get_db, get_pengguna_aktif_async
+from app.core.principal import klaim_akses
 from app.core.config import settings
-from app.core.security import (
-    buat_hash_kata_sandi,
-    verifikasi_kata_sandi,
-    buat_token_akses,
-)
+from app.core.kdf import KDFSibuk, kdf_pool
+from app.core.klien import ip_klien
+from app.core.security import buat_token_akses
+from app.core.throttle import batasi
 from app.models import (
     Pengguna,
     Sekolah,
@@ -32,32 +34,56 @@ from app.schemas.auth import (
 )
 from app.schemas.common import PesanResponse
 from app.models.sekolah import StatusSekolah
-from app.utils.email import send_email
+from app.utils.email import antrekan_email
 from app.core.responses import EnvelopeAPIRoute
 
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 router = APIRouter(prefix="/auth", tags=["Autentikasi"], route_class=EnvelopeAPIRoute)
 
 
+def _cari_pengguna_email(db: Session, email: str) -> Pengguna | None:
+    return db.query(Pengguna).filter(Pengguna.email == email).first()
+
+
+async def _jalankan_kdf(pekerjaan: Awaitable[T]) -> T:
+    """Tunggu hashing di ``kdf_pool`` dan terjemahkan kegagalannya ke HTTP."""
+    try:
+        return await pekerjaan
+    except KDFSibuk as exc:
+        raise HTTPException(
+            status_code=503,
+            detail="Server sedang sibuk, silakan coba beberapa saat lagi",
+            headers={"Retry-After": "1"},
+        ) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
 @router.post(
     "/register-admin",
     status_code=status.HTTP_201_CREATED,
     response_model=ResponRegistrasiAdmin,
 )
-def register_admin_sekolah(
+async def register_admin_sekolah(
     payload: RegistrasiAdminSekolah, db: Session = Depends(get_db)
 ) -> ResponRegistrasiAdmin:
-    if (
-        db.query(Pengguna)
-        .filter(Pengguna.email == payload.email)
-        .first()
-        is not None
-    ):
+    if await run_in_threadpool(_cari_pengguna_email, db, payload.email) is not None:
         raise HTTPException(status_code=400, detail="Email sudah terdaftar")
 
+    kata_sandi_hash = await _jalankan_kdf(kdf_pool.hash(payload.kata_sandi))
+    return await run_in_threadpool(
+        _simpan_registrasi_admin, db, payload, kata_sandi_hash
+    )
+
+
+def _simpan_registrasi_admin(
+    db: Session, payload: RegistrasiAdminSekolah, kata_sandi_hash: str
+) -> ResponRegistrasiAdmin:
     sekolah = Sekolah(
         nama_sekolah=payload.nama_sekolah,
         jenjang=payload.jenjang,
@@ -72,11 +98,6 @@ def register_admin_sekolah(
         status_verifikasi=False,
     )
 
-    try:
-        kata_sandi_hash = buat_hash_kata_sandi(payload.kata_sandi)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
-
     pengguna = Pengguna(
         nama_lengkap=payload.nama_lengkap,
         email=payload.email,
@@ -93,34 +114,28 @@ def register_admin_sekolah(
         kedaluwarsa=datetime.now(timezone.utc) + timedelta(hours=24),
     )
 
+    verification_link = f"{settings.base_url}/auth/verify-email?token={token.token}"
+    email_content = f"""
+        <p>Halo {payload.nama_lengkap},</p>
+        <p>Terima kasih telah mendaftar sebagai admin sekolah pada <strong>{settings.app_nama}</strong>.</p>
+        <p>Silakan verifikasi email Anda dengan mengunjungi tautan berikut:</p>
+        <p><a href="{verification_link}">{verification_link}</a></p>
+        <p>Atau gunakan token berikut melalui aplikasi:</p>
+        <p><code>{token.token}</code></p>
+        <p>Salam hangat,<br />Tim {settings.app_nama}</p>
+    """
+    antrekan_email(
+        db,
+        to_email=payload.email,
+        subject="Verifikasi Email Admin Sekolah",
+        html_content=email_content,
+    )
+
     db.add_all([sekolah, pengguna, token])
     db.commit()
     db.refresh(pengguna)
     db.refresh(sekolah)
 
-    try:
-        verification_link = (
-            f"{settings.base_url}/auth/verify-email?token={token.token}"
-        )
-        email_content = f"""
-            <p>Halo {payload.nama_lengkap},</p>
-            <p>Terima kasih telah mendaftar sebagai admin sekolah pada <strong>{settings.app_nama}</strong>.</p>
-            <p>Silakan verifikasi email Anda dengan mengunjungi tautan berikut:</p>
-            <p><a href="{verification_link}">{verification_link}</a></p>
-            <p>Atau gunakan token berikut melalui aplikasi:</p>
-            <p><code>{token.token}</code></p>
-            <p>Salam hangat,<br />Tim {settings.app_nama}</p>
-        """
-        send_email(
-            to_email=payload.email,
-            subject="Verifikasi Email Admin Sekolah",
-            html_content=email_content,
-        )
-    except Exception as exc:  # noqa: BLE001
-        logger.warning(
-            "Gagal mengirim email verifikasi ke %s: %s", payload.email, exc
-        )
-
     return ResponRegistrasiAdmin(
         pengguna_id=pengguna.id,
         sekolah_id=sekolah.id,
@@ -129,22 +144,18 @@ def register_admin_sekolah(
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(
+async def login(
     credentials: PermintaanLogin,
     request: Request,
     db: Session = Depends(get_db),
 ) -> TokenResponse:
-    pengguna = (
-        db.query(Pengguna)
-        .filter(Pengguna.email == credentials.email)
-        .first()
-    )
+    batasi("login", request, credentials.email)
+    pengguna = await run_in_threadpool(_cari_pengguna_email, db, credentials.email)
     if pengguna is None:
         raise HTTPException(status_code=401, detail="Email atau kata sandi salah")
-    try:
-        valid = verifikasi_kata_sandi(credentials.kata_sandi, pengguna.kata_sandi_hash)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    valid = await _jalankan_kdf(
+        kdf_pool.verifikasi(credentials.kata_sandi, pengguna.kata_sandi_hash)
+    )
 
     if not valid:
         raise HTTPException(status_code=401, detail="Email atau kata sandi salah")
@@ -153,13 +164,19 @@ def login(
     if not pengguna.email_terverifikasi:
         raise HTTPException(status_code=403, detail="Email belum diverifikasi")
 
-    access_token = buat_token_akses(sub=pengguna.id)
+    return await run_in_threadpool(_terbitkan_token_login, db, pengguna, request)
+
+
+def _terbitkan_token_login(
+    db: Session, pengguna: Pengguna, request: Request
+) -> TokenResponse:
+    access_token = buat_token_akses(sub=pengguna.id, klaim=klaim_akses(pengguna))
     refresh_token_str = secrets.token_urlsafe(48)
     refresh_record = RefreshToken(
         pengguna_id=pengguna.id,
         token=refresh_token_str,
         user_agent=request.headers.get("user-agent"),
-        ip_address=request.client.host if request.client else None,
+        ip_address=ip_klien(request),
         kedaluwarsa=datetime.now(timezone.utc)
         + timedelta(minutes=settings.refresh_token_expire_minutes),
     )
@@ -197,15 +214,19 @@ def verifikasi_email(
 
 
 @router.get("/me", response_model=PenggunaProfile)
-def profil_pengguna(pengguna: Pengguna = Depends(get_pengguna_aktif)) -> Pengguna:
+async def profil_pengguna(
+    pengguna: Pengguna = Depends(get_pengguna_aktif_async),
+) -> Pengguna:
     return pengguna
 
 
 @router.post("/forgot-password", response_model=PesanResponse)
 def forgot_password(
     payload: PermintaanResetPassword,
+    request: Request,
     db: Session = Depends(get_db),
 ) -> PesanResponse:
+    batasi("lupa_sandi", request, payload.email)
     pengguna = (
         db.query(Pengguna)
         .filter(Pengguna.email == payload.email, Pengguna.status_aktif.is_(True))
@@ -229,10 +250,6 @@ def forgot_password(
         kedaluwarsa=datetime.now(timezone.utc) + timedelta(hours=2),
         digunakan=False,
     )
-    db.add(token)
-    db.commit()
-    db.refresh(token)
-
     reset_link = f"{settings.base_url}/reset-password?token={token.token}"
     email_content = f"""
         <p>Halo {pengguna.nama_lengkap},</p>
@@ -242,28 +259,38 @@ def forgot_password(
         <p>Jika Anda tidak meminta perubahan ini, abaikan email ini.</p>
         <p>Salam,<br />Tim {settings.app_nama}</p>
     """
+    antrekan_email(
+        db,
+        to_email=pengguna.email,
+        subject="Reset Kata Sandi Akun",
+        html_content=email_content,
+    )
 
-    try:
-        send_email(
-            to_email=pengguna.email,
-            subject="Reset Kata Sandi Akun",
-            html_content=email_content,
-        )
-    except Exception as exc:  # noqa: BLE001
-        logger.warning("Gagal mengirim email reset password ke %s: %s", pengguna.email, exc)
+    db.add(token)
+    db.commit()
 
     return PesanResponse(pesan="Jika email terdaftar, tautan reset telah dikirim.")
 
 
 @router.post("/reset-password", response_model=PesanResponse)
-def reset_password(
+async def reset_password(
     payload: ResetPasswordKonfirmasi,
     db: Session = Depends(get_db),
 ) -> PesanResponse:
+    token, pengguna = await run_in_threadpool(_validasi_token_reset, db, payload.token)
+    kata_sandi_hash = await _jalankan_kdf(kdf_pool.hash(payload.kata_sandi_baru))
+    return await run_in_threadpool(
+        _simpan_kata_sandi_baru, db, token, pengguna, kata_sandi_hash
+    )
+
+
+def _validasi_token_reset(
+    db: Session, token_str: str
+) -> tuple[TokenResetPassword, Pengguna]:
     token = (
         db.query(TokenResetPassword)
         .filter(
-            TokenResetPassword.token == payload.token,
+            TokenResetPassword.token == token_str,
             TokenResetPassword.digunakan.is_(False),
         )
         .first()
@@ -274,12 +301,16 @@ def reset_password(
     pengguna = db.query(Pengguna).filter(Pengguna.id == token.pengguna_id).first()
     if pengguna is None:
         raise HTTPException(status_code=400, detail="Pengguna tidak ditemukan")
+    return token, pengguna
 
-    try:
-        pengguna.kata_sandi_hash = buat_hash_kata_sandi(payload.kata_sandi_baru)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
+def _simpan_kata_sandi_baru(
+    db: Session,
+    token: TokenResetPassword,
+    pengguna: Pengguna,
+    kata_sandi_hash: str,
+) -> PesanResponse:
+    pengguna.kata_sandi_hash = kata_sandi_hash
     token.digunakan = True
     db.query(RefreshToken).filter(
         RefreshToken.pengguna_id == pengguna.id,
@@ -327,12 +358,12 @@ def refresh_token(
         pengguna_id=pengguna.id,
         token=new_refresh_str,
         user_agent=request.headers.get("user-agent"),
-        ip_address=request.client.host if request.client else None,
+        ip_address=ip_klien(request),
         kedaluwarsa=datetime.now(timezone.utc)
         + timedelta(minutes=settings.refresh_token_expire_minutes),
     )
 
-    access_token = buat_token_akses(sub=pengguna.id)
+    access_token = buat_token_akses(sub=pengguna.id, klaim=klaim_akses(pengguna))
     db.add_all([record, new_refresh])
     db.commit()
 
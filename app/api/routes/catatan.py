@@ -3,8 +3,8 @@ from sqlalchemy.orm import Session, selectinload
 from app.core.deps import get_db, require_peran
 from app.models import Pengguna, PeranPengguna, CatatanSiswa, KategoriCatatan, Siswa
 from app.schemas.catatan import CatatanSiswaCreate, CatatanSiswaDetail
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_keyset
 from app.core.responses import EnvelopeAPIRoute
 
 
@@ -54,6 +54,8 @@ def daftar_catatan_siswa(
     siswa_id: str | None = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = Query(default=None),
+    mode_total: ModeTotal | None = Query(default=None),
     db: Session = Depends(get_db),
     pengguna: Pengguna = Depends(require_peran(PeranPengguna.admin_sekolah, PeranPengguna.guru)),
 ) -> PaginatedResponse[CatatanSiswaDetail]:
@@ -66,23 +68,24 @@ def daftar_catatan_siswa(
             selectinload(CatatanSiswa.pencatat),
         )
         .filter(Siswa.sekolah_id == sekolah_id)
-        .order_by(CatatanSiswa.dibuat_pada.desc())
     )
     if kategori:
         query = query.filter(CatatanSiswa.kategori == kategori)
     if siswa_id:
         query = query.filter(CatatanSiswa.siswa_id == siswa_id)
 
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[CatatanSiswaDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = paginate_keyset(
+        query,
+        page,
+        limit,
+        sort_column=CatatanSiswa.dibuat_pada,
+        id_column=CatatanSiswa.id,
+        descending=True,
+        cursor=cursor,
+        mode_total=mode_total or ModeTotal.cached,
+        tenant=sekolah_id,
     )
+    return PaginatedResponse[CatatanSiswaDetail](items=items, meta=meta)
 
 
 @router.get("/{catatan_id}", response_model=CatatanSiswaDetail)
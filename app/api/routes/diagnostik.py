@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.core.deps import require_peran_klaim
+from app.core.principal import KlaimToken
+from app.core.responses import EnvelopeAPIRoute
+from app.db.query_lambat import daftar_query_lambat
+from app.models import PeranPengguna
+from app.schemas.diagnostik import QueryLambatItem
+
+
+router = APIRouter(
+    prefix="/diagnostik", tags=["Diagnostik"], route_class=EnvelopeAPIRoute
+)
+
+
+@router.get("/query-lambat", response_model=list[QueryLambatItem])
+def query_lambat(
+    limit: int = Query(default=50, ge=1, le=500),
+    klaim: KlaimToken = Depends(require_peran_klaim(PeranPengguna.admin_sekolah)),
+) -> list[dict]:
+    """Statement yang melewati ``SQL_LAMBAT_MS`` dari request sekolah ini,
+    terbaru lebih dulu, beserta bentuk parameter dan rencana EXPLAIN-nya.
+
+    Buffer disimpan di memori tiap proses worker.
+    """
+    if klaim.sekolah_id is None:
+        raise HTTPException(status_code=400, detail="Pengguna tidak terhubung ke sekolah")
+    return daftar_query_lambat(klaim.sekolah_id, limit)
@@ -5,8 +5,8 @@ from app.core.security import buat_hash_kata_sandi
 from app.models import Pengguna, Guru, PeranPengguna
 from app.models.guru import StatusGuru
 from app.schemas.guru import GuruCreate, GuruDetail, GuruUpdate
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_query
 from app.core.responses import EnvelopeAPIRoute
 
 
@@ -66,6 +66,7 @@ def tambah_guru(
 def daftar_guru(
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    mode_total: ModeTotal | None = Query(default=None),
     db: Session = Depends(get_db),
     pengguna: Pengguna = Depends(require_peran(PeranPengguna.admin_sekolah)),
 ) -> PaginatedResponse[GuruDetail]:
@@ -76,16 +77,14 @@ def daftar_guru(
         .filter(Guru.sekolah_id == pengguna.sekolah_id)
         .order_by(Pengguna.nama_lengkap.asc())
     )
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[GuruDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = paginate_query(
+        query,
+        page,
+        limit,
+        mode_total=mode_total or ModeTotal.exact,
+        tenant=pengguna.sekolah_id,
     )
+    return PaginatedResponse[GuruDetail](items=items, meta=meta)
 
 
 @router.get("/{guru_id}", response_model=GuruDetail)
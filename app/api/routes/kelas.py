@@ -1,13 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session, selectinload
-from app.core.deps import get_db, require_peran
+from app.core.deps import get_db, get_read_db, require_peran
 from app.models import Pengguna, PeranPengguna
 from app.models.akademik import Kelas, TahunAjaran, GuruMataPelajaran
 from app.models.guru import Guru
 from app.models.siswa import SiswaKelas
 from app.schemas.kelas import KelasCreate, KelasDetail, KelasUpdate
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_query
 from app.core.responses import EnvelopeAPIRoute
 
 
@@ -51,7 +51,8 @@ def tambah_kelas(
 def daftar_kelas(
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    mode_total: ModeTotal | None = Query(default=None),
+    db: Session = Depends(get_read_db),
     pengguna: Pengguna = Depends(require_peran(PeranPengguna.admin_sekolah)),
 ) -> PaginatedResponse[KelasDetail]:
     query = (
@@ -70,16 +71,14 @@ def daftar_kelas(
         .filter(Kelas.sekolah_id == pengguna.sekolah_id)
         .order_by(Kelas.tingkat.asc(), Kelas.nama_kelas.asc())
     )
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[KelasDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = paginate_query(
+        query,
+        page,
+        limit,
+        mode_total=mode_total or ModeTotal.exact,
+        tenant=pengguna.sekolah_id,
     )
+    return PaginatedResponse[KelasDetail](items=items, meta=meta)
 
 
 @router.get("/{kelas_id}", response_model=KelasDetail)
@@ -10,8 +10,8 @@ from app.models.akademik import (
 )
 from app.models.siswa import Siswa
 from app.schemas.kenaikan import KenaikanKelasCreate, KenaikanKelasDetail
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_query
 from app.core.responses import EnvelopeAPIRoute
 
 
@@ -115,6 +115,7 @@ def daftar_kenaikan(
     siswa_id: str | None = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    mode_total: ModeTotal | None = Query(default=None),
     db: Session = Depends(get_db),
     pengguna: Pengguna = Depends(require_peran(PeranPengguna.admin_sekolah)),
 ) -> PaginatedResponse[KenaikanKelasDetail]:
@@ -138,16 +139,14 @@ def daftar_kenaikan(
     if siswa_id:
         query = query.filter(KenaikanKelas.siswa_id == siswa_id)
 
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[KenaikanKelasDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = paginate_query(
+        query,
+        page,
+        limit,
+        mode_total=mode_total or ModeTotal.exact,
+        tenant=sekolah_id,
     )
+    return PaginatedResponse[KenaikanKelasDetail](items=items, meta=meta)
 
 
 @router.get("/{kenaikan_id}", response_model=KenaikanKelasDetail)
@@ -1,25 +1,49 @@
 from decimal import Decimal
+from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func
+from sqlalchemy import Select, String, cast, func, literal, select, true
 from sqlalchemy.orm import Session
-from app.core.deps import get_db, require_peran
+from app.core.deps import get_read_db, require_peran
 from app.models import (
+    Kelas,
     Pengguna,
     PeranPengguna,
+    SiswaKelas,
+    StatusKeanggotaanKelas,
     Tagihan,
     Pembayaran,
     JenisPembayaran,
     StatusTagihan,
 )
 from app.models.pembayaran import StatusPembayaran
-from app.schemas.laporan import LaporanPembayaranDetail
+from app.schemas.laporan import (
+    KelompokLaporan,
+    LaporanPembayaranDetail,
+    LaporanPembayaranRincian,
+)
 from app.core.responses import EnvelopeAPIRoute
+from app.tasks.tagihan_spp import NAMA_BULAN_ID
+from app.db.replika import dari_replika
+from app.utils.laporan_cache import (
+    boleh_cache_dari_replika,
+    generasi_laporan,
+    kunci_laporan,
+    laporan_cache,
+)
 
 
 router = APIRouter(
     prefix="/laporan", tags=["Laporan"], route_class=EnvelopeAPIRoute
 )
 
+# Pengganti NULL pada kunci kelompok agar FULL JOIN tetap memakai kesetaraan
+# biasa (PostgreSQL tidak mendukung FULL JOIN dengan IS NOT DISTINCT FROM).
+_KUNCI_KOSONG = {
+    KelompokLaporan.bulan: 0,
+    KelompokLaporan.jenis: "",
+    KelompokLaporan.kelas: "",
+}
+
 
 def _get_sekolah_id(pengguna: Pengguna) -> str:
     if pengguna.sekolah_id is None:
@@ -27,72 +51,218 @@ def _get_sekolah_id(pengguna: Pengguna) -> str:
     return pengguna.sekolah_id
 
 
-@router.get("/pembayaran", response_model=LaporanPembayaranDetail)
-def laporan_pembayaran(
-    jenis: JenisPembayaran | None = Query(default=None),
-    bulan: int | None = Query(default=None, ge=1, le=12),
-    tahun: int | None = Query(default=None, ge=2000, le=2100),
-    db: Session = Depends(get_db),
-    pengguna: Pengguna = Depends(
-        require_peran(PeranPengguna.admin_sekolah, PeranPengguna.keuangan)
-    ),
-) -> LaporanPembayaranDetail:
-    sekolah_id = _get_sekolah_id(pengguna)
+def _kelas_aktif_subquery():
+    return (
+        select(
+            SiswaKelas.siswa_id,
+            func.min(SiswaKelas.kelas_id).label("kelas_id"),
+        )
+        .where(SiswaKelas.status_keanggotaan == StatusKeanggotaanKelas.aktif)
+        .group_by(SiswaKelas.siswa_id)
+        .subquery()
+    )
+
+
+def _kelompokkan(
+    query: Select, group_by: KelompokLaporan | None, kunci_bulan, kunci_jenis, siswa_id
+) -> Select:
+    if group_by is None:
+        return query.add_columns(literal(None).label("kunci"))
+    if group_by == KelompokLaporan.kelas:
+        kelas_aktif = _kelas_aktif_subquery()
+        query = query.outerjoin(kelas_aktif, kelas_aktif.c.siswa_id == siswa_id)
+        kunci = kelas_aktif.c.kelas_id
+    elif group_by == KelompokLaporan.bulan:
+        kunci = kunci_bulan
+    else:
+        kunci = cast(kunci_jenis, String)
+    kunci = func.coalesce(kunci, _KUNCI_KOSONG[group_by]).label("kunci")
+    return query.add_columns(kunci).group_by(kunci)
+
 
-    tagihan_query = db.query(Tagihan).filter(Tagihan.sekolah_id == sekolah_id)
+def _laporan_statement(
+    sekolah_id: str,
+    jenis: JenisPembayaran | None,
+    bulan: int | None,
+    tahun: int | None,
+    group_by: KelompokLaporan | None,
+) -> Select:
+    """Satu statement untuk agregat tagihan dan pembayaran.
+
+    Agregat tagihan memakai ``FILTER (WHERE ...)`` atas satu pemindaian
+    ``tagihan``; total pembayaran dihitung di subquery terpisah dengan filter
+    yang sama seperti sebelumnya (jenis pembayaran dan periode tagihan
+    terkait), lalu keduanya digabung per kunci kelompok.
+    """
+    tagihan_agg = select(
+        func.coalesce(func.sum(Tagihan.jumlah_tagihan), 0).label("total_tagihan"),
+        func.count(Tagihan.id).label("jumlah_tagihan"),
+        func.count(Tagihan.id)
+        .filter(Tagihan.status_tagihan == StatusTagihan.lunas)
+        .label("jumlah_tagihan_lunas"),
+    ).where(Tagihan.sekolah_id == sekolah_id)
     if jenis:
-        tagihan_query = tagihan_query.filter(Tagihan.jenis_tagihan == jenis)
+        tagihan_agg = tagihan_agg.where(Tagihan.jenis_tagihan == jenis)
     if bulan:
-        tagihan_query = tagihan_query.filter(Tagihan.periode_bulan == bulan)
+        tagihan_agg = tagihan_agg.where(Tagihan.periode_bulan == bulan)
     if tahun:
-        tagihan_query = tagihan_query.filter(Tagihan.periode_tahun == tahun)
-
-    total_tagihan = tagihan_query.with_entities(
-        func.coalesce(func.sum(Tagihan.jumlah_tagihan), 0)
-    ).scalar() or Decimal("0.00")
-
-    jumlah_tagihan = tagihan_query.with_entities(func.count(Tagihan.id)).scalar() or 0
-    jumlah_tagihan_lunas = (
-        tagihan_query.filter(Tagihan.status_tagihan == StatusTagihan.lunas)
-        .with_entities(func.count(Tagihan.id))
-        .scalar()
-        or 0
-    )
+        tagihan_agg = tagihan_agg.where(Tagihan.periode_tahun == tahun)
+    tagihan_agg = _kelompokkan(
+        tagihan_agg,
+        group_by,
+        Tagihan.periode_bulan,
+        Tagihan.jenis_tagihan,
+        Tagihan.siswa_id,
+    ).subquery("tagihan_agg")
 
-    pembayaran_query = (
-        db.query(func.coalesce(func.sum(Pembayaran.jumlah), 0))
-        .join(Tagihan, Pembayaran.tagihan_id == Tagihan.id, isouter=True)
-        .filter(
+    pembayaran_agg = (
+        select(func.coalesce(func.sum(Pembayaran.jumlah), 0).label("total_dibayar"))
+        .select_from(Pembayaran)
+        .outerjoin(Tagihan, Pembayaran.tagihan_id == Tagihan.id)
+        .where(
             Pembayaran.sekolah_id == sekolah_id,
             Pembayaran.status_pembayaran == StatusPembayaran.lunas,
         )
     )
-
     if jenis:
-        pembayaran_query = pembayaran_query.filter(
-            Pembayaran.jenis_pembayaran == jenis
-        )
+        pembayaran_agg = pembayaran_agg.where(Pembayaran.jenis_pembayaran == jenis)
     if bulan:
-        pembayaran_query = pembayaran_query.filter(Tagihan.periode_bulan == bulan)
+        pembayaran_agg = pembayaran_agg.where(Tagihan.periode_bulan == bulan)
     if tahun:
-        pembayaran_query = pembayaran_query.filter(Tagihan.periode_tahun == tahun)
+        pembayaran_agg = pembayaran_agg.where(Tagihan.periode_tahun == tahun)
+    pembayaran_agg = _kelompokkan(
+        pembayaran_agg,
+        group_by,
+        Tagihan.periode_bulan,
+        Pembayaran.jenis_pembayaran,
+        Pembayaran.siswa_id,
+    ).subquery("pembayaran_agg")
 
-    total_dibayar = pembayaran_query.scalar() or Decimal("0.00")
+    if group_by is None:
+        gabungan = tagihan_agg.join(pembayaran_agg, true())
+    else:
+        gabungan = tagihan_agg.join(
+            pembayaran_agg,
+            tagihan_agg.c.kunci == pembayaran_agg.c.kunci,
+            full=True,
+        )
+    kunci = func.coalesce(tagihan_agg.c.kunci, pembayaran_agg.c.kunci).label("kunci")
+    statement = select(
+        kunci,
+        func.coalesce(tagihan_agg.c.total_tagihan, 0).label("total_tagihan"),
+        func.coalesce(pembayaran_agg.c.total_dibayar, 0).label("total_dibayar"),
+        func.coalesce(tagihan_agg.c.jumlah_tagihan, 0).label("jumlah_tagihan"),
+        func.coalesce(tagihan_agg.c.jumlah_tagihan_lunas, 0).label(
+            "jumlah_tagihan_lunas"
+        ),
+    )
+    if group_by == KelompokLaporan.kelas:
+        statement = statement.add_columns(Kelas.nama_kelas.label("label"))
+        gabungan = gabungan.outerjoin(Kelas, Kelas.id == kunci)
+    return statement.select_from(gabungan).order_by(kunci)
 
-    if not isinstance(total_tagihan, Decimal):
-        total_tagihan = Decimal(total_tagihan)
-    if not isinstance(total_dibayar, Decimal):
-        total_dibayar = Decimal(total_dibayar)
 
+def _ringkas(
+    total_tagihan: Decimal,
+    total_dibayar: Decimal,
+    jumlah_tagihan: int,
+    jumlah_tagihan_lunas: int,
+) -> dict[str, Any]:
+    total_tagihan = Decimal(total_tagihan) if total_tagihan else Decimal("0.00")
+    total_dibayar = Decimal(total_dibayar) if total_dibayar else Decimal("0.00")
     total_sisa = total_tagihan - total_dibayar
     if total_sisa < Decimal("0"):
         total_sisa = Decimal("0.00")
+    return {
+        "total_tagihan": total_tagihan,
+        "total_dibayar": total_dibayar,
+        "total_sisa": total_sisa,
+        "jumlah_tagihan": jumlah_tagihan,
+        "jumlah_tagihan_lunas": jumlah_tagihan_lunas,
+        "jumlah_tagihan_belum_lunas": jumlah_tagihan - jumlah_tagihan_lunas,
+    }
+
+
+def _label_kelompok(group_by: KelompokLaporan, kunci: Any, row: Any) -> str | None:
+    if kunci is None:
+        return None
+    if group_by == KelompokLaporan.bulan:
+        return NAMA_BULAN_ID.get(kunci)
+    if group_by == KelompokLaporan.kelas:
+        return row.label
+    return kunci
+
+
+@router.get("/pembayaran", response_model=LaporanPembayaranDetail)
+def laporan_pembayaran(
+    jenis: JenisPembayaran | None = Query(default=None),
+    bulan: int | None = Query(default=None, ge=1, le=12),
+    tahun: int | None = Query(default=None, ge=2000, le=2100),
+    group_by: KelompokLaporan | None = Query(
+        default=None,
+        description="Rincian per bulan, jenis, atau kelas dalam satu query.",
+    ),
+    db: Session = Depends(get_read_db),
+    pengguna: Pengguna = Depends(
+        require_peran(PeranPengguna.admin_sekolah, PeranPengguna.keuangan)
+    ),
+) -> LaporanPembayaranDetail:
+    sekolah_id = _get_sekolah_id(pengguna)
+    generasi = generasi_laporan(sekolah_id)
+    kunci = kunci_laporan(generasi, jenis, bulan, tahun, group_by)
+    laporan = laporan_cache.get(kunci)
+    if laporan is None:
+        laporan = _hitung_laporan(db, sekolah_id, jenis, bulan, tahun, group_by)
+        if not dari_replika(db) or boleh_cache_dari_replika(generasi):
+            laporan_cache.set(kunci, laporan)
+    return laporan
+
 
+def _hitung_laporan(
+    db: Session,
+    sekolah_id: str,
+    jenis: JenisPembayaran | None,
+    bulan: int | None,
+    tahun: int | None,
+    group_by: KelompokLaporan | None,
+) -> LaporanPembayaranDetail:
+    rows = db.execute(
+        _laporan_statement(sekolah_id, jenis, bulan, tahun, group_by)
+    ).all()
+
+    if group_by is None:
+        row = rows[0]
+        return LaporanPembayaranDetail(
+            **_ringkas(
+                row.total_tagihan,
+                row.total_dibayar,
+                row.jumlah_tagihan,
+                row.jumlah_tagihan_lunas,
+            )
+        )
+
+    rincian = []
+    for row in rows:
+        kunci = None if row.kunci == _KUNCI_KOSONG[group_by] else row.kunci
+        rincian.append(
+            LaporanPembayaranRincian(
+                kunci=kunci,
+                label=_label_kelompok(group_by, kunci, row),
+                **_ringkas(
+                    row.total_tagihan,
+                    row.total_dibayar,
+                    row.jumlah_tagihan,
+                    row.jumlah_tagihan_lunas,
+                ),
+            )
+        )
     return LaporanPembayaranDetail(
-        total_tagihan=total_tagihan,
-        total_dibayar=total_dibayar,
-        total_sisa=total_sisa,
-        jumlah_tagihan=jumlah_tagihan,
-        jumlah_tagihan_lunas=jumlah_tagihan_lunas,
-        jumlah_tagihan_belum_lunas=jumlah_tagihan - jumlah_tagihan_lunas,
+        group_by=group_by,
+        rincian=rincian,
+        **_ringkas(
+            sum((row.total_tagihan for row in rows), Decimal("0")),
+            sum((row.total_dibayar for row in rows), Decimal("0")),
+            sum(row.jumlah_tagihan for row in rows),
+            sum(row.jumlah_tagihan_lunas for row in rows),
+        ),
     )
@@ -8,8 +8,8 @@ from app.schemas.mata_pelajaran import (
     MataPelajaranDetail,
     MataPelajaranUpdate,
 )
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_query
 from app.core.responses import EnvelopeAPIRoute
 
 
@@ -45,6 +45,7 @@ def tambah_mata_pelajaran(
 def daftar_mata_pelajaran(
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    mode_total: ModeTotal | None = Query(default=None),
     db: Session = Depends(get_db),
     pengguna: Pengguna = Depends(require_peran(PeranPengguna.admin_sekolah)),
 ) -> PaginatedResponse[MataPelajaranDetail]:
@@ -53,16 +54,14 @@ def daftar_mata_pelajaran(
         .filter(MataPelajaran.sekolah_id == pengguna.sekolah_id)
         .order_by(MataPelajaran.nama_mapel.asc())
     )
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[MataPelajaranDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = paginate_query(
+        query,
+        page,
+        limit,
+        mode_total=mode_total or ModeTotal.exact,
+        tenant=pengguna.sekolah_id,
     )
+    return PaginatedResponse[MataPelajaranDetail](items=items, meta=meta)
 
 
 @router.get("/{mapel_id}", response_model=MataPelajaranDetail)
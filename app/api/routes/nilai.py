@@ -1,21 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session, selectinload
-from app.core.deps import get_db, require_peran
+from app.core.deps import get_db, require_peran, require_peran_klaim
+from app.core.principal import KlaimToken
 from app.models import Pengguna, PeranPengguna
 from app.models.siswa import Siswa
 from app.models.akademik import Nilai, Kelas, TahunAjaran
 from app.models.mata_pelajaran import MataPelajaran
 from app.models.guru import Guru
 from app.schemas.nilai import NilaiCreate, NilaiDetail
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_keyset
 from app.core.responses import EnvelopeAPIRoute
 
 
 router = APIRouter(prefix="/nilai", tags=["Nilai"], route_class=EnvelopeAPIRoute)
 
 
-def _get_sekolah_id(pengguna: Pengguna) -> str:
+def _get_sekolah_id(pengguna: Pengguna | KlaimToken) -> str:
     if pengguna.sekolah_id is None:
         raise HTTPException(status_code=400, detail="Pengguna tidak terhubung ke sekolah")
     return pengguna.sekolah_id
@@ -112,12 +113,14 @@ def daftar_nilai(
     mata_pelajaran_id: str | None = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = Query(default=None),
+    mode_total: ModeTotal | None = Query(default=None),
     db: Session = Depends(get_db),
-    pengguna: Pengguna = Depends(
-        require_peran(PeranPengguna.admin_sekolah, PeranPengguna.guru)
+    klaim: KlaimToken = Depends(
+        require_peran_klaim(PeranPengguna.admin_sekolah, PeranPengguna.guru)
     ),
 ) -> PaginatedResponse[NilaiDetail]:
-    sekolah_id = _get_sekolah_id(pengguna)
+    sekolah_id = _get_sekolah_id(klaim)
     query = (
         db.query(Nilai)
         .options(
@@ -135,25 +138,26 @@ def daftar_nilai(
         query = query.filter(Nilai.kelas_id == kelas_id)
     if mata_pelajaran_id:
         query = query.filter(Nilai.mata_pelajaran_id == mata_pelajaran_id)
-    query = query.order_by(Nilai.tanggal_penilaian.desc())
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[NilaiDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = paginate_keyset(
+        query,
+        page,
+        limit,
+        sort_column=Nilai.tanggal_penilaian,
+        id_column=Nilai.id,
+        descending=True,
+        cursor=cursor,
+        mode_total=mode_total or ModeTotal.cached,
+        tenant=sekolah_id,
     )
+    return PaginatedResponse[NilaiDetail](items=items, meta=meta)
 
 
 @router.get("/{nilai_id}", response_model=NilaiDetail)
 def detail_nilai(
     nilai_id: str,
     db: Session = Depends(get_db),
-    pengguna: Pengguna = Depends(
-        require_peran(PeranPengguna.admin_sekolah, PeranPengguna.guru)
+    klaim: KlaimToken = Depends(
+        require_peran_klaim(PeranPengguna.admin_sekolah, PeranPengguna.guru)
     ),
 ) -> Nilai:
     nilai = (
@@ -167,7 +171,7 @@ def detail_nilai(
         )
         .filter(
             Nilai.id == nilai_id,
-            Nilai.sekolah_id == _get_sekolah_id(pengguna),
+            Nilai.sekolah_id == _get_sekolah_id(klaim),
         )
         .first()
     )
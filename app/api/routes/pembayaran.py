@@ -16,9 +16,10 @@ from app.schemas.pembayaran import (
     PembayaranDetail,
     PembayaranUpdateStatus,
 )
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_keyset
 from app.core.responses import EnvelopeAPIRoute
+from app.utils.waktu import hari_ini
 
 
 router = APIRouter(
@@ -51,7 +52,7 @@ def _recalculate_tagihan(tagihan: Tagihan) -> None:
     if (
         tagihan.status_tagihan != StatusTagihan.lunas
         and tagihan.tanggal_jatuh_tempo
-        and tagihan.tanggal_jatuh_tempo < date.today()
+        and tagihan.tanggal_jatuh_tempo < hari_ini()
     ):
         tagihan.status_tagihan = StatusTagihan.menunggak
 
@@ -125,6 +126,8 @@ def daftar_pembayaran(
     siswa_id: str | None = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = Query(default=None),
+    mode_total: ModeTotal | None = Query(default=None),
     db: Session = Depends(get_db),
     pengguna: Pengguna = Depends(
         require_peran(PeranPengguna.admin_sekolah, PeranPengguna.keuangan)
@@ -137,20 +140,21 @@ def daftar_pembayaran(
             selectinload(Pembayaran.tagihan),
         )
         .filter(Pembayaran.sekolah_id == _get_sekolah_id(pengguna))
-        .order_by(Pembayaran.dicatat_pada.desc())
     )
     if siswa_id:
         query = query.filter(Pembayaran.siswa_id == siswa_id)
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[PembayaranDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = paginate_keyset(
+        query,
+        page,
+        limit,
+        sort_column=Pembayaran.dicatat_pada,
+        id_column=Pembayaran.id,
+        descending=True,
+        cursor=cursor,
+        mode_total=mode_total or ModeTotal.cached,
+        tenant=pengguna.sekolah_id,
     )
+    return PaginatedResponse[PembayaranDetail](items=items, meta=meta)
 
 
 @router.get("/{pembayaran_id}", response_model=PembayaranDetail)
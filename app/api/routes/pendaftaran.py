@@ -13,8 +13,8 @@ from app.schemas.pendaftaran import (
     PendaftaranSiswaPublicCreate,
     PendaftaranSiswaUpdateStatus,
 )
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_query
 from app.core.responses import EnvelopeAPIRoute
 
 
@@ -55,6 +55,7 @@ def daftar_pendaftaran(
     status_pendaftaran: StatusPendaftaran | None = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    mode_total: ModeTotal | None = Query(default=None),
     db: Session = Depends(get_db),
     pengguna: Pengguna = Depends(require_peran(PeranPengguna.admin_sekolah)),
 ) -> PaginatedResponse[PendaftaranSiswaDetail]:
@@ -66,16 +67,14 @@ def daftar_pendaftaran(
     if status_pendaftaran is not None:
         query = query.filter(PendaftaranSiswa.status == status_pendaftaran)
 
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[PendaftaranSiswaDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = paginate_query(
+        query,
+        page,
+        limit,
+        mode_total=mode_total or ModeTotal.exact,
+        tenant=pengguna.sekolah_id,
     )
+    return PaginatedResponse[PendaftaranSiswaDetail](items=items, meta=meta)
 
 
 @router.get(
@@ -1,14 +1,18 @@
 from datetime import date
+from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import case, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, selectinload
-from app.core.deps import get_db, require_peran
+from sqlalchemy.orm import Session, contains_eager, selectinload
+from app.core.deps import get_db, get_read_db, require_peran
 from app.models import Pengguna, PeranPengguna
 from app.models.siswa import Siswa, SiswaKelas, StatusKeanggotaanKelas
-from app.models.akademik import Kelas
-from app.schemas.siswa import SiswaCreate, SiswaDetail, SiswaUpdate
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.models.akademik import AbsensiSiswa, Kelas, StatusKehadiran, TahunAjaran
+from app.models.pembayaran import StatusTagihan, Tagihan
+from app.schemas.siswa import SiswaCreate, SiswaDetail, SiswaListItem, SiswaUpdate
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_query
+from app.utils.waktu import hari_ini
 from app.core.responses import EnvelopeAPIRoute
 
 
@@ -74,23 +78,119 @@ def tambah_siswa(
     return siswa
 
 
-@router.get("", response_model=PaginatedResponse[SiswaDetail])
+SISWA_INCLUDE = {
+    "riwayat_kelas": selectinload(Siswa.riwayat_kelas).selectinload(SiswaKelas.kelas),
+    "tagihan": selectinload(Siswa.tagihan),
+    "pembayaran": selectinload(Siswa.pembayaran),
+    "nilai": selectinload(Siswa.nilai),
+    "absensi": selectinload(Siswa.absensi),
+}
+
+KOLOM_SISWA_LIST = set(SiswaListItem.model_fields) - set(SISWA_INCLUDE) - {
+    "kelas_aktif",
+    "total_tagihan_tertunggak",
+    "persentase_kehadiran_bulan_ini",
+}
+
+
+def _parse_include(include: str | None) -> list[str]:
+    if not include:
+        return []
+    relasi = [item.strip() for item in include.split(",") if item.strip()]
+    tidak_dikenal = [item for item in relasi if item not in SISWA_INCLUDE]
+    if tidak_dikenal:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "message": "Parameter include tidak valid",
+                "data": {"tidak_dikenal": tidak_dikenal, "tersedia": list(SISWA_INCLUDE)},
+            },
+        )
+    return list(dict.fromkeys(relasi))
+
+
+def _ringkasan_siswa(db: Session, siswa_ids: list[str]):
+    # Data lama bisa memiliki lebih dari satu keanggotaan aktif per siswa;
+    # yang ditampilkan adalah kelas pada tahun ajaran terbaru, lalu tanggal
+    # masuk terbaru, agar hasilnya tidak berganti-ganti antar request.
+    kelas_aktif: dict[str, Kelas] = {}
+    for rel in (
+        db.query(SiswaKelas)
+        .join(SiswaKelas.kelas)
+        .join(Kelas.tahun_ajaran)
+        .options(contains_eager(SiswaKelas.kelas))
+        .filter(
+            SiswaKelas.siswa_id.in_(siswa_ids),
+            SiswaKelas.status_keanggotaan == StatusKeanggotaanKelas.aktif,
+        )
+        .order_by(
+            TahunAjaran.tanggal_mulai.desc(),
+            SiswaKelas.tanggal_masuk.desc().nulls_last(),
+            SiswaKelas.id,
+        )
+    ):
+        kelas_aktif.setdefault(rel.siswa_id, rel.kelas)
+
+    tunggakan = dict(
+        db.query(
+            Tagihan.siswa_id,
+            func.sum(Tagihan.jumlah_tagihan - Tagihan.jumlah_terbayar),
+        )
+        .filter(
+            Tagihan.siswa_id.in_(siswa_ids),
+            Tagihan.status_tagihan != StatusTagihan.lunas,
+        )
+        .group_by(Tagihan.siswa_id)
+        .all()
+    )
+
+    hari = hari_ini()
+    kehadiran = {
+        siswa_id: (jumlah, hadir)
+        for siswa_id, jumlah, hadir in db.query(
+            AbsensiSiswa.siswa_id,
+            func.count(AbsensiSiswa.id),
+            func.sum(
+                case(
+                    (
+                        AbsensiSiswa.status_kehadiran.in_(
+                            [StatusKehadiran.hadir, StatusKehadiran.terlambat]
+                        ),
+                        1,
+                    ),
+                    else_=0,
+                )
+            ),
+        )
+        .filter(
+            AbsensiSiswa.siswa_id.in_(siswa_ids),
+            AbsensiSiswa.tanggal >= hari.replace(day=1),
+            AbsensiSiswa.tanggal <= hari,
+        )
+        .group_by(AbsensiSiswa.siswa_id)
+        .all()
+    }
+    return kelas_aktif, tunggakan, kehadiran
+
+
+@router.get("", response_model=PaginatedResponse[SiswaListItem])
 def daftar_siswa(
     kelas_id: str | None = Query(default=None),
+    include: str | None = Query(
+        default=None,
+        description="Relasi lengkap yang ikut dimuat, dipisah koma: "
+        + ", ".join(SISWA_INCLUDE),
+    ),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    mode_total: ModeTotal | None = Query(default=None),
+    db: Session = Depends(get_read_db),
     pengguna: Pengguna = Depends(require_peran(PeranPengguna.admin_sekolah)),
-) -> PaginatedResponse[SiswaDetail]:
+) -> PaginatedResponse[SiswaListItem]:
+    relasi = _parse_include(include)
     query = (
         db.query(Siswa)
-        .options(
-            selectinload(Siswa.riwayat_kelas).selectinload(SiswaKelas.kelas),
-            selectinload(Siswa.tagihan),
-            selectinload(Siswa.pembayaran),
-            selectinload(Siswa.nilai),
-            selectinload(Siswa.absensi),
-        )
+        .options(*(SISWA_INCLUDE[nama] for nama in relasi))
         .filter(Siswa.sekolah_id == pengguna.sekolah_id)
         .order_by(Siswa.nama_lengkap.asc())
     )
@@ -99,16 +199,33 @@ def daftar_siswa(
             SiswaKelas.kelas_id == kelas_id,
             SiswaKelas.status_keanggotaan == StatusKeanggotaanKelas.aktif,
         )
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[SiswaDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    siswa_list, meta = paginate_query(
+        query,
+        page,
+        limit,
+        mode_total=mode_total or ModeTotal.exact,
+        tenant=pengguna.sekolah_id,
     )
+    if not siswa_list:
+        return PaginatedResponse[SiswaListItem](items=[], meta=meta)
+
+    kelas_aktif, tunggakan, kehadiran = _ringkasan_siswa(
+        db, [siswa.id for siswa in siswa_list]
+    )
+    items = []
+    for siswa in siswa_list:
+        data = {kolom: getattr(siswa, kolom) for kolom in KOLOM_SISWA_LIST}
+        data.update({nama: getattr(siswa, nama) for nama in relasi})
+        jumlah, hadir = kehadiran.get(siswa.id, (0, 0))
+        data["kelas_aktif"] = kelas_aktif.get(siswa.id)
+        data["total_tagihan_tertunggak"] = tunggakan.get(siswa.id) or Decimal("0.00")
+        data["persentase_kehadiran_bulan_ini"] = (
+            (Decimal(hadir or 0) * 100 / jumlah).quantize(Decimal("0.01"))
+            if jumlah
+            else None
+        )
+        items.append(SiswaListItem.model_validate(data, from_attributes=True))
+    return PaginatedResponse[SiswaListItem](items=items, meta=meta)
 
 
 @router.get("/{siswa_id}", response_model=SiswaDetail)
@@ -1,9 +1,12 @@
-import calendar
-from datetime import date, datetime
+from datetime import date
 from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, selectinload
-from app.core.deps import get_db, require_peran
+from app.core.deps import get_async_db, get_db, require_peran, require_peran_klaim_async
+from app.core.principal import KlaimToken
 from app.models import (
     Pengguna,
     PeranPengguna,
@@ -11,20 +14,32 @@ from app.models import (
     JenisPembayaran,
     StatusTagihan,
     Siswa,
-    StatusSiswa,
-    SiswaKelas,
-    StatusKeanggotaanKelas,
+    Kelas,
+    JobTagihanSPP,
     StatusPembayaran,
 )
 from app.schemas.tagihan import (
+    JobTagihanSPPCreate,
+    JobTagihanSPPDetail,
     TagihanCreate,
     TagihanDetail,
     TagihanSPPGenerate,
+    TagihanSPPRingkasan,
     TagihanUpdate,
 )
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_keyset_async
 from app.core.responses import EnvelopeAPIRoute
+from app.utils.laporan_cache import invalidasi_laporan
+from app.utils.waktu import hari_ini
+from app.core.config import settings
+from app.tasks.tagihan_spp import (
+    daftar_periode,
+    default_jatuh_tempo,
+    insert_tagihan_spp,
+    jadwalkan_job_tagihan_spp,
+    siswa_aktif_select,
+)
 
 
 router = APIRouter(
@@ -32,33 +47,12 @@ router = APIRouter(
 )
 
 
-NAMA_BULAN_ID = {
-    1: "Januari",
-    2: "Februari",
-    3: "Maret",
-    4: "April",
-    5: "Mei",
-    6: "Juni",
-    7: "Juli",
-    8: "Agustus",
-    9: "September",
-    10: "Oktober",
-    11: "November",
-    12: "Desember",
-}
-
-
-def _get_sekolah_id(pengguna: Pengguna) -> str:
+def _get_sekolah_id(pengguna: Pengguna | KlaimToken) -> str:
     if pengguna.sekolah_id is None:
         raise HTTPException(status_code=400, detail="Pengguna tidak terhubung ke sekolah")
     return pengguna.sekolah_id
 
 
-def _default_jatuh_tempo(tahun: int, bulan: int) -> date:
-    hari = min(10, calendar.monthrange(tahun, bulan)[1])
-    return date(tahun, bulan, hari)
-
-
 def _refresh_status_tagihan(tagihan: Tagihan) -> None:
     total_dibayar = sum(
         (
@@ -82,7 +76,7 @@ def _refresh_status_tagihan(tagihan: Tagihan) -> None:
     if (
         tagihan.status_tagihan != StatusTagihan.lunas
         and tagihan.tanggal_jatuh_tempo
-        and tagihan.tanggal_jatuh_tempo < date.today()
+        and tagihan.tanggal_jatuh_tempo < hari_ini()
     ):
         tagihan.status_tagihan = StatusTagihan.menunggak
 
@@ -116,96 +110,164 @@ def buat_tagihan(
         tanggal_jatuh_tempo=payload.tanggal_jatuh_tempo,
     )
     db.add(tagihan)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        constraint_name = getattr(getattr(exc.orig, "diag", None), "constraint_name", "")
+        if constraint_name == "uq_tagihan_periode":
+            raise HTTPException(
+                status_code=409,
+                detail="Tagihan SPP untuk periode tersebut sudah ada untuk siswa ini",
+            ) from exc
+        raise HTTPException(status_code=400, detail="Gagal membuat tagihan") from exc
     db.refresh(tagihan)
     return tagihan
 
 
-@router.post("/spp", response_model=list[TagihanDetail])
+@router.post("/spp", response_model=list[TagihanDetail] | TagihanSPPRingkasan)
 def generate_tagihan_spp(
     payload: TagihanSPPGenerate,
+    ringkasan: bool = Query(
+        default=False,
+        description="Kembalikan jumlah tagihan dibuat/dilewati saja tanpa detail.",
+    ),
     db: Session = Depends(get_db),
     pengguna: Pengguna = Depends(
         require_peran(PeranPengguna.admin_sekolah, PeranPengguna.keuangan)
     ),
-) -> list[Tagihan]:
+) -> list[Tagihan] | TagihanSPPRingkasan:
     sekolah_id = _get_sekolah_id(pengguna)
+    siswa_select = siswa_aktif_select(sekolah_id, payload.kelas_id)
 
-    siswa_query = (
-        db.query(Siswa)
-        .filter(
-            Siswa.sekolah_id == sekolah_id,
-            Siswa.status_siswa == StatusSiswa.aktif,
+    tanggal_jatuh_tempo = (
+        payload.tanggal_jatuh_tempo or default_jatuh_tempo(payload.tahun, payload.bulan)
+    )
+    created_ids = (
+        db.execute(
+            insert_tagihan_spp(
+                siswa_select,
+                sekolah_id=sekolah_id,
+                bulan=payload.bulan,
+                tahun=payload.tahun,
+                jumlah=payload.jumlah,
+                tanggal_jatuh_tempo=tanggal_jatuh_tempo,
+            )
         )
+        .scalars()
+        .all()
     )
+    if created_ids:
+        invalidasi_laporan(db, sekolah_id)
+    db.commit()
 
-    if payload.kelas_id:
-        valid_kelas = (
-            db.query(SiswaKelas)
-            .join(Siswa, Siswa.id == SiswaKelas.siswa_id)
-            .filter(
-                SiswaKelas.kelas_id == payload.kelas_id,
-                SiswaKelas.status_keanggotaan == StatusKeanggotaanKelas.aktif,
-                Siswa.sekolah_id == sekolah_id,
-            )
+    if ringkasan:
+        jumlah_siswa = db.execute(
+            select(func.count()).select_from(siswa_select.subquery())
+        ).scalar_one()
+        return TagihanSPPRingkasan(
+            bulan=payload.bulan,
+            tahun=payload.tahun,
+            jumlah_siswa=jumlah_siswa,
+            jumlah_dibuat=len(created_ids),
+            jumlah_dilewati=jumlah_siswa - len(created_ids),
         )
-        siswa_ids = {rel.siswa_id for rel in valid_kelas.all()}
-        if not siswa_ids:
-            return []
-        siswa_query = siswa_query.filter(Siswa.id.in_(list(siswa_ids)))
 
-    siswa_list = siswa_query.all()
-    if not siswa_list:
+    if not created_ids:
         return []
-
-    tanggal_jatuh_tempo = (
-        payload.tanggal_jatuh_tempo or _default_jatuh_tempo(payload.tahun, payload.bulan)
+    return (
+        db.query(Tagihan)
+        .options(
+            selectinload(Tagihan.siswa),
+            selectinload(Tagihan.pembayaran),
+        )
+        .filter(Tagihan.id.in_(created_ids))
+        .all()
     )
-    nama_tagihan = f"SPP {NAMA_BULAN_ID[payload.bulan]} {payload.tahun}"
-
-    created_tagihan: list[Tagihan] = []
-    now = datetime.now()
-
-    for siswa in siswa_list:
-        existing = (
-            db.query(Tagihan)
-            .filter(
-                Tagihan.sekolah_id == sekolah_id,
-                Tagihan.siswa_id == siswa.id,
-                Tagihan.jenis_tagihan == JenisPembayaran.spp,
-                Tagihan.periode_bulan == payload.bulan,
-                Tagihan.periode_tahun == payload.tahun,
+
+
+@router.post(
+    "/spp/jobs",
+    response_model=JobTagihanSPPDetail,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def buat_job_tagihan_spp(
+    payload: JobTagihanSPPCreate,
+    db: Session = Depends(get_db),
+    pengguna: Pengguna = Depends(
+        require_peran(PeranPengguna.admin_sekolah, PeranPengguna.keuangan)
+    ),
+) -> JobTagihanSPP:
+    sekolah_id = _get_sekolah_id(pengguna)
+    jumlah_periode = len(
+        list(
+            daftar_periode(
+                payload.bulan_awal,
+                payload.tahun_awal,
+                payload.bulan_akhir,
+                payload.tahun_akhir,
             )
-            .first()
         )
-        if existing:
-            continue
-
-        tagihan = Tagihan(
-            sekolah_id=sekolah_id,
-            siswa_id=siswa.id,
-            jenis_tagihan=JenisPembayaran.spp,
-            nama_tagihan=nama_tagihan,
-            jumlah_tagihan=payload.jumlah,
-            periode_bulan=payload.bulan,
-            periode_tahun=payload.tahun,
-            tanggal_jatuh_tempo=tanggal_jatuh_tempo,
-            dibuat_pada=now,
-            diperbarui_pada=now,
+    )
+    if jumlah_periode == 0:
+        raise HTTPException(
+            status_code=400, detail="Periode akhir tidak boleh sebelum periode awal"
+        )
+    if jumlah_periode > settings.spp_job_max_periode:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Rentang periode maksimal {settings.spp_job_max_periode} bulan",
+        )
+    if payload.jumlah is None and not payload.tarif_kelas:
+        raise HTTPException(
+            status_code=400, detail="Isi jumlah atau tarif_kelas untuk job tagihan SPP"
         )
-        db.add(tagihan)
-        created_tagihan.append(tagihan)
 
-    if created_tagihan:
-        db.commit()
-        for tagihan in created_tagihan:
-            db.refresh(tagihan)
+    kelas_ids = {tarif.kelas_id for tarif in payload.tarif_kelas}
+    if len(kelas_ids) != len(payload.tarif_kelas):
+        raise HTTPException(status_code=400, detail="Kelas pada tarif_kelas tidak boleh ganda")
+    if kelas_ids:
+        jumlah_kelas = db.execute(
+            select(func.count())
+            .select_from(Kelas)
+            .where(Kelas.id.in_(kelas_ids), Kelas.sekolah_id == sekolah_id)
+        ).scalar_one()
+        if jumlah_kelas != len(kelas_ids):
+            raise HTTPException(status_code=404, detail="Kelas tidak ditemukan")
+
+    job = JobTagihanSPP(
+        sekolah_id=sekolah_id,
+        dibuat_oleh_id=pengguna.id,
+        parameter=payload.model_dump(mode="json"),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    jadwalkan_job_tagihan_spp(job.id)
+    return job
 
-    return created_tagihan
+
+@router.get("/spp/jobs/{job_id}", response_model=JobTagihanSPPDetail)
+def detail_job_tagihan_spp(
+    job_id: str,
+    db: Session = Depends(get_db),
+    pengguna: Pengguna = Depends(
+        require_peran(PeranPengguna.admin_sekolah, PeranPengguna.keuangan)
+    ),
+) -> JobTagihanSPP:
+    sekolah_id = _get_sekolah_id(pengguna)
+    job = (
+        db.query(JobTagihanSPP)
+        .filter(JobTagihanSPP.id == job_id, JobTagihanSPP.sekolah_id == sekolah_id)
+        .first()
+    )
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job tidak ditemukan")
+    return job
 
 
 @router.get("", response_model=PaginatedResponse[TagihanDetail])
-def daftar_tagihan(
+async def daftar_tagihan(
     request: Request,
     status_tagihan: StatusTagihan | None = Query(default=None),
     jenis_tagihan: JenisPembayaran | None = Query(default=None, alias="jenis"),
@@ -214,9 +276,11 @@ def daftar_tagihan(
     siswa_id: str | None = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    db: Session = Depends(get_db),
-    pengguna: Pengguna = Depends(
-        require_peran(PeranPengguna.admin_sekolah, PeranPengguna.keuangan)
+    cursor: str | None = Query(default=None),
+    mode_total: ModeTotal | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_db),
+    klaim: KlaimToken = Depends(
+        require_peran_klaim_async(PeranPengguna.admin_sekolah, PeranPengguna.keuangan)
     ),
 ) -> PaginatedResponse[TagihanDetail]:
     if jenis_tagihan is None:
@@ -228,37 +292,39 @@ def daftar_tagihan(
                 raise HTTPException(
                     status_code=422, detail="Jenis tagihan tidak valid"
                 ) from exc
+    sekolah_id = _get_sekolah_id(klaim)
     query = (
-        db.query(Tagihan)
+        select(Tagihan)
         .options(
             selectinload(Tagihan.siswa),
             selectinload(Tagihan.pembayaran),
         )
-        .filter(Tagihan.sekolah_id == _get_sekolah_id(pengguna))
+        .where(Tagihan.sekolah_id == sekolah_id)
     )
 
     if status_tagihan is not None:
-        query = query.filter(Tagihan.status_tagihan == status_tagihan)
+        query = query.where(Tagihan.status_tagihan == status_tagihan)
     if jenis_tagihan is not None:
-        query = query.filter(Tagihan.jenis_tagihan == jenis_tagihan)
+        query = query.where(Tagihan.jenis_tagihan == jenis_tagihan)
     if bulan is not None:
-        query = query.filter(Tagihan.periode_bulan == bulan)
+        query = query.where(Tagihan.periode_bulan == bulan)
     if tahun is not None:
-        query = query.filter(Tagihan.periode_tahun == tahun)
+        query = query.where(Tagihan.periode_tahun == tahun)
     if siswa_id:
-        query = query.filter(Tagihan.siswa_id == siswa_id)
-
-    query = query.order_by(Tagihan.tanggal_jatuh_tempo.asc())
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[TagihanDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+        query = query.where(Tagihan.siswa_id == siswa_id)
+
+    items, meta = await paginate_keyset_async(
+        db,
+        query,
+        page,
+        limit,
+        sort_column=Tagihan.tanggal_jatuh_tempo,
+        id_column=Tagihan.id,
+        cursor=cursor,
+        mode_total=mode_total or ModeTotal.cached,
+        tenant=sekolah_id,
     )
+    return PaginatedResponse[TagihanDetail](items=items, meta=meta)
 
 
 @router.get("/{tagihan_id}", response_model=TagihanDetail)
@@ -8,8 +8,8 @@ from app.schemas.tahun_ajaran import (
     TahunAjaranDetail,
     TahunAjaranUpdate,
 )
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_query
 from app.core.responses import EnvelopeAPIRoute
 
 
@@ -54,6 +54,7 @@ def tambah_tahun_ajaran(
 def daftar_tahun_ajaran(
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    mode_total: ModeTotal | None = Query(default=None),
     db: Session = Depends(get_db),
     pengguna: Pengguna = Depends(
         require_peran(PeranPengguna.admin_sekolah, PeranPengguna.guru)
@@ -64,16 +65,14 @@ def daftar_tahun_ajaran(
         .filter(TahunAjaran.sekolah_id == _get_sekolah_id(pengguna))
         .order_by(TahunAjaran.tanggal_mulai.desc())
     )
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[TahunAjaranDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = paginate_query(
+        query,
+        page,
+        limit,
+        mode_total=mode_total or ModeTotal.exact,
+        tenant=pengguna.sekolah_id,
     )
+    return PaginatedResponse[TahunAjaranDetail](items=items, meta=meta)
 
 
 @router.get("/{tahun_ajaran_id}", response_model=TahunAjaranDetail)
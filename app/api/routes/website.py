@@ -1,8 +1,9 @@
 from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import or_
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, selectinload
-from app.core.deps import get_db, require_peran
+from app.core.deps import get_async_read_db, get_db, require_peran
 from app.models import (
     Pengguna,
     PeranPengguna,
@@ -15,8 +16,8 @@ from app.schemas.website import (
     WebsiteKontenUpdate,
     WebsiteKontenDetail,
 )
-from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.utils.pagination import paginate_query
+from app.schemas.pagination import PaginatedResponse
+from app.utils.pagination import ModeTotal, paginate_query, paginate_query_async
 from app.utils.slug import buat_slug, slug_unik_generator
 from app.core.responses import EnvelopeAPIRoute
 
@@ -92,6 +93,7 @@ def daftar_konten_admin(
     cari: str | None = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    mode_total: ModeTotal | None = Query(default=None),
     db: Session = Depends(get_db),
     pengguna: Pengguna = Depends(require_peran(PeranPengguna.admin_sekolah)),
 ) -> PaginatedResponse[WebsiteKontenDetail]:
@@ -114,16 +116,14 @@ def daftar_konten_admin(
             )
         )
     query = query.order_by(WebsiteKonten.dibuat_pada.desc())
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[WebsiteKontenDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = paginate_query(
+        query,
+        page,
+        limit,
+        mode_total=mode_total or ModeTotal.exact,
+        tenant=sekolah_id,
     )
+    return PaginatedResponse[WebsiteKontenDetail](items=items, meta=meta)
 
 
 @router.get(
@@ -221,27 +221,28 @@ def hapus_konten(
 
 
 @router.get("/public/konten", response_model=PaginatedResponse[WebsiteKontenDetail])
-def daftar_konten_public(
+async def daftar_konten_public(
     sekolah_id: str,
     jenis: JenisKonten | None = Query(default=None),
     cari: str | None = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    mode_total: ModeTotal | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_read_db),
 ) -> PaginatedResponse[WebsiteKontenDetail]:
     query = (
-        db.query(WebsiteKonten)
+        select(WebsiteKonten)
         .options(selectinload(WebsiteKonten.penulis))
-        .filter(
+        .where(
             WebsiteKonten.sekolah_id == sekolah_id,
             WebsiteKonten.status == StatusKonten.terbit,
         )
     )
     if jenis:
-        query = query.filter(WebsiteKonten.jenis == jenis)
+        query = query.where(WebsiteKonten.jenis == jenis)
     if cari:
         pattern = f"%{cari.lower()}%"
-        query = query.filter(
+        query = query.where(
             or_(
                 WebsiteKonten.judul.ilike(pattern),
                 WebsiteKonten.ringkasan.ilike(pattern),
@@ -249,34 +250,34 @@ def daftar_konten_public(
         )
     query = query.order_by(WebsiteKonten.tanggal_terbit.desc(), WebsiteKonten.dibuat_pada.desc())
 
-    items, total, total_pages = paginate_query(query, page, limit)
-    return PaginatedResponse[WebsiteKontenDetail](
-        items=items,
-        meta=PaginationMeta(
-            page=page,
-            limit=limit,
-            total=total,
-            total_pages=total_pages,
-        ),
+    items, meta = await paginate_query_async(
+        db,
+        query,
+        page,
+        limit,
+        mode_total=mode_total or ModeTotal.exact,
+        tenant=sekolah_id,
     )
+    return PaginatedResponse[WebsiteKontenDetail](items=items, meta=meta)
 
 
 @router.get("/public/konten/{slug}", response_model=WebsiteKontenDetail)
-def konten_by_slug(
+async def konten_by_slug(
     slug: str,
     sekolah_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ) -> WebsiteKonten:
     konten = (
-        db.query(WebsiteKonten)
-        .options(selectinload(WebsiteKonten.penulis))
-        .filter(
-            WebsiteKonten.slug == slug,
-            WebsiteKonten.sekolah_id == sekolah_id,
-            WebsiteKonten.status == StatusKonten.terbit,
+        await db.execute(
+            select(WebsiteKonten)
+            .options(selectinload(WebsiteKonten.penulis))
+            .where(
+                WebsiteKonten.slug == slug,
+                WebsiteKonten.sekolah_id == sekolah_id,
+                WebsiteKonten.status == StatusKonten.terbit,
+            )
         )
-        .first()
-    )
+    ).scalars().first()
     if konten is None:
         raise HTTPException(status_code=404, detail="Konten tidak ditemukan")
     return konten
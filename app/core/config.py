@@ -1,21 +1,116 @@
-from pydantic import BaseModel, EmailStr
+from importlib.util import find_spec
+
+from pydantic import BaseModel, EmailStr, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     app_nama: str = "Sistem Sekolah Online"
-    app_env: str = "dev"
+    app_env: str = "dev"  # dev | test | production
     secret_key: str
     access_token_expire_minutes: int = 120
     refresh_token_expire_minutes: int = 60 * 24 * 7  # 7 hari
+    jwt_cache_maxsize: int = 10_000
+    kdf_rounds: int | None = None
+    kdf_pool_size: int | None = None
+    kdf_antrean_maks: int = 64
+    throttle_aktif: bool = True
+    throttle_store: str = "memori"  # memori | redis
+    throttle_redis_url: str | None = None
+    throttle_maxsize: int = 100_000
+    # Format "jumlah/detik": jumlah percobaan per jendela waktu.
+    throttle_login_ip: str = "20/60"
+    throttle_login_email: str = "5/300"
+    throttle_lupa_sandi_ip: str = "5/600"
+    throttle_lupa_sandi_email: str = "3/3600"
+    # Jumlah reverse proxy tepercaya di depan aplikasi; 0 berarti X-Forwarded-For
+    # diabaikan dan IP koneksi dipakai apa adanya.
+    proxy_tepercaya: int = 0
     database_url: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 30 * 60
+    db_statement_timeout_ms: int | None = None
+    # Token untuk /health/detail dan /metrics (Authorization: Bearer <token>);
+    # tanpa token kedua endpoint tersebut tidak tersedia.
+    metrik_token: str | None = None
+    sql_instrumentasi_aktif: bool = True
+    # Statement yang sama lebih dari N kali per request dicatat sebagai N+1
+    # (dilempar sebagai error bila APP_ENV=test).
+    sql_n_plus_1_batas: int = 10
+    # Statement lebih lama dari ambang ini (ms) disimpan beserta EXPLAIN-nya;
+    # kosongkan untuk menonaktifkan.
+    sql_lambat_ms: int | None = None
+    sql_lambat_buffer: int = 200
+    database_replica_url: str | None = None
+    replika_lag_maks_detik: float = 5.0
+    replika_cek_interval_detik: float = 5.0
+    replika_sticky_detik: float = 10.0
     email_sender: str = "ahyo.haryanto@gmail.com"
     email_sender_name: str = "Sistem Sekolah Online"
     base_url: str = "http://localhost:8000"
     timezone: str = "Asia/Jakarta"
     brevo_api_key: str | None = None
+    brevo_host: str | None = None
+    brevo_pool_size: int = 10
+    brevo_batch_maks: int = 1000
+    brevo_timeout_detik: int = 30
+    email_transport: str = "brevo"  # brevo | file | smtp
+    email_file_dir: str = "var/email"
+    email_smtp_host: str = "localhost"
+    email_smtp_port: int = 1025
+    email_outbox_aktif: bool = True
+    email_outbox_interval_detik: float = 2.0
+    email_outbox_batch: int = 50
+    email_outbox_konkurensi: int = 4
+    email_outbox_maks_percobaan: int = 6
+    email_outbox_backoff_detik: int = 30
+    email_outbox_backoff_maks_detik: int = 60 * 60
+    email_outbox_sewa_detik: int = 5 * 60
+    count_cache_ttl_seconds: int = 30
+    count_cache_maxsize: int = 2048
+    principal_cache_ttl_detik: int = 60
+    principal_cache_maxsize: int = 10_000
+    versi_token_cache_ttl_detik: int = 30
+    # Invalidasi principal antar-proses lewat LISTEN/NOTIFY Postgres; selama
+    # pendengar terputus cache principal tidak dipakai.
+    principal_notify_aktif: bool = True
+    principal_notify_jeda_detik: float = 5.0
+    laporan_cache_ttl_detik: int = 5 * 60
+    laporan_cache_maxsize: int = 1024
+    laporan_generasi_ttl_detik: float = 2.0
+    spp_job_workers: int = 2
+    spp_job_chunk_size: int = 500
+    spp_job_max_periode: int = 24
+    spp_job_sewa_detik: int = 5 * 60
+    sweep_menunggak_aktif: bool = True
+    sweep_menunggak_interval_detik: int = 60 * 60
+    token_retensi_aktif: bool = True
+    token_retensi_interval_detik: int = 6 * 60 * 60
+    token_retensi_batch: int = 1000
+    token_retensi_jeda_detik: float = 0.05
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False)
 
+    @model_validator(mode="after")
+    def _cek_throttle_store(self) -> "Settings":
+        if self.throttle_store not in ("memori", "redis"):
+            raise ValueError("THROTTLE_STORE harus 'memori' atau 'redis'")
+        if self.throttle_store == "redis":
+            if not self.throttle_redis_url:
+                raise ValueError("THROTTLE_REDIS_URL wajib diisi untuk THROTTLE_STORE=redis")
+            if find_spec("redis") is None:
+                raise ValueError("Paket redis belum terpasang untuk THROTTLE_STORE=redis")
+        return self
+
+    @model_validator(mode="after")
+    def _cek_timeout_brevo(self) -> "Settings":
+        # Request Brevo yang menggantung lebih lama dari sewa outbox membuat
+        # email yang sama diambil ulang worker lain dan terkirim dua kali.
+        if not 0 < self.brevo_timeout_detik < self.email_outbox_sewa_detik:
+            raise ValueError("BREVO_TIMEOUT_DETIK harus positif dan lebih kecil dari EMAIL_OUTBOX_SEWA_DETIK")
+        return self
+
 
 settings = Settings()
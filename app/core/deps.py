@@ -1,8 +1,23 @@
-from fastapi import Depends, HTTPException, status
+import hmac
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 from jose import JWTError
-from app.db.session import SessionLocal
+from app.db.replika import session_baca, session_baca_async
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.core.principal import (
+    KlaimToken,
+    ambil_principal,
+    klaim_dari_pengguna,
+    pengguna_dari_principal,
+    simpan_principal,
+    versi_token_aktif,
+    versi_token_aktif_async,
+)
+from app.core.config import settings
 from app.core.security import parse_token
 from app.models.pengguna import Pengguna, PeranPengguna
 
@@ -15,28 +30,148 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db(request: Request):
+    """Session untuk endpoint read-only; diarahkan ke replika bila tersedia."""
+    db = session_baca(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    async with await session_baca_async(request) as db:
+        yield db
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_pengguna_aktif(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> Pengguna:
+def _decode_token(token: str) -> dict:
     try:
         payload = parse_token(token)
-        sub = payload.get("sub")
     except JWTError:
         raise HTTPException(status_code=401, detail="Token tidak valid")
+    if not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Token tidak valid")
+    return payload
 
-    pengguna = (
-        db.query(Pengguna)
-        .filter(Pengguna.id == sub, Pengguna.status_aktif == True)
-        .first()
+
+def _cek_versi_token(payload: dict, versi_sekarang: int) -> None:
+    if "ver" in payload and payload["ver"] != versi_sekarang:
+        raise HTTPException(status_code=401, detail="Token sudah tidak berlaku")
+
+
+def _query_pengguna_aktif(sub: str):
+    return (
+        select(Pengguna)
+        .options(joinedload(Pengguna.sekolah), joinedload(Pengguna.guru))
+        .where(Pengguna.id == sub, Pengguna.status_aktif == True)
     )
+
+
+def _principal_valid(payload: dict):
+    principal = ambil_principal(payload["sub"])
+    if principal is None:
+        return None
+    if payload.get("ver", -1) > principal.pengguna.versi_token:
+        # Versi naik di proses lain; muat ulang dari database.
+        return None
+    _cek_versi_token(payload, principal.pengguna.versi_token)
+    return principal
+
+
+def _simpan_pengguna_aktif(payload: dict, pengguna: Pengguna | None) -> Pengguna:
     if not pengguna:
         raise HTTPException(status_code=401, detail="Pengguna tidak ditemukan/aktif")
+    _cek_versi_token(payload, pengguna.versi_token)
+    simpan_principal(pengguna)
     return pengguna
 
 
+def _pengguna_dari_payload(payload: dict, db: Session) -> Pengguna:
+    principal = _principal_valid(payload)
+    if principal is not None:
+        return pengguna_dari_principal(db, principal)
+    pengguna = db.execute(_query_pengguna_aktif(payload["sub"])).scalars().first()
+    return _simpan_pengguna_aktif(payload, pengguna)
+
+
+async def _pengguna_dari_payload_async(payload: dict, db: AsyncSession) -> Pengguna:
+    principal = _principal_valid(payload)
+    if principal is not None:
+        return await db.merge(principal.pengguna, load=False)
+    hasil = await db.execute(_query_pengguna_aktif(payload["sub"]))
+    return _simpan_pengguna_aktif(payload, hasil.scalars().first())
+
+
+def get_pengguna_aktif(
+    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+) -> Pengguna:
+    return _pengguna_dari_payload(_decode_token(token), db)
+
+
+async def get_pengguna_aktif_async(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> Pengguna:
+    return await _pengguna_dari_payload_async(_decode_token(token), db)
+
+
+def _punya_klaim(payload: dict) -> bool:
+    return "peran" in payload and "ver" in payload
+
+
+def _klaim_dari_payload(payload: dict, versi: int | None) -> KlaimToken:
+    if versi is None:
+        raise HTTPException(status_code=401, detail="Pengguna tidak ditemukan/aktif")
+    _cek_versi_token(payload, versi)
+    try:
+        peran = PeranPengguna(payload["peran"])
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Token tidak valid")
+    return KlaimToken(
+        pengguna_id=payload["sub"],
+        peran=peran,
+        sekolah_id=payload.get("sekolah_id"),
+        guru_id=payload.get("guru_id"),
+        versi=versi,
+    )
+
+
+def get_klaim_token(
+    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+) -> KlaimToken:
+    """Identitas pengguna langsung dari klaim token yang sudah diverifikasi.
+
+    Hanya versi token yang dicek terhadap pengguna (lewat cache) sehingga
+    token yang dicabut karena reset password, perubahan peran, atau
+    penonaktifan langsung ditolak. Token lama tanpa klaim tetap diterima
+    dengan memuat pengguna seperti ``get_pengguna_aktif``.
+    """
+    payload = _decode_token(token)
+    if not _punya_klaim(payload):
+        return klaim_dari_pengguna(_pengguna_dari_payload(payload, db))
+    return _klaim_dari_payload(
+        payload, versi_token_aktif(db, payload["sub"], payload["ver"])
+    )
+
+
+async def get_klaim_token_async(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> KlaimToken:
+    payload = _decode_token(token)
+    if not _punya_klaim(payload):
+        return klaim_dari_pengguna(await _pengguna_dari_payload_async(payload, db))
+    return _klaim_dari_payload(
+        payload, await versi_token_aktif_async(db, payload["sub"], payload["ver"])
+    )
+
+
 def require_peran(*peran_diizinkan: PeranPengguna):
     def wrapper(pengguna: Pengguna = Depends(get_pengguna_aktif)):
         if pengguna.peran not in peran_diizinkan:
@@ -44,3 +179,40 @@ def require_peran(*peran_diizinkan: PeranPengguna):
         return pengguna
 
     return wrapper
+
+
+def require_peran_klaim(*peran_diizinkan: PeranPengguna):
+    """Seperti ``require_peran`` tetapi hanya memakai klaim token."""
+
+    def wrapper(klaim: KlaimToken = Depends(get_klaim_token)):
+        if klaim.peran not in peran_diizinkan:
+            raise HTTPException(status_code=403, detail="Akses ditolak")
+        return klaim
+
+    return wrapper
+
+
+def require_peran_klaim_async(*peran_diizinkan: PeranPengguna):
+    """Seperti ``require_peran_klaim`` untuk route async."""
+
+    async def wrapper(klaim: KlaimToken = Depends(get_klaim_token_async)):
+        if klaim.peran not in peran_diizinkan:
+            raise HTTPException(status_code=403, detail="Akses ditolak")
+        return klaim
+
+    return wrapper
+
+
+def require_token_metrik(request: Request) -> None:
+    """Lindungi endpoint telemetri dengan ``METRIK_TOKEN``.
+
+    Endpoint tidak tersedia (404) bila token belum dikonfigurasi, sehingga
+    telemetri tidak pernah terbuka tanpa sengaja.
+    """
+    if not settings.metrik_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    skema, _, token = request.headers.get("authorization", "").partition(" ")
+    if skema.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), settings.metrik_token.encode()
+    ):
+        raise HTTPException(status_code=401, detail="Token metrik tidak valid")
@@ -0,0 +1,175 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+
+class KDFSibuk(Exception):
+    """Antrean hashing kata sandi sudah mencapai batas."""
+
+
+def buat_konteks_kdf(rounds: int | None = None) -> CryptContext:
+    opsi: dict[str, Any] = {}
+    if rounds:
+        opsi["pbkdf2_sha256__rounds"] = rounds
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto", **opsi)
+
+
+# Konteks di dalam proses worker; dibuat sekali per proses.
+_konteks_worker: CryptContext | None = None
+
+
+def _konteks(rounds: int | None) -> CryptContext:
+    global _konteks_worker
+    if _konteks_worker is None:
+        _konteks_worker = buat_konteks_kdf(rounds)
+    return _konteks_worker
+
+
+def _hash_di_worker(kata_sandi: str, rounds: int | None) -> str:
+    return _konteks(rounds).hash(kata_sandi)
+
+
+def _verifikasi_di_worker(kata_sandi: str, hash_sandi: str, rounds: int | None) -> bool:
+    return _konteks(rounds).verify(kata_sandi, hash_sandi)
+
+
+class KDFPool:
+    """Process pool khusus PBKDF2 dengan batas antrean dan metrik latensi.
+
+    Hashing berjalan di proses terpisah sehingga tidak memakan GIL maupun
+    slot threadpool anyio; pemanggil ``await`` hasilnya dari event loop.
+    Bila jumlah pekerjaan yang sedang berjalan/antre mencapai
+    ``antrean_maks`` permintaan baru langsung ditolak dengan ``KDFSibuk``.
+    Bila proses worker mati (OOM killer, segfault), pool menjadi rusak; pool
+    dibangun ulang dan pekerjaan dicoba sekali lagi.
+    """
+
+    def __init__(self, ukuran: int, antrean_maks: int, rounds: int | None = None) -> None:
+        self.ukuran = ukuran
+        self.antrean_maks = antrean_maks
+        self.rounds = rounds
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._antrean = 0
+        self._latensi: deque[float] = deque(maxlen=1024)
+        self.jumlah_selesai = 0
+        self.jumlah_ditolak = 0
+        self.jumlah_dibangun_ulang = 0
+        self.latensi_maks = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn agar worker tidak mewarisi koneksi database/thread proses induk.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.ukuran,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _buang_executor(self, rusak: ProcessPoolExecutor) -> None:
+        """Lepas executor yang rusak agar pemanggilan berikutnya membuat baru.
+
+        Hanya executor yang sama yang dibuang, sehingga beberapa pekerjaan
+        yang gagal bersamaan tidak membangun ulang pool berkali-kali.
+        """
+        with self._lock:
+            if self._executor is not rusak:
+                return
+            self._executor = None
+            self.jumlah_dibangun_ulang += 1
+        rusak.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(
+        self, fn: Callable[..., Any], *args: Any
+    ) -> tuple[Future, ProcessPoolExecutor]:
+        with self._lock:
+            if self._antrean >= self.antrean_maks:
+                self.jumlah_ditolak += 1
+                raise KDFSibuk()
+            self._antrean += 1
+            executor = self._get_executor()
+        mulai = time.perf_counter()
+        try:
+            future = executor.submit(fn, *args)
+        except Exception as exc:
+            with self._lock:
+                self._antrean -= 1
+            if isinstance(exc, BrokenProcessPool):
+                self._buang_executor(executor)
+            raise
+        future.add_done_callback(lambda _: self._selesai(mulai))
+        return future, executor
+
+    async def _jalankan(self, fn: Callable[..., Any], *args: Any) -> Any:
+        for percobaan in range(2):
+            try:
+                future, executor = self._submit(fn, *args)
+            except BrokenProcessPool:
+                if percobaan:
+                    raise
+                continue
+            try:
+                return await asyncio.wrap_future(future)
+            except BrokenProcessPool:
+                self._buang_executor(executor)
+                if percobaan:
+                    raise
+
+    def _selesai(self, mulai: float) -> None:
+        durasi = time.perf_counter() - mulai
+        with self._lock:
+            self._antrean -= 1
+            self.jumlah_selesai += 1
+            self._latensi.append(durasi)
+            self.latensi_maks = max(self.latensi_maks, durasi)
+
+    async def hash(self, kata_sandi: str) -> str:
+        return await self._jalankan(_hash_di_worker, kata_sandi, self.rounds)
+
+    async def verifikasi(self, kata_sandi: str, hash_sandi: str) -> bool:
+        return await self._jalankan(
+            _verifikasi_di_worker, kata_sandi, hash_sandi, self.rounds
+        )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            latensi = sorted(self._latensi)
+            antrean = self._antrean
+        def persentil(p: float) -> float | None:
+            if not latensi:
+                return None
+            return round(latensi[min(len(latensi) - 1, int(len(latensi) * p))] * 1000, 2)
+        return {
+            "ukuran": self.ukuran,
+            "antrean": antrean,
+            "antrean_maks": self.antrean_maks,
+            "selesai": self.jumlah_selesai,
+            "ditolak": self.jumlah_ditolak,
+            "dibangun_ulang": self.jumlah_dibangun_ulang,
+            "latensi_p50_ms": persentil(0.5),
+            "latensi_p95_ms": persentil(0.95),
+            "latensi_maks_ms": round(self.latensi_maks * 1000, 2),
+        }
+
+
+kdf_pool = KDFPool(
+    ukuran=settings.kdf_pool_size or min(4, os.cpu_count() or 1),
+    antrean_maks=settings.kdf_antrean_maks,
+    rounds=settings.kdf_rounds,
+)
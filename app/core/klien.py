@@ -0,0 +1,29 @@
+from fastapi import Request
+
+from app.core.config import settings
+
+
+def ip_klien(request: Request) -> str | None:
+    """Alamat IP klien asli dengan memperhitungkan reverse proxy tepercaya.
+
+    Di belakang ``PROXY_TEPERCAYA`` proxy, alamat koneksi adalah proxy
+    terakhir dan alamat klien diambil dari ``X-Forwarded-For`` pada posisi
+    ke-N dari kanan (entri yang ditambahkan proxy tepercaya terluar). Entri di
+    sebelah kirinya dapat dipalsukan klien sehingga tidak dipakai. Tanpa
+    proxy tepercaya header tersebut diabaikan seluruhnya, dan bila rantainya
+    lebih pendek dari jumlah proxy (request tidak melewati semua proxy) alamat
+    koneksi yang dipakai.
+    """
+    alamat = request.client.host if request.client else None
+    hop = settings.proxy_tepercaya
+    if hop <= 0:
+        return alamat
+    diteruskan = [
+        bagian.strip()
+        for nilai in request.headers.getlist("x-forwarded-for")
+        for bagian in nilai.split(",")
+        if bagian.strip()
+    ]
+    if len(diteruskan) < hop:
+        return alamat
+    return diteruskan[-hop]
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import logging
+from itertools import chain
+from typing import Any, NamedTuple
+
+import psycopg
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.guru import Guru
+from app.models.pengguna import Pengguna, PeranPengguna
+from app.models.sekolah import Sekolah
+from app.utils.cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class Principal(NamedTuple):
+    pengguna: Pengguna
+    peran: PeranPengguna
+    sekolah_id: str | None
+    guru_id: str | None
+
+
+class KlaimToken(NamedTuple):
+    pengguna_id: str
+    peran: PeranPengguna
+    sekolah_id: str | None
+    guru_id: str | None
+    versi: int
+
+
+_principal_cache = TTLCache(
+    maxsize=settings.principal_cache_maxsize, ttl=settings.principal_cache_ttl_detik
+)
+# (versi token, aktif) per pengguna; pengguna yang tidak ada disimpan sebagai
+# (-1, False).
+_versi_token_cache = TTLCache(
+    maxsize=settings.principal_cache_maxsize,
+    ttl=settings.versi_token_cache_ttl_detik,
+)
+
+_TABEL_PRINCIPAL = {"pengguna", "guru", "sekolah"}
+
+# Kanal NOTIFY untuk menyebarkan invalidasi ke semua proses. Payload berisi
+# daftar pasangan [pengguna_id, sekolah_id] atau "*" untuk semua entri.
+_KANAL_PRINCIPAL = "principal_berubah"
+_PAYLOAD_MAKS = 7000
+
+_pendengar: dict[str, Any] = {"terhubung": False, "notifikasi": 0}
+
+
+def _cache_dipercaya() -> bool:
+    """Cache hanya dipakai selama invalidasi dari proses lain bisa diterima.
+
+    Bila pendengar NOTIFY aktif tetapi belum/tidak terhubung, perubahan dari
+    proses lain bisa terlewat sehingga setiap request membaca database.
+    """
+    return not settings.principal_notify_aktif or _pendengar["terhubung"]
+
+
+def _salin_detached(obj: Any) -> Any:
+    """Salinan objek ORM yang tidak terikat session mana pun.
+
+    Hanya atribut kolom yang disalin; relasi diisi terpisah sehingga salinan
+    bisa di-``merge(load=False)`` ke session request tanpa query.
+    """
+    mapper = inspect(obj).mapper
+    salinan = mapper.class_(
+        **{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs}
+    )
+    make_transient_to_detached(salinan)
+    return salinan
+
+
+def simpan_principal(pengguna: Pengguna) -> Principal:
+    template = _salin_detached(pengguna)
+    sekolah = _salin_detached(pengguna.sekolah) if pengguna.sekolah else None
+    guru = _salin_detached(pengguna.guru) if pengguna.guru else None
+    set_committed_value(template, "sekolah", sekolah)
+    set_committed_value(template, "guru", guru)
+
+    principal = Principal(
+        pengguna=template,
+        peran=pengguna.peran,
+        sekolah_id=pengguna.sekolah_id,
+        guru_id=guru.id if guru else None,
+    )
+    _principal_cache.set(pengguna.id, principal)
+    return principal
+
+
+def ambil_principal(pengguna_id: str) -> Principal | None:
+    if not _cache_dipercaya():
+        return None
+    return _principal_cache.get(pengguna_id)
+
+
+def klaim_akses(pengguna: Pengguna) -> dict[str, Any]:
+    """Klaim peran dan tenant yang ditandatangani bersama token akses."""
+    return {
+        "peran": pengguna.peran.value,
+        "sekolah_id": pengguna.sekolah_id,
+        "guru_id": pengguna.guru_id,
+        "ver": pengguna.versi_token,
+    }
+
+
+def klaim_dari_pengguna(pengguna: Pengguna) -> KlaimToken:
+    return KlaimToken(
+        pengguna_id=pengguna.id,
+        peran=pengguna.peran,
+        sekolah_id=pengguna.sekolah_id,
+        guru_id=pengguna.guru_id,
+        versi=pengguna.versi_token,
+    )
+
+
+def _versi_token_select(pengguna_id: str):
+    return select(Pengguna.versi_token, Pengguna.status_aktif).where(
+        Pengguna.id == pengguna_id
+    )
+
+
+def _versi_tersimpan(
+    pengguna_id: str, versi_minimal: int | None
+) -> tuple[int, bool] | None:
+    """Versi dari cache, atau ``None`` bila harus dibaca dari database.
+
+    Token dengan ``ver`` lebih baru dari cache berarti versi sudah naik di
+    proses lain (reset password, perubahan peran, lalu login ulang); cache
+    lokal dianggap basi dan dibuang agar token baru yang sah tidak ditolak.
+    """
+    if not _cache_dipercaya():
+        return None
+    principal = _principal_cache.get(pengguna_id)
+    if principal is not None:
+        tersimpan = (principal.pengguna.versi_token, True)
+    else:
+        tersimpan = _versi_token_cache.get(pengguna_id)
+    basi = versi_minimal is not None and tersimpan is not None
+    if basi and tersimpan[0] < versi_minimal:
+        _principal_cache.pop(pengguna_id)
+        _versi_token_cache.pop(pengguna_id)
+        return None
+    return tersimpan
+
+
+def _simpan_versi(pengguna_id: str, row: Any) -> tuple[int, bool]:
+    tersimpan = (row.versi_token, bool(row.status_aktif)) if row else (-1, False)
+    _versi_token_cache.set(pengguna_id, tersimpan)
+    return tersimpan
+
+
+def versi_token_aktif(
+    db: Session, pengguna_id: str, versi_minimal: int | None = None
+) -> int | None:
+    """Versi token terkini pengguna aktif, atau ``None`` bila tidak aktif.
+
+    Memakai principal cache atau cache versi lebih dulu; query hanya satu
+    baris dan dijalankan paling sering sekali per TTL per pengguna, kecuali
+    ``versi_minimal`` (``ver`` token) lebih baru dari versi tersimpan.
+    """
+    tersimpan = _versi_tersimpan(pengguna_id, versi_minimal)
+    if tersimpan is None:
+        tersimpan = _simpan_versi(
+            pengguna_id, db.execute(_versi_token_select(pengguna_id)).first()
+        )
+    versi, aktif = tersimpan
+    return versi if aktif else None
+
+
+async def versi_token_aktif_async(
+    db: AsyncSession, pengguna_id: str, versi_minimal: int | None = None
+) -> int | None:
+    """Varian ``versi_token_aktif`` untuk ``AsyncSession``."""
+    tersimpan = _versi_tersimpan(pengguna_id, versi_minimal)
+    if tersimpan is None:
+        tersimpan = _simpan_versi(
+            pengguna_id, (await db.execute(_versi_token_select(pengguna_id))).first()
+        )
+    versi, aktif = tersimpan
+    return versi if aktif else None
+
+
+def pengguna_dari_principal(db: Session, principal: Principal) -> Pengguna:
+    """Pasang salinan pengguna dari cache ke session request tanpa query."""
+    return db.merge(principal.pengguna, load=False)
+
+
+def invalidasi_principal(
+    pengguna_id: str | None = None, sekolah_id: str | None = None
+) -> int:
+    if pengguna_id is None and sekolah_id is None:
+        jumlah = len(_principal_cache)
+        _principal_cache.clear()
+        _versi_token_cache.clear()
+        return jumlah
+    if pengguna_id is not None:
+        _versi_token_cache.pop(pengguna_id)
+    return _principal_cache.discard_where(
+        lambda key, principal: key == pengguna_id
+        or (sekolah_id is not None and principal.sekolah_id == sekolah_id)
+    )
+
+
+def metrik_principal_cache() -> dict[str, Any]:
+    return {**_principal_cache.stats(), "notify": dict(_pendengar)}
+
+
+@event.listens_for(Session, "after_flush")
+def _catat_perubahan_principal(session: Session, flush_context: Any) -> None:
+    perubahan = session.info.setdefault("principal_perubahan", set())
+    for obj in chain(session.dirty, session.deleted):
+        if isinstance(obj, Pengguna):
+            perubahan.add((obj.id, None))
+        elif isinstance(obj, Guru):
+            perubahan.add((obj.pengguna_id, None))
+        elif isinstance(obj, Sekolah):
+            perubahan.add((None, obj.id))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _catat_perubahan_principal_massal(orm_execute_state: Any) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None and table.name in _TABEL_PRINCIPAL:
+        orm_execute_state.session.info.setdefault("principal_perubahan", set()).add(
+            (None, None)
+        )
+
+
+@event.listens_for(Session, "before_commit")
+def _umumkan_perubahan_principal(session: Session) -> None:
+    """Kirim NOTIFY di transaksi yang sama; Postgres baru mengirimkannya ke
+    proses lain setelah COMMIT berhasil."""
+    session.flush()
+    perubahan = session.info.get("principal_perubahan")
+    if not perubahan:
+        return
+    payload = json.dumps(sorted(perubahan, key=str))
+    if (None, None) in perubahan or len(payload) > _PAYLOAD_MAKS:
+        payload = "*"
+    session.connection().execute(select(func.pg_notify(_KANAL_PRINCIPAL, payload)))
+
+
+def _terapkan_notifikasi(payload: str) -> None:
+    _pendengar["notifikasi"] += 1
+    if payload == "*":
+        invalidasi_principal()
+        return
+    for pengguna_id, sekolah_id in json.loads(payload):
+        invalidasi_principal(pengguna_id, sekolah_id)
+
+
+async def jalankan_pendengar_principal() -> None:
+    """LISTEN perubahan principal dari proses lain dan buang cache lokalnya.
+
+    Notifikasi yang terkirim saat koneksi putus tidak diulang, jadi setiap
+    kali (ulang) terhubung seluruh cache dibuang; selama terputus cache tidak
+    dipakai sama sekali.
+    """
+    url = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(url, autocommit=True) as conn:
+                await conn.execute(f"LISTEN {_KANAL_PRINCIPAL}")
+                invalidasi_principal()
+                _pendengar["terhubung"] = True
+                async for notifikasi in conn.notifies():
+                    _terapkan_notifikasi(notifikasi.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Pendengar invalidasi principal terputus: %s", exc)
+        finally:
+            _pendengar["terhubung"] = False
+        await asyncio.sleep(settings.principal_notify_jeda_detik)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidasi_principal_setelah_commit(session: Session) -> None:
+    for pengguna_id, sekolah_id in session.info.pop("principal_perubahan", ()):
+        invalidasi_principal(pengguna_id, sekolah_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _buang_perubahan_principal(session: Session) -> None:
+    session.info.pop("principal_perubahan", None)
@@ -8,9 +8,17 @@ from fastapi import Request, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse, Response
+from fastapi.datastructures import Default, DefaultPlaceholder
 from fastapi.routing import APIRoute
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
+from app.core.serializers import (
+    EncodedJSON,
+    ResponseSerializer,
+    dumps_json,
+    response_serializers,
+)
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_SUCCESS_MESSAGE = "berhasil"
@@ -57,14 +65,106 @@ def normalize_data_payload(data: Any) -> Any:
     return data
 
 
+def is_envelope_payload(payload: Any) -> bool:
+    return isinstance(payload, dict) and {"success", "message", "statusCode"}.issubset(
+        payload
+    )
+
+
+def normalize_success_payload(payload: Any) -> Tuple[str, Any]:
+    message = DEFAULT_SUCCESS_MESSAGE
+    data = payload
+
+    if isinstance(payload, dict):
+        if "success" in payload and "message" in payload:
+            message = str(payload.get("message", DEFAULT_SUCCESS_MESSAGE))
+            data = normalize_data_payload(payload.get("data"))
+        else:
+            payload_copy = dict(payload)
+            pesan = payload_copy.pop("pesan", None)
+            message = str(payload_copy.pop("message", pesan or DEFAULT_SUCCESS_MESSAGE))
+            payload_copy.pop("statusCode", None)
+
+            if "data" in payload_copy and len(payload_copy) == 1:
+                data = normalize_data_payload(payload_copy.get("data"))
+            elif "data" in payload_copy and len(payload_copy) > 1:
+                base_data = payload_copy.pop("data")
+                if isinstance(base_data, dict):
+                    merged = {**base_data, **payload_copy}
+                else:
+                    merged = {"data": base_data, **payload_copy}
+                data = normalize_data_payload(merged)
+            else:
+                data = payload_copy or None
+
+    return message, data
+
+
+class EnvelopeJSONResponse(JSONResponse):
+    """JSONResponse yang menulis envelope langsung saat render.
+
+    Konten yang diterima adalah hasil serialisasi ``response_model`` (tipe JSON
+    murni, atau ``EncodedJSON`` dari serializer terkompilasi), sehingga envelope
+    cukup dibentuk sekali tanpa parse ulang body maupun ``jsonable_encoder``.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, EncodedJSON):
+            if self.status_code >= 400:
+                return bytes(content)
+            return b"".join(
+                (
+                    b'{"success":true,"message":',
+                    dumps_json(DEFAULT_SUCCESS_MESSAGE),
+                    b',"data":',
+                    content,
+                    b',"statusCode":',
+                    str(self.status_code).encode("ascii"),
+                    b"}",
+                )
+            )
+
+        if self.status_code >= 400 or is_envelope_payload(content):
+            return dumps_json(content)
+
+        message, data = normalize_success_payload(content)
+        return dumps_json(
+            {
+                "success": True,
+                "message": message,
+                "data": data,
+                "statusCode": self.status_code,
+            }
+        )
+
+
 class EnvelopeAPIRoute(APIRoute):
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         response_model = kwargs.get("response_model")
         self.original_response_model = response_model
 
+        # Response bawaan diganti agar envelope ditulis sekali saat serialisasi.
+        response_class = kwargs.get("response_class", Default(JSONResponse))
+        if (
+            isinstance(response_class, DefaultPlaceholder)
+            and response_class.value is JSONResponse
+        ):
+            kwargs["response_class"] = Default(EnvelopeJSONResponse)
+
         super().__init__(*args, **kwargs)
 
     def get_route_handler(self):
+        # Serializer response dikompilasi sekali per rute saat startup.
+        response_field = self.secure_cloned_response_field
+        if (
+            response_field is not None
+            and not isinstance(response_field, ResponseSerializer)
+            and isinstance(self.response_class, DefaultPlaceholder)
+            and self.response_class.value is EnvelopeJSONResponse
+        ):
+            self.secure_cloned_response_field = response_serializers.for_field(
+                response_field, self.response_model
+            )
         original_route_handler = super().get_route_handler()
 
         async def custom_route_handler(request: Request) -> Response:
@@ -84,6 +184,9 @@ class EnvelopeAPIRoute(APIRoute):
                     content=content,
                     headers=headers,
                 )
+            if isinstance(response, EnvelopeJSONResponse):
+                return response
+
             if not isinstance(response, Response):
                 content = build_response_content(
                     success=True,
@@ -99,6 +202,8 @@ class EnvelopeAPIRoute(APIRoute):
             if response.media_type != "application/json":
                 return response
 
+            # Jalur lambat: endpoint mengembalikan Response sendiri sehingga
+            # body perlu dibaca ulang sebelum dibungkus.
             try:
                 body_bytes = response.body
             except (AttributeError, RuntimeError):
@@ -111,37 +216,10 @@ class EnvelopeAPIRoute(APIRoute):
                 except (json.JSONDecodeError, UnicodeDecodeError):
                     payload = body_bytes.decode(response.charset or "utf-8")
 
-            if isinstance(payload, dict) and {
-                "success",
-                "message",
-                "statusCode",
-            }.issubset(payload):
+            if is_envelope_payload(payload):
                 return response
 
-            message = DEFAULT_SUCCESS_MESSAGE
-            data = payload
-
-            if isinstance(payload, dict):
-                if "success" in payload and "message" in payload:
-                    message = str(payload.get("message", DEFAULT_SUCCESS_MESSAGE))
-                    data = normalize_data_payload(payload.get("data"))
-                else:
-                    payload_copy = dict(payload)
-                    pesan = payload_copy.pop("pesan", None)
-                    message = str(payload_copy.pop("message", pesan or DEFAULT_SUCCESS_MESSAGE))
-                    payload_copy.pop("statusCode", None)
-
-                    if "data" in payload_copy and len(payload_copy) == 1:
-                        data = normalize_data_payload(payload_copy.get("data"))
-                    elif "data" in payload_copy and len(payload_copy) > 1:
-                        base_data = payload_copy.pop("data")
-                        if isinstance(base_data, dict):
-                            merged = {**base_data, **payload_copy}
-                        else:
-                            merged = {"data": base_data, **payload_copy}
-                        data = normalize_data_payload(merged)
-                    else:
-                        data = payload_copy or None
+            message, data = normalize_success_payload(payload)
 
             wrapped_content = build_response_content(
                 success=True,
@@ -1,13 +1,13 @@
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Optional
 from jose import jwt
-from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.kdf import buat_konteks_kdf
+from app.utils.cache import TTLCache
 
-pwd_context = CryptContext(
-    schemes=["pbkdf2_sha256"],
-    deprecated="auto",
-)
+pwd_context = buat_konteks_kdf(settings.kdf_rounds)
 
 ALGORITHM = "HS256"
 
@@ -20,13 +20,44 @@ def verifikasi_kata_sandi(kata_sandi: str, hash_sandi: str) -> bool:
     return pwd_context.verify(kata_sandi, hash_sandi)
 
 
-def buat_token_akses(sub: str, expires_minutes: int | None = None) -> str:
+def buat_token_akses(
+    sub: str,
+    expires_minutes: int | None = None,
+    klaim: dict[str, Any] | None = None,
+) -> str:
     expire = datetime.now(timezone.utc) + timedelta(
         minutes=expires_minutes or settings.access_token_expire_minutes
     )
-    to_encode = {"sub": sub, "exp": expire}
+    to_encode = {**(klaim or {}), "sub": sub, "exp": expire}
     return jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
 
 
+# Payload token yang sudah terverifikasi, dikunci dengan digest token dan
+# disimpan paling lama sampai ``exp`` token tersebut.
+_token_cache = TTLCache(maxsize=settings.jwt_cache_maxsize, ttl=0)
+_secret_cache = settings.secret_key
+
+
 def parse_token(token: str) -> dict:
-    return jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
+    global _secret_cache
+    if _secret_cache != settings.secret_key:
+        bersihkan_cache_token()
+        _secret_cache = settings.secret_key
+
+    kunci = hashlib.sha256(token.encode()).digest()
+    payload = _token_cache.get(kunci)
+    if payload is None:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
+        sisa = payload.get("exp", 0) - time.time()
+        if sisa > 0:
+            _token_cache.set(kunci, payload, ttl=sisa)
+    return dict(payload)
+
+
+def bersihkan_cache_token() -> None:
+    """Buang semua payload tersimpan, mis. setelah ``secret_key`` dirotasi."""
+    _token_cache.clear()
+
+
+def metrik_token_cache() -> dict[str, Any]:
+    return _token_cache.stats()
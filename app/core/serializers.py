@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Sequence
+from typing import Any, get_origin
+
+from pydantic import BaseModel, TypeAdapter
+
+
+# Kunci tingkat atas yang diperlakukan khusus oleh normalisasi envelope.
+ENVELOPE_KEYS = frozenset({"success", "message", "pesan", "data", "statusCode"})
+
+
+def dumps_json(content: Any) -> bytes:
+    # Opsi sama dengan JSONResponse agar keluaran byte identik. Sengaja tidak
+    # memakai backend alternatif (mis. orjson) karena format float, NaN, dan
+    # kunci non-string-nya berbeda dari ``json.dumps``.
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class EncodedJSON(bytes):
+    """Data response yang sudah ter-encode menjadi JSON oleh pydantic-core."""
+
+
+def _splice_safe(annotation: Any) -> bool:
+    """Cek apakah hasil serialisasi bisa langsung menjadi ``data`` envelope.
+
+    Aman bila keluaran tingkat atas berupa array, atau objek model yang tidak
+    memiliki field bernama sama dengan kunci envelope (mis. ``pesan``).
+    """
+    origin = get_origin(annotation) or annotation
+    if isinstance(origin, type) and issubclass(origin, BaseModel):
+        if not annotation.model_fields:
+            return False
+        names = {
+            field.serialization_alias or field.alias or name
+            for name, field in annotation.model_fields.items()
+        }
+        return not (names | set(annotation.model_fields)) & ENVELOPE_KEYS
+    return (
+        isinstance(origin, type)
+        and issubclass(origin, (Sequence, set, frozenset))
+        and not issubclass(origin, (str, bytes))
+    )
+
+
+class ResponseSerializer:
+    """Serializer terkompilasi untuk satu rute ber-``response_model``.
+
+    Dipasang menggantikan response field FastAPI: validasi tetap didelegasikan
+    ke field asli, sedangkan serialisasi memakai ``TypeAdapter`` yang dibuat
+    saat startup dan langsung menghasilkan bytes JSON bila memungkinkan.
+    """
+
+    def __init__(self, field: Any, adapter: TypeAdapter[Any], splice_safe: bool) -> None:
+        self.field = field
+        self.adapter = adapter
+        self.splice_safe = splice_safe
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.field, name)
+
+    def validate(self, value: Any, values: Any = None, *, loc: tuple = ()) -> Any:
+        return self.field.validate(value, values or {}, loc=loc)
+
+    def serialize(self, value: Any, *, mode: str = "json", **options: Any) -> Any:
+        if mode == "json" and self.splice_safe:
+            return EncodedJSON(self.adapter.dump_json(value, **options))
+        return self.adapter.dump_python(value, mode=mode, **options)
+
+
+class ResponseSerializerRegistry:
+    """Cache adapter per tipe response; rute dengan model sama berbagi adapter."""
+
+    def __init__(self) -> None:
+        self._compiled: dict[Any, tuple[TypeAdapter[Any], bool]] = {}
+
+    def compile(self, annotation: Any) -> tuple[TypeAdapter[Any], bool]:
+        compiled = self._compiled.get(annotation)
+        if compiled is None:
+            compiled = (TypeAdapter(annotation), _splice_safe(annotation))
+            self._compiled[annotation] = compiled
+        return compiled
+
+    def for_field(self, field: Any, annotation: Any) -> ResponseSerializer:
+        adapter, splice_safe = self.compile(annotation)
+        return ResponseSerializer(field, adapter, splice_safe)
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+
+response_serializers = ResponseSerializerRegistry()
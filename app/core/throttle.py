@@ -0,0 +1,164 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Protocol
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.core.klien import ip_klien
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis opsional
+    redis = None
+
+
+class AturanBatas(NamedTuple):
+    """``kapasitas`` percobaan per ``jendela_detik`` dengan pengisian kontinu."""
+
+    kapasitas: int
+    jendela_detik: float
+
+    @classmethod
+    def parse(cls, nilai: str) -> "AturanBatas":
+        kapasitas, jendela = nilai.split("/", 1)
+        return cls(int(kapasitas), float(jendela))
+
+    @property
+    def laju(self) -> float:
+        return self.kapasitas / self.jendela_detik
+
+
+class PenyimpananBucket(Protocol):
+    def ambil(self, kunci: str, aturan: AturanBatas) -> float:
+        """Ambil satu token; kembalikan 0 bila diizinkan atau detik tunggu."""
+
+
+class PenyimpananBucketMemori:
+    """Token bucket per kunci di memori proses dengan eviksi LRU.
+
+    Bucket yang paling lama tidak disentuh dibuang saat jumlah kunci melewati
+    ``maxsize``; bucket yang dibuang sama dengan bucket penuh sehingga eviksi
+    hanya bisa membuat pembatasan lebih longgar, tidak pernah lebih ketat.
+    """
+
+    def __init__(self, maxsize: int, clock=time.monotonic) -> None:
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ambil(self, kunci: str, aturan: AturanBatas) -> float:
+        sekarang = self._clock()
+        with self._lock:
+            token, terakhir = self._data.get(kunci, (aturan.kapasitas, sekarang))
+            token = min(aturan.kapasitas, token + (sekarang - terakhir) * aturan.laju)
+            tunggu = 0.0
+            if token >= 1:
+                token -= 1
+            else:
+                tunggu = (1 - token) / aturan.laju
+            self._data[kunci] = (token, sekarang)
+            self._data.move_to_end(kunci)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return tunggu
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_SKRIP_BUCKET = """
+local kapasitas = tonumber(ARGV[1])
+local laju = tonumber(ARGV[2])
+local waktu = redis.call('TIME')
+local sekarang = tonumber(waktu[1]) + tonumber(waktu[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 't', 'w')
+local token = tonumber(data[1]) or kapasitas
+local terakhir = tonumber(data[2]) or sekarang
+token = math.min(kapasitas, token + (sekarang - terakhir) * laju)
+local tunggu = 0
+if token >= 1 then
+    token = token - 1
+else
+    tunggu = (1 - token) / laju
+end
+redis.call('HSET', KEYS[1], 't', tostring(token), 'w', tostring(sekarang))
+redis.call('PEXPIRE', KEYS[1], math.ceil(kapasitas / laju * 1000))
+return tostring(tunggu)
+"""
+
+
+class PenyimpananBucketRedis:
+    """Token bucket bersama antar worker/instance lewat skrip Lua atomik."""
+
+    def __init__(self, url: str, prefix: str = "throttle:") -> None:
+        if redis is None:
+            raise RuntimeError("Paket redis belum terpasang untuk THROTTLE_STORE=redis")
+        self.prefix = prefix
+        self._klien = redis.Redis.from_url(url)
+        self._skrip = self._klien.register_script(_SKRIP_BUCKET)
+
+    def ambil(self, kunci: str, aturan: AturanBatas) -> float:
+        return float(
+            self._skrip(keys=[self.prefix + kunci], args=[aturan.kapasitas, aturan.laju])
+        )
+
+
+def _buat_penyimpanan() -> PenyimpananBucket:
+    if settings.throttle_store == "redis":
+        return PenyimpananBucketRedis(settings.throttle_redis_url)
+    return PenyimpananBucketMemori(settings.throttle_maxsize)
+
+
+penyimpanan: PenyimpananBucket = _buat_penyimpanan()
+
+ATURAN = {
+    "login": (
+        AturanBatas.parse(settings.throttle_login_ip),
+        AturanBatas.parse(settings.throttle_login_email),
+    ),
+    "lupa_sandi": (
+        AturanBatas.parse(settings.throttle_lupa_sandi_ip),
+        AturanBatas.parse(settings.throttle_lupa_sandi_email),
+    ),
+}
+
+_ditolak: dict[str, int] = {nama: 0 for nama in ATURAN}
+
+
+def batasi(nama: str, request: Request, email: str) -> None:
+    """Tolak dengan 429 bila bucket IP atau email untuk ``nama`` sudah habis.
+
+    Dipanggil paling awal di handler, sebelum query maupun hashing, agar
+    lonjakan percobaan hanya memakan satu operasi dictionary per request.
+    """
+    if not settings.throttle_aktif:
+        return
+    aturan_ip, aturan_email = ATURAN[nama]
+    ip = ip_klien(request) or "-"
+    tunggu = penyimpanan.ambil(f"{nama}:ip:{ip}", aturan_ip)
+    if not tunggu:
+        tunggu = penyimpanan.ambil(
+            f"{nama}:email:{email.strip().lower()}", aturan_email
+        )
+    if tunggu:
+        _ditolak[nama] += 1
+        detik = max(1, math.ceil(tunggu))
+        raise HTTPException(
+            status_code=429,
+            detail=f"Terlalu banyak percobaan, coba lagi dalam {detik} detik",
+            headers={"Retry-After": str(detik)},
+        )
+
+
+def metrik_throttle() -> dict[str, Any]:
+    metrik: dict[str, Any] = {
+        "store": settings.throttle_store,
+        "ditolak": dict(_ditolak),
+    }
+    if isinstance(penyimpanan, PenyimpananBucketMemori):
+        metrik["jumlah_kunci"] = len(penyimpanan)
+    return metrik
@@ -0,0 +1,151 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.db.query_lambat import catat_query_lambat
+
+
+logger = logging.getLogger(__name__)
+
+
+class NPlusSatuTerdeteksi(Exception):
+    """Statement yang sama berulang melebihi batas dalam satu request."""
+
+
+class StatistikSQL:
+    """Jumlah statement dan waktu database untuk satu request."""
+
+    __slots__ = ("scope", "jumlah", "durasi", "per_statement", "dilaporkan")
+
+    def __init__(self, scope: dict | None = None) -> None:
+        self.scope = scope
+        self.jumlah = 0
+        self.durasi = 0.0
+        self.per_statement: Counter[str] = Counter()
+        self.dilaporkan: set[str] = set()
+
+
+_statistik: ContextVar[StatistikSQL | None] = ContextVar("statistik_sql", default=None)
+
+# Ambang query lambat dalam detik; ``None`` berarti log query lambat nonaktif.
+_AMBANG_LAMBAT = (
+    settings.sql_lambat_ms / 1000 if settings.sql_lambat_ms is not None else None
+)
+
+_SPASI = re.compile(r"\s+")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|(?<![\w$])\d+(?:\.\d+)?\b")
+_PARAM = r"(?:\?|%\(\w+\)s|%s|\$\d+)"
+_DAFTAR_PARAM = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)")
+
+
+@lru_cache(maxsize=2048)
+def normalisasi_sql(statement: str) -> str:
+    """Bentuk statement tanpa literal dan dengan daftar ``IN (...)`` diringkas,
+    sehingga query yang sama dengan parameter berbeda dianggap satu."""
+    hasil = _LITERAL.sub("?", _SPASI.sub(" ", statement).strip())
+    return _DAFTAR_PARAM.sub("(...)", hasil)
+
+
+def _sebelum_eksekusi(conn, cursor, statement, parameters, context, executemany):
+    if _AMBANG_LAMBAT is not None or _statistik.get() is not None:
+        context._instrumentasi_mulai = time.perf_counter()
+
+
+def _setelah_eksekusi(conn, cursor, statement, parameters, context, executemany):
+    mulai = getattr(context, "_instrumentasi_mulai", None)
+    if mulai is None:
+        return
+    durasi = time.perf_counter() - mulai
+    statistik = _statistik.get()
+    if _AMBANG_LAMBAT is not None and durasi >= _AMBANG_LAMBAT:
+        catat_query_lambat(
+            conn,
+            statement,
+            parameters,
+            executemany,
+            durasi,
+            statistik.scope if statistik is not None else None,
+        )
+    if statistik is None:
+        return
+    statistik.durasi += durasi
+    statistik.jumlah += 1
+
+    kunci = normalisasi_sql(statement)
+    statistik.per_statement[kunci] += 1
+    jumlah = statistik.per_statement[kunci]
+    if jumlah > settings.sql_n_plus_1_batas and kunci not in statistik.dilaporkan:
+        statistik.dilaporkan.add(kunci)
+        if settings.app_env == "test":
+            raise NPlusSatuTerdeteksi(
+                f"Statement diulang {jumlah} kali dalam satu request: {kunci[:300]}"
+            )
+
+
+def pasang_instrumentasi(engine: Engine) -> None:
+    """Hitung statement dan waktu database per request pada ``engine``.
+
+    Statement yang melebihi ``SQL_LAMBAT_MS`` juga dicatat ke log query
+    lambat. Di luar request yang diinstrumentasi dan dengan log query lambat
+    nonaktif, kedua hook hanya membaca satu ``ContextVar``.
+    """
+    event.listen(engine, "before_cursor_execute", _sebelum_eksekusi)
+    event.listen(engine, "after_cursor_execute", _setelah_eksekusi)
+
+
+def statistik_sql() -> StatistikSQL | None:
+    """Statistik request yang sedang berjalan, bila ada."""
+    return _statistik.get()
+
+
+class InstrumentasiSQLMiddleware:
+    """Middleware ASGI yang menambahkan header ``Server-Timing`` berisi jumlah
+    statement dan waktu database, serta mencatat pola N+1 per request."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        statistik = StatistikSQL(scope)
+        token = _statistik.set(statistik)
+        mulai = time.perf_counter()
+
+        async def kirim(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - mulai) * 1000
+                nilai = (
+                    f'db;dur={statistik.durasi * 1000:.2f};desc="{statistik.jumlah} query", '
+                    f"app;dur={total_ms:.2f}"
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", nilai.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, kirim)
+        finally:
+            _statistik.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            for kunci in statistik.dilaporkan:
+                logger.warning(
+                    "Kemungkinan N+1 pada %s %s: statement diulang %s kali (%s query total): %s",
+                    scope["method"],
+                    route,
+                    statistik.per_statement[kunci],
+                    statistik.jumlah,
+                    kunci[:300],
+                )
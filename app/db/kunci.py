@@ -0,0 +1,35 @@
+import logging
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import exc, func, select
+
+from app.db.session import engine
+
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def kunci_advisory(kunci: int) -> Iterator[bool]:
+    """Coba ambil advisory lock ``kunci`` selama blok ``with`` berjalan.
+
+    Menghasilkan ``True`` bila kunci didapat, ``False`` bila dipegang proses
+    lain. Lock level session terikat pada koneksinya, jadi kunci diambil dan
+    dilepas pada satu koneksi khusus (AUTOCOMMIT, tidak menahan transaksi)
+    yang tidak kembali ke pool selama blok berjalan; pekerjaan di dalam blok
+    memakai session sendiri. Bila pelepasan gagal, koneksi dibuang sehingga
+    server ikut melepas kuncinya.
+    """
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        terkunci = conn.execute(select(func.pg_try_advisory_lock(kunci))).scalar_one()
+        try:
+            yield terkunci
+        finally:
+            if terkunci:
+                try:
+                    conn.execute(select(func.pg_advisory_unlock(kunci)))
+                except exc.DBAPIError:
+                    logger.warning("Gagal melepas advisory lock %s, koneksi dibuang", kunci)
+                    conn.invalidate()
@@ -0,0 +1,145 @@
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+
+
+class StatistikPool:
+    """Counter kumulatif satu pool koneksi (bertahan saat pool di-dispose)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkout = 0
+        self.koneksi_baru = 0
+        self.invalidasi = 0
+        self.timeout = 0
+        self.tunggu_total = 0.0
+        self.tunggu_maks = 0.0
+
+    def catat_tunggu(self, durasi: float, timeout: bool) -> None:
+        with self._lock:
+            self.tunggu_total += durasi
+            self.tunggu_maks = max(self.tunggu_maks, durasi)
+            if timeout:
+                self.timeout += 1
+
+    def tambah(self, nama: str) -> None:
+        with self._lock:
+            setattr(self, nama, getattr(self, nama) + 1)
+
+
+_statistik: dict[str, StatistikPool] = {}
+_engine: dict[str, Engine] = {}
+
+
+def _statistik_pool(nama: str) -> StatistikPool:
+    return _statistik.setdefault(nama, StatistikPool())
+
+
+class _PoolTerukurMixin:
+    """Ukur lama checkout (menunggu slot + membuka/ping koneksi) dan timeout."""
+
+    def connect(self):
+        statistik = _statistik_pool(self._orig_logging_name)
+        mulai = time.perf_counter()
+        timeout = False
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            timeout = True
+            raise
+        finally:
+            statistik.catat_tunggu(time.perf_counter() - mulai, timeout)
+
+
+class PoolTerukur(_PoolTerukurMixin, QueuePool):
+    pass
+
+
+class PoolAsyncTerukur(_PoolTerukurMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def opsi_pool(nama: str) -> dict[str, Any]:
+    """Argumen ``create_engine`` untuk pool berukuran dari ``Settings``."""
+    opsi: dict[str, Any] = {
+        "pool_pre_ping": True,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_logging_name": nama,
+    }
+    if settings.db_statement_timeout_ms:
+        opsi["connect_args"] = {
+            "options": f"-c statement_timeout={settings.db_statement_timeout_ms}"
+        }
+    return opsi
+
+
+def daftarkan_telemetri(engine: Engine, nama: str) -> None:
+    statistik = _statistik_pool(nama)
+    _engine[nama] = engine
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection: Any, connection_record: Any) -> None:
+        statistik.tambah("koneksi_baru")
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection: Any, connection_record: Any, proxy: Any) -> None:
+        statistik.tambah("checkout")
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidate(dbapi_connection: Any, connection_record: Any, exception: Any) -> None:
+        statistik.tambah("invalidasi")
+
+
+def metrik_pool() -> dict[str, dict[str, Any]]:
+    hasil = {}
+    for nama, engine in _engine.items():
+        pool = engine.pool
+        statistik = _statistik_pool(nama)
+        hasil[nama] = {
+            "ukuran": pool.size(),
+            "dipinjam": pool.checkedout(),
+            "tersedia": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "checkout_total": statistik.checkout,
+            "koneksi_baru_total": statistik.koneksi_baru,
+            "invalidasi_total": statistik.invalidasi,
+            "timeout_total": statistik.timeout,
+            "tunggu_detik_total": round(statistik.tunggu_total, 6),
+            "tunggu_detik_maks": round(statistik.tunggu_maks, 6),
+        }
+    return hasil
+
+
+_METRIK_PROMETHEUS = [
+    ("ukuran", "gauge", "Jumlah koneksi tetap pada pool"),
+    ("dipinjam", "gauge", "Koneksi yang sedang dipakai"),
+    ("tersedia", "gauge", "Koneksi menganggur di pool"),
+    ("overflow", "gauge", "Koneksi overflow yang sedang terbuka"),
+    ("checkout_total", "counter", "Jumlah checkout koneksi"),
+    ("koneksi_baru_total", "counter", "Jumlah koneksi baru ke database"),
+    ("invalidasi_total", "counter", "Jumlah koneksi yang diinvalidasi"),
+    ("timeout_total", "counter", "Checkout yang gagal karena pool_timeout"),
+    ("tunggu_detik_total", "counter", "Total waktu checkout dalam detik"),
+    ("tunggu_detik_maks", "gauge", "Waktu checkout terlama dalam detik"),
+]
+
+
+def format_prometheus(metrik: dict[str, dict[str, Any]]) -> str:
+    """Format ``metrik_pool()`` sebagai teks exposition Prometheus."""
+    baris = []
+    for kunci, tipe, keterangan in _METRIK_PROMETHEUS:
+        nama = f"db_pool_{kunci}"
+        baris.append(f"# HELP {nama} {keterangan}")
+        baris.append(f"# TYPE {nama} {tipe}")
+        for pool, nilai in metrik.items():
+            baris.append(f'{nama}{{pool="{pool}"}} {nilai[kunci]}')
+    return "\n".join(baris) + "\n"
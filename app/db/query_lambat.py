@@ -0,0 +1,123 @@
+import logging
+import threading
+from collections import deque
+from typing import Any
+
+from jose import JWTError
+
+from app.core.config import settings
+from app.core.security import parse_token
+from app.utils.waktu import sekarang
+
+
+logger = logging.getLogger(__name__)
+
+# Hanya statement DML/SELECT yang bisa di-EXPLAIN.
+_PERINTAH_EXPLAIN = ("select", "insert", "update", "delete", "with")
+_SAVEPOINT = "query_lambat_explain"
+_SQL_MAKS = 10_000
+
+_buffer: deque[dict[str, Any]] = deque(maxlen=settings.sql_lambat_buffer)
+_buffer_lock = threading.Lock()
+
+
+def _tipe(nilai: Any) -> str:
+    if isinstance(nilai, (list, tuple)):
+        return f"{type(nilai).__name__}[{len(nilai)}]"
+    return type(nilai).__name__
+
+
+def bentuk_parameter(parameters: Any, executemany: bool = False) -> Any:
+    """Tipe tiap parameter tanpa nilainya, agar data pengguna tidak tersimpan."""
+    if executemany:
+        return {
+            "jumlah_baris": len(parameters),
+            "baris": bentuk_parameter(parameters[0]) if parameters else None,
+        }
+    if isinstance(parameters, dict):
+        return {nama: _tipe(nilai) for nama, nilai in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_tipe(nilai) for nilai in parameters]
+    return None
+
+
+def _explain(conn: Any, statement: str, parameters: Any) -> Any:
+    """Rencana ``EXPLAIN (ANALYZE off, FORMAT JSON)`` tanpa menjalankan ulang
+    statement.
+
+    Dijalankan lewat cursor DBAPI langsung (tidak memicu event engine) di
+    dalam savepoint, sehingga EXPLAIN yang gagal tidak membatalkan transaksi
+    request.
+    """
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"SAVEPOINT {_SAVEPOINT}")
+        try:
+            cursor.execute(f"EXPLAIN (ANALYZE off, FORMAT JSON) {statement}", parameters)
+            rencana = cursor.fetchone()[0]
+        except Exception as exc:  # noqa: BLE001
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}")
+            rencana = {"error": str(exc)[:500]}
+        cursor.execute(f"RELEASE SAVEPOINT {_SAVEPOINT}")
+        return rencana
+    except Exception as exc:  # noqa: BLE001
+        return {"error": str(exc)[:500]}
+    finally:
+        cursor.close()
+
+
+def _sekolah_dari_scope(scope: dict) -> str | None:
+    for nama, nilai in scope.get("headers", []):
+        if nama == b"authorization":
+            skema, _, token = nilai.decode("latin-1").partition(" ")
+            if skema.lower() != "bearer" or not token:
+                return None
+            try:
+                return parse_token(token).get("sekolah_id")
+            except JWTError:
+                return None
+    return None
+
+
+def catat_query_lambat(
+    conn: Any,
+    statement: str,
+    parameters: Any,
+    executemany: bool,
+    durasi: float,
+    scope: dict | None,
+) -> None:
+    """Simpan statement lambat beserta rencananya ke ring buffer."""
+    route = None
+    sekolah_id = None
+    if scope is not None:
+        path = getattr(scope.get("route"), "path", scope["path"])
+        route = f"{scope['method']} {path}"
+        sekolah_id = _sekolah_dari_scope(scope)
+
+    rencana = None
+    if not executemany and statement.lstrip().lower().startswith(_PERINTAH_EXPLAIN):
+        rencana = _explain(conn, statement, parameters)
+
+    logger.warning(
+        "Query lambat %.1f ms pada %s: %s", durasi * 1000, route or "-", statement[:300]
+    )
+    entri = {
+        "waktu": sekarang(),
+        "durasi_ms": round(durasi * 1000, 3),
+        "route": route,
+        "sekolah_id": sekolah_id,
+        "sql": statement[:_SQL_MAKS],
+        "parameter": bentuk_parameter(parameters, executemany),
+        "rencana": rencana,
+    }
+    with _buffer_lock:
+        _buffer.append(entri)
+
+
+def daftar_query_lambat(sekolah_id: str | None, limit: int) -> list[dict[str, Any]]:
+    """Entri terbaru lebih dulu, hanya yang berasal dari request ``sekolah_id``."""
+    with _buffer_lock:
+        entri = list(_buffer)
+    hasil = [item for item in reversed(entri) if item["sekolah_id"] == sekolah_id]
+    return hasil[:limit]
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from typing import Any
+
+from fastapi import Request, Response
+from sqlalchemy import event, exc, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import session as db_session
+from app.utils.waktu import sekarang
+
+
+logger = logging.getLogger(__name__)
+
+# Status standby dan lag replika dalam detik. Lag 0 bila seluruh WAL yang
+# diterima sudah diputar ulang (replika idle tidak dianggap tertinggal) atau
+# server bukan standby. Karena itu lag saja tidak cukup: standby yang WAL
+# receiver-nya putus juga "selesai memutar ulang", sehingga keberadaan dan
+# status receiver ikut diperiksa. ``status`` hanya terlihat oleh role dengan
+# pg_read_all_stats; tanpa hak itu hanya keberadaan barisnya yang dipakai.
+_QUERY_LAG = text(
+    """
+    SELECT
+        pg_is_in_recovery() AS standby,
+        EXISTS (SELECT 1 FROM pg_stat_wal_receiver) AS receiver_aktif,
+        (SELECT status FROM pg_stat_wal_receiver) AS status_receiver,
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(
+                EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+            )
+        END AS lag
+    """
+)
+
+_status: dict[str, Any] = {
+    "sehat": False,
+    "lag_detik": None,
+    "diperiksa_pada": None,
+}
+_status_lock = threading.Lock()
+
+_metrik: dict[str, int] = {"replika": 0, "primary_sticky": 0, "primary_fallback": 0}
+
+METODE_BACA = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Penanda read-your-writes: waktu (epoch detik) sampai kapan bacaan pengirim
+# harus ke primary. Dibawa klien lewat cookie, atau header yang sama bagi
+# klien tanpa cookie jar, sehingga berlaku di worker/instance mana pun.
+COOKIE_STICKY = "baca_primary_sampai"
+HEADER_STICKY = "X-Baca-Primary-Sampai"
+
+
+def replika_aktif() -> bool:
+    return db_session.ReadSessionLocal is not None
+
+
+def _set_status(**nilai: Any) -> None:
+    with _status_lock:
+        _status.update(diperiksa_pada=sekarang().isoformat(), **nilai)
+
+
+def tandai_replika_gagal(error: Exception) -> None:
+    """Alihkan baca ke primary sampai pemeriksaan berikutnya berhasil."""
+    if _status["sehat"] or _status["diperiksa_pada"] is None:
+        logger.warning("Replika tidak dapat dipakai, baca memakai primary: %s", error)
+    else:
+        logger.debug("Replika masih tidak dapat dipakai: %s", error)
+    # Pesan error hanya dicatat ke log; bisa memuat host/DSN replika.
+    _set_status(sehat=False)
+
+
+def periksa_replika() -> dict[str, Any]:
+    """Ukur lag replika dan perbarui status sehat/tidaknya."""
+    try:
+        with db_session.read_engine.connect() as conn:
+            row = conn.execute(_QUERY_LAG).one()
+    except exc.SQLAlchemyError as error:
+        tandai_replika_gagal(error)
+        return dict(_status)
+
+    lag = float(row.lag)
+    if row.standby and (
+        not row.receiver_aktif
+        or (row.status_receiver is not None and row.status_receiver != "streaming")
+    ):
+        status_receiver = row.status_receiver or "tidak aktif"
+        tandai_replika_gagal(
+            RuntimeError(f"WAL receiver replika tidak streaming ({status_receiver})")
+        )
+        _set_status(lag_detik=round(lag, 3))
+    else:
+        sehat = lag <= settings.replika_lag_maks_detik
+        if not sehat and _status["sehat"]:
+            logger.warning("Lag replika %.1f detik, baca dialihkan ke primary", lag)
+        _set_status(sehat=sehat, lag_detik=round(lag, 3))
+    return dict(_status)
+
+
+if db_session.read_engine is not None:
+
+    @event.listens_for(db_session.read_engine, "handle_error")
+    @event.listens_for(db_session.async_read_engine.sync_engine, "handle_error")
+    def _putus_dari_replika(context: Any) -> None:
+        if context.is_disconnect:
+            tandai_replika_gagal(context.original_exception)
+
+
+def catat_penulisan(response: Response) -> None:
+    """Tandai pengirim request tulis agar bacaan berikutnya tetap ke primary.
+
+    Penanda dikirim ke klien (cookie dan header), bukan disimpan di proses,
+    sehingga bacaan berikutnya ke worker mana pun tetap melihat tulisannya.
+    """
+    sampai = time.time() + settings.replika_sticky_detik
+    response.set_cookie(
+        COOKIE_STICKY,
+        f"{sampai:.3f}",
+        max_age=math.ceil(settings.replika_sticky_detik),
+        httponly=True,
+        samesite="lax",
+        secure=settings.app_env == "production",
+    )
+    response.headers[HEADER_STICKY] = f"{sampai:.3f}"
+
+
+def _baru_menulis(request: Request) -> bool:
+    nilai = request.headers.get(HEADER_STICKY) or request.cookies.get(COOKIE_STICKY)
+    if not nilai:
+        return False
+    try:
+        sampai = float(nilai)
+    except ValueError:
+        return False
+    now = time.time()
+    # Nilai jauh melewati jendela sticky tidak mungkin dibuat server (kelonggaran
+    # satu jendela untuk selisih jam antar-instance); abaikan agar klien tidak
+    # bisa memaksa baca ke primary tanpa batas.
+    return now < sampai <= now + 2 * settings.replika_sticky_detik
+
+
+def _harus_primary(request: Request) -> bool:
+    if not _status["sehat"]:
+        _metrik["primary_fallback"] += 1
+        return True
+    if _baru_menulis(request):
+        _metrik["primary_sticky"] += 1
+        return True
+    return False
+
+
+def session_baca(request: Request) -> Session:
+    """Session untuk endpoint read-only: replika bila sehat, selain itu primary.
+
+    Primary dipakai bila replika tidak dikonfigurasi, sedang tertinggal lebih
+    dari ``REPLIKA_LAG_MAKS_DETIK``/tidak terjangkau, atau pengirim request
+    baru saja menulis (read-your-writes selama ``REPLIKA_STICKY_DETIK``).
+    Koneksi replika dibuka di sini sehingga replika yang mati langsung jatuh ke
+    primary alih-alih menggagalkan request.
+    """
+    if not replika_aktif() or _harus_primary(request):
+        return db_session.SessionLocal()
+    db = db_session.ReadSessionLocal()
+    try:
+        db.connection()
+    except exc.OperationalError as error:
+        db.close()
+        tandai_replika_gagal(error)
+        _metrik["primary_fallback"] += 1
+        return db_session.SessionLocal()
+    _metrik["replika"] += 1
+    return db
+
+
+async def session_baca_async(request: Request) -> AsyncSession:
+    """Versi async dari ``session_baca``."""
+    if not replika_aktif() or _harus_primary(request):
+        return db_session.AsyncSessionLocal()
+    db = db_session.AsyncReadSessionLocal()
+    try:
+        await db.connection()
+    except exc.OperationalError as error:
+        await db.close()
+        tandai_replika_gagal(error)
+        _metrik["primary_fallback"] += 1
+        return db_session.AsyncSessionLocal()
+    _metrik["replika"] += 1
+    return db
+
+
+def dari_replika(db: Session | AsyncSession) -> bool:
+    return bool(db.info.get("replika"))
+
+
+def metrik_replika() -> dict[str, Any]:
+    if not replika_aktif():
+        return {"aktif": False}
+    return {
+        "aktif": True,
+        **_status,
+        "baca": dict(_metrik),
+    }
+
+
+async def jalankan_pemantau_replika() -> None:
+    while True:
+        try:
+            await asyncio.to_thread(periksa_replika)
+        except Exception:
+            logger.exception("Pemeriksaan replika gagal")
+        await asyncio.sleep(settings.replika_cek_interval_detik)
+
@@ -1,6 +1,62 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.instrumentasi import pasang_instrumentasi
+from app.db.pool import PoolAsyncTerukur, PoolTerukur, daftarkan_telemetri, opsi_pool
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+engine = create_engine(
+    settings.database_url, poolclass=PoolTerukur, **opsi_pool("primary")
+)
+daftarkan_telemetri(engine, "primary")
+pasang_instrumentasi(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def url_async(database_url: str):
+    """URL yang sama dengan driver psycopg (mendukung asyncio)."""
+    return make_url(database_url).set(drivername="postgresql+psycopg")
+
+
+async_engine = create_async_engine(
+    url_async(settings.database_url),
+    poolclass=PoolAsyncTerukur,
+    **opsi_pool("primary_async"),
+)
+daftarkan_telemetri(async_engine.sync_engine, "primary_async")
+pasang_instrumentasi(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Replika baca (opsional). ``None`` bila ``DATABASE_REPLICA_URL`` tidak disetel;
+# pemilihan replika vs primary per request ada di ``app/db/replika.py``.
+read_engine = None
+ReadSessionLocal = None
+async_read_engine = None
+AsyncReadSessionLocal = None
+
+if settings.database_replica_url:
+    read_engine = create_engine(
+        settings.database_replica_url, poolclass=PoolTerukur, **opsi_pool("replica")
+    )
+    daftarkan_telemetri(read_engine, "replica")
+    pasang_instrumentasi(read_engine)
+    ReadSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, bind=read_engine, info={"replika": True}
+    )
+
+    async_read_engine = create_async_engine(
+        url_async(settings.database_replica_url),
+        poolclass=PoolAsyncTerukur,
+        **opsi_pool("replica_async"),
+    )
+    daftarkan_telemetri(async_read_engine.sync_engine, "replica_async")
+    pasang_instrumentasi(async_read_engine.sync_engine)
+    AsyncReadSessionLocal = async_sessionmaker(
+        async_read_engine,
+        autoflush=False,
+        expire_on_commit=False,
+        info={"replika": True},
+    )
@@ -1,17 +1,76 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from typing import Any
 
-from fastapi import FastAPI, status
+from fastapi import Depends, FastAPI, Request, status
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from app.api import api_router
 from app.core.config import settings
+from app.core.deps import require_token_metrik
+from app.core.kdf import kdf_pool
+from app.core.principal import (
+    jalankan_pendengar_principal,
+    metrik_principal_cache,
+)
+from app.core.security import metrik_token_cache
+from app.core.throttle import metrik_throttle
+from app.db.instrumentasi import InstrumentasiSQLMiddleware
+from app.db.pool import format_prometheus, metrik_pool
+from app.db.replika import (
+    METODE_BACA,
+    catat_penulisan,
+    jalankan_pemantau_replika,
+    metrik_replika,
+    replika_aktif,
+)
+from app.db.session import async_engine, async_read_engine
 from app.core.responses import (
     build_response_content,
     http_exception_handler,
     validation_exception_handler,
     unhandled_exception_handler,
 )
+from app.tasks.email_outbox import (
+    hentikan_worker_email,
+    jalankan_worker_email,
+    metrik_email_outbox,
+)
+from app.tasks.retensi_token import jalankan_retensi_berkala, metrik_retensi_token
+from app.tasks.tagihan_menunggak import jalankan_sweep_berkala, metrik_sweep_menunggak
+from app.tasks.tagihan_spp import (
+    hentikan_worker_tagihan_spp,
+    jalankan_pemulihan_job_spp,
+)
+from app.utils.laporan_cache import metrik_laporan_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tugas_berkala = [asyncio.create_task(jalankan_pemulihan_job_spp())]
+    if settings.principal_notify_aktif:
+        tugas_berkala.append(asyncio.create_task(jalankan_pendengar_principal()))
+    if settings.sweep_menunggak_aktif:
+        tugas_berkala.append(asyncio.create_task(jalankan_sweep_berkala()))
+    if settings.token_retensi_aktif:
+        tugas_berkala.append(asyncio.create_task(jalankan_retensi_berkala()))
+    if settings.email_outbox_aktif:
+        tugas_berkala.append(asyncio.create_task(jalankan_worker_email()))
+    if replika_aktif():
+        tugas_berkala.append(asyncio.create_task(jalankan_pemantau_replika()))
+    yield
+    for tugas in tugas_berkala:
+        tugas.cancel()
+        with suppress(asyncio.CancelledError):
+            await tugas
+    hentikan_worker_tagihan_spp()
+    hentikan_worker_email()
+    kdf_pool.shutdown()
+    await async_engine.dispose()
+    if async_read_engine is not None:
+        await async_read_engine.dispose()
 
 
 # test
@@ -19,6 +78,7 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title=settings.app_nama,
         version="0.1.0",
+        lifespan=lifespan,
     )
 
     app.add_middleware(
@@ -29,6 +89,20 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    if replika_aktif():
+
+        @app.middleware("http")
+        async def sticky_primary(request: Request, call_next):
+            # Read-your-writes: setelah request tulis berhasil, bacaan
+            # pengirim yang sama diarahkan ke primary untuk sementara.
+            response = await call_next(request)
+            if request.method not in METODE_BACA and response.status_code < 400:
+                catat_penulisan(response)
+            return response
+
+    if settings.sql_instrumentasi_aktif:
+        app.add_middleware(InstrumentasiSQLMiddleware)
+
     app.add_exception_handler(StarletteHTTPException, http_exception_handler)
     app.add_exception_handler(RequestValidationError, validation_exception_handler)
     app.add_exception_handler(Exception, unhandled_exception_handler)
@@ -42,6 +116,40 @@ def create_app() -> FastAPI:
             data={"status": "ok"},
         )
 
+    @app.get(
+        "/health/detail",
+        tags=["Health"],
+        dependencies=[Depends(require_token_metrik)],
+    )
+    def health_detail() -> dict[str, Any]:
+        return build_response_content(
+            success=True,
+            message="berhasil",
+            status_code=status.HTTP_200_OK,
+            data={
+                "status": "ok",
+                "db_pool": metrik_pool(),
+                "replika": metrik_replika(),
+                "sweep_menunggak": metrik_sweep_menunggak(),
+                "retensi_token": metrik_retensi_token(),
+                "email_outbox": metrik_email_outbox(),
+                "laporan_cache": metrik_laporan_cache(),
+                "principal_cache": metrik_principal_cache(),
+                "jwt_cache": metrik_token_cache(),
+                "kdf": kdf_pool.stats(),
+                "throttle": metrik_throttle(),
+            },
+        )
+
+    @app.get(
+        "/metrics",
+        include_in_schema=False,
+        response_class=PlainTextResponse,
+        dependencies=[Depends(require_token_metrik)],
+    )
+    def metrics() -> str:
+        return format_prometheus(metrik_pool())
+
     app.include_router(api_router)
     return app
 
@@ -29,11 +29,15 @@ from app.models.pembayaran import (
     StatusPembayaran,
     Tagihan,
     StatusTagihan,
+    JobTagihanSPP,
+    StatusJob,
+    GenerasiLaporan,
 )
 from app.models.pendaftaran import PendaftaranSiswa, StatusPendaftaran
 from app.models.referensi import JenisKelamin
 from app.models.website import WebsiteKonten, JenisKonten, StatusKonten
 from app.models.catatan import CatatanSiswa, KategoriCatatan
+from app.models.email import EmailOutbox, StatusEmail
 
 __all__ = [
     "Pengguna",
@@ -67,6 +71,9 @@ __all__ = [
     "StatusPembayaran",
     "Tagihan",
     "StatusTagihan",
+    "JobTagihanSPP",
+    "StatusJob",
+    "GenerasiLaporan",
     "JenisKelamin",
     "WebsiteKonten",
     "JenisKonten",
@@ -75,4 +82,6 @@ __all__ = [
     "StatusPendaftaran",
     "CatatanSiswa",
     "KategoriCatatan",
+    "EmailOutbox",
+    "StatusEmail",
 ]
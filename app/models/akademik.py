@@ -12,6 +12,8 @@ from sqlalchemy import (
     Numeric,
     Text,
     Boolean,
+    Index,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
@@ -178,6 +180,26 @@ class StatusKehadiran(PyEnum):
 
 class AbsensiSiswa(Base):
     __tablename__ = "absensi_siswa"
+    # Satu absensi per siswa, tanggal, dan mata pelajaran. Absensi harian
+    # (tanpa mata pelajaran) dijaga index terpisah karena NULL tidak dianggap
+    # sama oleh index unik biasa.
+    __table_args__ = (
+        Index(
+            "uq_absensi_siswa_mapel",
+            "siswa_id",
+            "tanggal",
+            "mata_pelajaran_id",
+            unique=True,
+            postgresql_where=text("mata_pelajaran_id IS NOT NULL"),
+        ),
+        Index(
+            "uq_absensi_siswa_harian",
+            "siswa_id",
+            "tanggal",
+            unique=True,
+            postgresql_where=text("mata_pelajaran_id IS NULL"),
+        ),
+    )
 
     id: Mapped[str] = mapped_column(
         String, primary_key=True, default=lambda: str(uuid.uuid4())
@@ -0,0 +1,51 @@
+import uuid
+from datetime import datetime, timezone
+from enum import Enum as PyEnum
+from sqlalchemy import String, Enum, DateTime, Index, Integer, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+
+class StatusEmail(PyEnum):
+    menunggu = "menunggu"
+    mengirim = "mengirim"
+    terkirim = "terkirim"
+    gagal = "gagal"
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_antrean",
+            "jadwal_kirim",
+            postgresql_where=text("status IN ('menunggu', 'mengirim')"),
+        ),
+    )
+
+    id: Mapped[str] = mapped_column(
+        String, primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    tujuan: Mapped[str] = mapped_column(String(255), nullable=False)
+    subjek: Mapped[str] = mapped_column(String(255), nullable=False)
+    isi_html: Mapped[str] = mapped_column(Text, nullable=False)
+    pengirim_email: Mapped[str | None] = mapped_column(String(255))
+    pengirim_nama: Mapped[str | None] = mapped_column(String(150))
+    status: Mapped[StatusEmail] = mapped_column(
+        Enum(StatusEmail, native_enum=False), nullable=False, default=StatusEmail.menunggu
+    )
+    jumlah_percobaan: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Waktu paling awal email boleh diambil worker: jadwal retry untuk status
+    # ``menunggu`` dan batas sewa untuk status ``mengirim``.
+    jadwal_kirim: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    pesan_error: Mapped[str | None] = mapped_column(Text)
+    dibuat_pada: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    terkirim_pada: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
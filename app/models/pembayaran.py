@@ -9,8 +9,12 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Text,
     Integer,
+    BigInteger,
+    JSON,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
@@ -37,8 +41,34 @@ class StatusTagihan(PyEnum):
     menunggak = "menunggak"
 
 
+class StatusJob(PyEnum):
+    menunggu = "menunggu"
+    berjalan = "berjalan"
+    selesai = "selesai"
+    gagal = "gagal"
+
+
 class Tagihan(Base):
     __tablename__ = "tagihan"
+    __table_args__ = (
+        # Hanya SPP yang unik per periode; tagihan lain (kegiatan, seragam,
+        # dst.) boleh lebih dari satu untuk siswa dan bulan yang sama.
+        Index(
+            "uq_tagihan_periode",
+            "sekolah_id",
+            "siswa_id",
+            "periode_bulan",
+            "periode_tahun",
+            unique=True,
+            postgresql_where=text("jenis_tagihan = 'spp'"),
+        ),
+        Index(
+            "ix_tagihan_jatuh_tempo_terbuka",
+            "sekolah_id",
+            "tanggal_jatuh_tempo",
+            postgresql_where=text("status_tagihan IN ('belum_dibayar', 'sebagian')"),
+        ),
+    )
 
     id: Mapped[str] = mapped_column(
         String, primary_key=True, default=lambda: str(uuid.uuid4())
@@ -123,3 +153,74 @@ class Pembayaran(Base):
     sekolah = relationship("Sekolah", back_populates="pembayaran")
     siswa = relationship("Siswa", back_populates="pembayaran")
     tagihan = relationship("Tagihan", back_populates="pembayaran")
+
+
+class JobTagihanSPP(Base):
+    __tablename__ = "job_tagihan_spp"
+    __table_args__ = (
+        Index(
+            "ix_job_tagihan_spp_belum_selesai",
+            "status",
+            postgresql_where=text("status IN ('menunggu', 'berjalan')"),
+        ),
+    )
+
+    id: Mapped[str] = mapped_column(
+        String, primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    sekolah_id: Mapped[str] = mapped_column(
+        String, ForeignKey("sekolah.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    dibuat_oleh_id: Mapped[str | None] = mapped_column(
+        String, ForeignKey("pengguna.id", ondelete="SET NULL")
+    )
+    status: Mapped[StatusJob] = mapped_column(
+        Enum(StatusJob, native_enum=False), nullable=False, default=StatusJob.menunggu
+    )
+    parameter: Mapped[dict] = mapped_column(JSON, nullable=False)
+    total_target: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    jumlah_diproses: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    jumlah_dibuat: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    jumlah_dilewati: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    pesan_error: Mapped[str | None] = mapped_column(Text)
+    dibuat_pada: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    dimulai_pada: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    selesai_pada: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    # Batas sewa worker untuk status ``berjalan``; diperpanjang setiap potongan.
+    # Job ``berjalan`` yang sewanya habis dianggap ditinggalkan dan dilanjutkan.
+    sewa_sampai: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    # Posisi potongan berikutnya: indeks periode, indeks kelompok tarif, dan
+    # id siswa terakhir yang sudah diproses.
+    checkpoint: Mapped[dict | None] = mapped_column(JSON)
+
+    @property
+    def progres(self) -> float:
+        if self.status == StatusJob.selesai:
+            return 100.0
+        if not self.total_target:
+            return 0.0
+        return round(self.jumlah_diproses * 100 / self.total_target, 2)
+
+
+class GenerasiLaporan(Base):
+    """Nomor generasi cache laporan per sekolah, dibagi semua proses.
+
+    Dinaikkan setiap kali data yang memengaruhi laporan pembayaran berubah;
+    entri cache laporan memakai nomor ini di kuncinya.
+    """
+
+    __tablename__ = "generasi_laporan"
+
+    sekolah_id: Mapped[str] = mapped_column(
+        String, ForeignKey("sekolah.id", ondelete="CASCADE"), primary_key=True
+    )
+    generasi: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    diubah_pada: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
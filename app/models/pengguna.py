@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import String, Boolean, Enum, ForeignKey
+from sqlalchemy import String, Boolean, Enum, ForeignKey, Integer, event, inspect
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from enum import Enum as PyEnum
 from app.db.base import Base
@@ -31,6 +31,7 @@ class Pengguna(Base):
         String, ForeignKey("sekolah.id", ondelete="SET NULL")
     )
     status_aktif: Mapped[bool] = mapped_column(Boolean, default=True)
+    versi_token: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
     sekolah = relationship("Sekolah", back_populates="pengguna")
     guru = relationship("Guru", back_populates="pengguna", uselist=False)
@@ -40,3 +41,14 @@ class Pengguna(Base):
     @property
     def guru_id(self) -> str | None:  # pragma: no cover - helper for schema
         return self.guru.id if self.guru else None
+
+
+# Perubahan yang membuat token akses lama tidak boleh dipakai lagi.
+KOLOM_PENCABUT_TOKEN = ("kata_sandi_hash", "peran", "sekolah_id", "status_aktif")
+
+
+@event.listens_for(Pengguna, "before_update")
+def _naikkan_versi_token(mapper, connection, target: Pengguna) -> None:
+    attrs = inspect(target).attrs
+    if any(attrs[kolom].history.has_changes() for kolom in KOLOM_PENCABUT_TOKEN):
+        target.versi_token = (target.versi_token or 0) + 1
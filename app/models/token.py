@@ -1,12 +1,19 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, Boolean, ForeignKey
+from sqlalchemy import String, DateTime, Boolean, ForeignKey, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
 
 
 class TokenVerifikasiEmail(Base):
     __tablename__ = "token_verifikasi_email"
+    __table_args__ = (
+        Index(
+            "ix_token_verifikasi_email_aktif",
+            "token",
+            postgresql_where=text("digunakan IS false"),
+        ),
+    )
 
     id: Mapped[str] = mapped_column(
         String, primary_key=True, default=lambda: str(uuid.uuid4())
@@ -24,6 +31,13 @@ class TokenVerifikasiEmail(Base):
 
 class TokenResetPassword(Base):
     __tablename__ = "token_reset_password"
+    __table_args__ = (
+        Index(
+            "ix_token_reset_password_aktif",
+            "token",
+            postgresql_where=text("digunakan IS false"),
+        ),
+    )
 
     id: Mapped[str] = mapped_column(
         String, primary_key=True, default=lambda: str(uuid.uuid4())
@@ -41,6 +55,13 @@ class TokenResetPassword(Base):
 
 class RefreshToken(Base):
     __tablename__ = "refresh_token"
+    __table_args__ = (
+        Index(
+            "ix_refresh_token_aktif",
+            "token",
+            postgresql_where=text("dicabut IS false"),
+        ),
+    )
 
     id: Mapped[str] = mapped_column(
         String, primary_key=True, default=lambda: str(uuid.uuid4())
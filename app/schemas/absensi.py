@@ -58,3 +58,37 @@ class AbsensiDetail(AbsensiCreate):
     kelas: KelasRingkas | None = None
     mata_pelajaran: MataPelajaranRingkas | None = None
     dicatat_oleh: GuruRingkas | None = None
+
+
+class AbsensiBulkItem(BaseModel):
+    siswa_id: str
+    status_kehadiran: StatusKehadiran
+    keterangan: str | None = Field(default=None, max_length=500)
+
+
+class AbsensiBulkCreate(BaseModel):
+    kelas_id: str
+    tanggal: date
+    mata_pelajaran_id: str | None = None
+    absensi: list[AbsensiBulkItem] = Field(..., min_length=1, max_length=500)
+
+
+class AbsensiBulkDicatat(BaseModel):
+    siswa_id: str
+    absensi_id: str
+
+
+class AbsensiBulkGagal(BaseModel):
+    indeks: int
+    siswa_id: str
+    pesan: str
+
+
+class AbsensiBulkHasil(BaseModel):
+    kelas_id: str
+    tanggal: date
+    mata_pelajaran_id: str | None = None
+    jumlah_dicatat: int
+    jumlah_gagal: int
+    dicatat: list[AbsensiBulkDicatat]
+    gagal: list[AbsensiBulkGagal]
@@ -0,0 +1,12 @@
+from datetime import datetime
+from typing import Any
+from pydantic import BaseModel
+
+
+class QueryLambatItem(BaseModel):
+    waktu: datetime
+    durasi_ms: float
+    route: str | None = None
+    sql: str
+    parameter: Any = None
+    rencana: Any = None
@@ -1,18 +1,35 @@
 from decimal import Decimal
+from enum import Enum as PyEnum
 from pydantic import BaseModel, Field
 from app.models.pembayaran import JenisPembayaran
 
 
+class KelompokLaporan(PyEnum):
+    bulan = "bulan"
+    jenis = "jenis"
+    kelas = "kelas"
+
+
 class LaporanPembayaranFilter(BaseModel):
     jenis: JenisPembayaran | None = None
     bulan: int | None = Field(default=None, ge=1, le=12)
     tahun: int | None = Field(default=None, ge=2000, le=2100)
 
 
-class LaporanPembayaranDetail(BaseModel):
+class LaporanPembayaranTotal(BaseModel):
     total_tagihan: Decimal
     total_dibayar: Decimal
     total_sisa: Decimal
     jumlah_tagihan: int
     jumlah_tagihan_lunas: int
     jumlah_tagihan_belum_lunas: int
+
+
+class LaporanPembayaranRincian(LaporanPembayaranTotal):
+    kunci: int | str | None = None
+    label: str | None = None
+
+
+class LaporanPembayaranDetail(LaporanPembayaranTotal):
+    group_by: KelompokLaporan | None = None
+    rincian: list[LaporanPembayaranRincian] | None = None
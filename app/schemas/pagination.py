@@ -9,8 +9,10 @@ T = TypeVar("T")
 class PaginationMeta(BaseModel):
     page: int
     limit: int
-    total: int
-    total_pages: int
+    total: int | None
+    total_pages: int | None
+    has_next: bool = False
+    next_cursor: str | None = None
 
 
 class PaginatedResponse(GenericModel, Generic[T]):
@@ -137,6 +137,24 @@ class SiswaDetail(SiswaBase):
     absensi: list[AbsensiRingkas] = Field(default_factory=list)
 
 
+class SiswaListItem(SiswaBase):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    sekolah_id: str
+    dibuat_pada: datetime
+    diperbarui_pada: datetime
+    kelas_aktif: KelasRingkas | None = None
+    total_tagihan_tertunggak: Decimal = Decimal("0.00")
+    persentase_kehadiran_bulan_ini: Decimal | None = None
+    # Koleksi lengkap hanya diisi bila diminta lewat parameter ``include``.
+    riwayat_kelas: list[SiswaKelasRiwayat] | None = None
+    tagihan: list[TagihanRingkas] | None = None
+    pembayaran: list[PembayaranRingkas] | None = None
+    nilai: list[NilaiRingkas] | None = None
+    absensi: list[AbsensiRingkas] | None = None
+
+
 class SiswaRingkas(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
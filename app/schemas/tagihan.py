@@ -2,7 +2,7 @@ from datetime import date, datetime
 from decimal import Decimal
 from pydantic import BaseModel, Field, ConfigDict
 from app.models.pembayaran import JenisPembayaran, StatusTagihan
-from app.models.pembayaran import StatusPembayaran
+from app.models.pembayaran import StatusJob, StatusPembayaran
 from app.schemas.siswa import SiswaRingkas
 
 
@@ -39,6 +39,45 @@ class TagihanSPPGenerate(BaseModel):
     kelas_id: str | None = None
 
 
+class TagihanSPPRingkasan(BaseModel):
+    bulan: int
+    tahun: int
+    jumlah_siswa: int
+    jumlah_dibuat: int
+    jumlah_dilewati: int
+
+
+class TarifKelas(BaseModel):
+    kelas_id: str
+    jumlah: Decimal = Field(..., ge=0)
+
+
+class JobTagihanSPPCreate(BaseModel):
+    bulan_awal: int = Field(..., ge=1, le=12)
+    tahun_awal: int = Field(..., ge=2000, le=2100)
+    bulan_akhir: int = Field(..., ge=1, le=12)
+    tahun_akhir: int = Field(..., ge=2000, le=2100)
+    jumlah: Decimal | None = Field(default=None, ge=0)
+    tarif_kelas: list[TarifKelas] = Field(default_factory=list)
+
+
+class JobTagihanSPPDetail(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    status: StatusJob
+    parameter: JobTagihanSPPCreate
+    total_target: int
+    jumlah_diproses: int
+    jumlah_dibuat: int
+    jumlah_dilewati: int
+    progres: float
+    pesan_error: str | None = None
+    dibuat_pada: datetime
+    dimulai_pada: datetime | None = None
+    selesai_pada: datetime | None = None
+
+
 class TagihanUpdate(BaseModel):
     nama_tagihan: str | None = Field(default=None, max_length=150)
     deskripsi: str | None = None
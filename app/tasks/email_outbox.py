@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models import EmailOutbox, StatusEmail
+from app.utils.email import PesanEmail, TransportEmail, buat_transport
+
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.email_outbox_konkurensi, thread_name_prefix="email-outbox"
+)
+
+_metrik: dict[str, Any] = {"terkirim": 0, "dicoba_ulang": 0, "gagal": 0}
+
+
+def metrik_email_outbox() -> dict[str, Any]:
+    return dict(_metrik)
+
+
+def jeda_percobaan(percobaan: int) -> timedelta:
+    """Backoff eksponensial: ``backoff * 2^(percobaan-1)`` dengan batas atas."""
+    detik = settings.email_outbox_backoff_detik * 2 ** (percobaan - 1)
+    return timedelta(seconds=min(detik, settings.email_outbox_backoff_maks_detik))
+
+
+def _klaim_email(db) -> list[Any]:
+    """Ambil email yang jatuh tempo dan tandai ``mengirim`` dengan sewa.
+
+    Email berstatus ``mengirim`` yang sewanya habis (worker mati di tengah
+    pengiriman) ikut diambil kembali.
+    """
+    now = datetime.now(timezone.utc)
+    kandidat = (
+        select(EmailOutbox.id)
+        .where(
+            EmailOutbox.status.in_([StatusEmail.menunggu, StatusEmail.mengirim]),
+            EmailOutbox.jadwal_kirim <= now,
+        )
+        .order_by(EmailOutbox.jadwal_kirim)
+        .limit(settings.email_outbox_batch)
+        .with_for_update(skip_locked=True)
+    )
+    baris = db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(kandidat.scalar_subquery()))
+        .values(
+            status=StatusEmail.mengirim,
+            jumlah_percobaan=EmailOutbox.jumlah_percobaan + 1,
+            jadwal_kirim=now + timedelta(seconds=settings.email_outbox_sewa_detik),
+        )
+        .returning(
+            EmailOutbox.id,
+            EmailOutbox.tujuan,
+            EmailOutbox.subjek,
+            EmailOutbox.isi_html,
+            EmailOutbox.pengirim_email,
+            EmailOutbox.pengirim_nama,
+            EmailOutbox.jumlah_percobaan,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return baris
+
+
+def _kirim(transport: TransportEmail, baris: Any) -> str | None:
+    try:
+        transport.kirim(
+            PesanEmail(
+                tujuan=baris.tujuan,
+                subjek=baris.subjek,
+                isi_html=baris.isi_html,
+                pengirim_email=baris.pengirim_email or settings.email_sender,
+                pengirim_nama=baris.pengirim_nama or settings.email_sender_name,
+            )
+        )
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Gagal mengirim email %s ke %s: %s", baris.id, baris.tujuan, exc)
+        return str(exc)[:1000] or exc.__class__.__name__
+    return None
+
+
+def proses_outbox(transport: TransportEmail | None = None) -> int:
+    """Kirim satu batch email dari outbox dan catat hasilnya.
+
+    Pengiriman berjalan paralel di ``_executor`` (maksimal
+    ``email_outbox_konkurensi``). Email gagal dijadwalkan ulang dengan backoff
+    eksponensial sampai ``email_outbox_maks_percobaan`` lalu ditandai ``gagal``.
+    Mengembalikan jumlah email yang diproses.
+    """
+    transport = transport or buat_transport()
+    db = SessionLocal()
+    try:
+        baris = _klaim_email(db)
+        if not baris:
+            return 0
+
+        hasil = _executor.map(lambda item: _kirim(transport, item), baris)
+        now = datetime.now(timezone.utc)
+        for item, error in zip(baris, hasil):
+            if error is None:
+                nilai = dict(status=StatusEmail.terkirim, terkirim_pada=now, pesan_error=None)
+                _metrik["terkirim"] += 1
+            elif item.jumlah_percobaan >= settings.email_outbox_maks_percobaan:
+                nilai = dict(status=StatusEmail.gagal, pesan_error=error)
+                _metrik["gagal"] += 1
+            else:
+                nilai = dict(
+                    status=StatusEmail.menunggu,
+                    jadwal_kirim=now + jeda_percobaan(item.jumlah_percobaan),
+                    pesan_error=error,
+                )
+                _metrik["dicoba_ulang"] += 1
+            db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id == item.id)
+                .values(**nilai)
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+        return len(baris)
+    finally:
+        db.close()
+
+
+def hentikan_worker_email() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def jalankan_worker_email() -> None:
+    while True:
+        try:
+            jumlah = await asyncio.to_thread(proses_outbox)
+            if jumlah >= settings.email_outbox_batch:
+                # Masih ada antrean; lanjutkan tanpa menunggu interval.
+                continue
+        except Exception:
+            logger.exception("Worker outbox email gagal")
+        await asyncio.sleep(settings.email_outbox_interval_detik)
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import delete, or_, select
+
+from app.core.config import settings
+from app.db.kunci import kunci_advisory
+from app.db.session import SessionLocal
+from app.models import RefreshToken, TokenResetPassword, TokenVerifikasiEmail
+from app.utils.waktu import sekarang
+
+
+logger = logging.getLogger(__name__)
+
+# Kunci advisory lock agar hanya satu proses yang menghapus pada satu waktu.
+_KUNCI_RETENSI = 0x746F6B6E
+
+# (model, kolom penanda token tidak berlaku lagi)
+_TABEL_TOKEN = [
+    (RefreshToken, RefreshToken.dicabut),
+    (TokenVerifikasiEmail, TokenVerifikasiEmail.digunakan),
+    (TokenResetPassword, TokenResetPassword.digunakan),
+]
+
+_metrik: dict[str, Any] = {
+    "terakhir_dijalankan": None,
+    "durasi_detik": None,
+    "jumlah_dihapus": {},
+    "berhasil": None,
+}
+
+
+def metrik_retensi_token() -> dict[str, Any]:
+    return dict(_metrik)
+
+
+def _hapus_per_potongan(db, model, kolom_mati, batas: datetime) -> int:
+    """Hapus token kedaluwarsa/dicabut per potongan menurut urutan id.
+
+    Setiap potongan maksimal ``token_retensi_batch`` baris dan di-commit
+    sendiri sehingga kunci baris hanya ditahan sebentar. Pencarian dilanjutkan
+    setelah id terakhir yang dihapus, jadi setiap baris hanya dipindai sekali.
+    """
+    total = 0
+    id_terakhir = ""
+    while True:
+        kandidat = (
+            select(model.id)
+            .where(
+                model.id > id_terakhir,
+                or_(model.kedaluwarsa < batas, kolom_mati.is_(True)),
+            )
+            .order_by(model.id)
+            .limit(settings.token_retensi_batch)
+            .with_for_update(skip_locked=True)
+        )
+        ids = db.execute(kandidat).scalars().all()
+        if ids:
+            db.execute(
+                delete(model)
+                .where(model.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+        total += len(ids)
+        if len(ids) < settings.token_retensi_batch:
+            return total
+        id_terakhir = ids[-1]
+        time.sleep(settings.token_retensi_jeda_detik)
+
+
+def hapus_token_kedaluwarsa() -> dict[str, int] | None:
+    """Hapus refresh token, token verifikasi email, dan token reset password
+    yang sudah kedaluwarsa atau tidak berlaku lagi.
+
+    Mengembalikan jumlah baris terhapus per tabel, atau ``None`` bila proses
+    lain sedang menjalankan retensi.
+    """
+    mulai = time.perf_counter()
+    batas = datetime.now(timezone.utc)
+    jumlah: dict[str, int] = {}
+    with kunci_advisory(_KUNCI_RETENSI) as terkunci:
+        if not terkunci:
+            return None
+        db = SessionLocal()
+        try:
+            for model, kolom_mati in _TABEL_TOKEN:
+                jumlah[model.__tablename__] = _hapus_per_potongan(
+                    db, model, kolom_mati, batas
+                )
+        except Exception:
+            db.rollback()
+            _catat_metrik(mulai, jumlah, berhasil=False)
+            raise
+        finally:
+            db.close()
+    _catat_metrik(mulai, jumlah, berhasil=True)
+    return jumlah
+
+
+def _catat_metrik(mulai: float, jumlah: dict[str, int], **nilai: Any) -> None:
+    _metrik.update(
+        terakhir_dijalankan=sekarang().isoformat(),
+        durasi_detik=round(time.perf_counter() - mulai, 3),
+        jumlah_dihapus=dict(jumlah),
+        **nilai,
+    )
+
+
+async def jalankan_retensi_berkala() -> None:
+    while True:
+        try:
+            jumlah = await asyncio.to_thread(hapus_token_kedaluwarsa)
+            if jumlah and any(jumlah.values()):
+                logger.info("Retensi token menghapus %s", jumlah)
+        except Exception:
+            logger.exception("Retensi token gagal")
+        await asyncio.sleep(settings.token_retensi_interval_detik)
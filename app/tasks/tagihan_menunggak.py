@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.db.kunci import kunci_advisory
+from app.db.session import SessionLocal
+from app.models import Sekolah, StatusTagihan, Tagihan
+from app.utils.laporan_cache import invalidasi_laporan
+from app.utils.waktu import hari_ini, sekarang
+
+
+logger = logging.getLogger(__name__)
+
+# Kunci advisory lock agar hanya satu proses yang menyapu pada satu waktu.
+_KUNCI_SWEEP = 0x74616768
+
+_metrik: dict[str, Any] = {
+    "terakhir_dijalankan": None,
+    "durasi_detik": None,
+    "jumlah_sekolah": 0,
+    "jumlah_diperbarui": 0,
+    "berhasil": None,
+}
+
+
+def metrik_sweep_menunggak() -> dict[str, Any]:
+    return dict(_metrik)
+
+
+def sapu_tagihan_menunggak() -> int | None:
+    """Ubah tagihan terbuka yang lewat jatuh tempo menjadi ``menunggak``.
+
+    Satu UPDATE per sekolah memakai ``ix_tagihan_jatuh_tempo_terbuka`` dengan
+    batas tanggal dari ``settings.timezone``; cache laporan sekolah yang
+    tagihannya berubah diinvalidasi. Mengembalikan jumlah tagihan yang
+    diperbarui, atau ``None`` bila proses lain sedang menjalankan sweep.
+    """
+    mulai = time.perf_counter()
+    batas = hari_ini()
+    total = 0
+    with kunci_advisory(_KUNCI_SWEEP) as terkunci:
+        if not terkunci:
+            return None
+        db = SessionLocal()
+        try:
+            sekolah_ids = db.execute(select(Sekolah.id)).scalars().all()
+            for sekolah_id in sekolah_ids:
+                diperbarui = db.execute(
+                    update(Tagihan)
+                    .where(
+                        Tagihan.sekolah_id == sekolah_id,
+                        Tagihan.status_tagihan.in_(
+                            [StatusTagihan.belum_dibayar, StatusTagihan.sebagian]
+                        ),
+                        Tagihan.tanggal_jatuh_tempo < batas,
+                    )
+                    .values(
+                        status_tagihan=StatusTagihan.menunggak,
+                        diperbarui_pada=datetime.now(timezone.utc),
+                    )
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if diperbarui:
+                    invalidasi_laporan(db, sekolah_id)
+                db.commit()
+                total += diperbarui
+        except Exception:
+            db.rollback()
+            _catat_metrik(mulai, total, berhasil=False)
+            raise
+        finally:
+            db.close()
+    _catat_metrik(mulai, total, berhasil=True, jumlah_sekolah=len(sekolah_ids))
+    return total
+
+
+def _catat_metrik(mulai: float, total: int, **nilai: Any) -> None:
+    _metrik.update(
+        terakhir_dijalankan=sekarang().isoformat(),
+        durasi_detik=round(time.perf_counter() - mulai, 3),
+        jumlah_diperbarui=total,
+        **nilai,
+    )
+
+
+async def jalankan_sweep_berkala() -> None:
+    while True:
+        try:
+            jumlah = await asyncio.to_thread(sapu_tagihan_menunggak)
+            if jumlah:
+                logger.info("Sweep menunggak memperbarui %s tagihan", jumlah)
+        except Exception:
+            logger.exception("Sweep tagihan menunggak gagal")
+        await asyncio.sleep(settings.sweep_menunggak_interval_detik)
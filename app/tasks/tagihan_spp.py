@@ -0,0 +1,402 @@
+import asyncio
+import calendar
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Iterator
+
+from sqlalchemy import Select, String, and_, cast, func, literal, or_, select, union, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models import (
+    JenisPembayaran,
+    JobTagihanSPP,
+    Siswa,
+    SiswaKelas,
+    StatusJob,
+    StatusKeanggotaanKelas,
+    StatusSiswa,
+    StatusTagihan,
+    Tagihan,
+)
+from app.schemas.tagihan import JobTagihanSPPCreate
+from app.utils.laporan_cache import invalidasi_laporan
+
+
+logger = logging.getLogger(__name__)
+
+
+NAMA_BULAN_ID = {
+    1: "Januari",
+    2: "Februari",
+    3: "Maret",
+    4: "April",
+    5: "Mei",
+    6: "Juni",
+    7: "Juli",
+    8: "Agustus",
+    9: "September",
+    10: "Oktober",
+    11: "November",
+    12: "Desember",
+}
+
+
+def default_jatuh_tempo(tahun: int, bulan: int) -> date:
+    hari = min(10, calendar.monthrange(tahun, bulan)[1])
+    return date(tahun, bulan, hari)
+
+
+def daftar_periode(
+    bulan_awal: int, tahun_awal: int, bulan_akhir: int, tahun_akhir: int
+) -> Iterator[tuple[int, int]]:
+    indeks = tahun_awal * 12 + bulan_awal - 1
+    akhir = tahun_akhir * 12 + bulan_akhir - 1
+    while indeks <= akhir:
+        yield indeks % 12 + 1, indeks // 12
+        indeks += 1
+
+
+def _anggota_kelas_aktif(kelas_ids: list[str]) -> Select:
+    return select(SiswaKelas.siswa_id).where(
+        SiswaKelas.kelas_id.in_(kelas_ids),
+        SiswaKelas.status_keanggotaan == StatusKeanggotaanKelas.aktif,
+    )
+
+
+def siswa_aktif_select(sekolah_id: str, kelas_id: str | None = None) -> Select:
+    query = select(Siswa.id).where(
+        Siswa.sekolah_id == sekolah_id,
+        Siswa.status_siswa == StatusSiswa.aktif,
+    )
+    if kelas_id:
+        query = query.where(Siswa.id.in_(_anggota_kelas_aktif([kelas_id])))
+    return query
+
+
+def insert_tagihan_spp(
+    siswa_select: Select,
+    *,
+    sekolah_id: str,
+    bulan: int,
+    tahun: int,
+    jumlah: Decimal,
+    tanggal_jatuh_tempo: date,
+):
+    """INSERT ... SELECT tagihan SPP untuk semua siswa dalam ``siswa_select``.
+
+    Siswa yang sudah memiliki tagihan SPP periode yang sama dilewati oleh
+    ``uq_tagihan_periode`` (ON CONFLICT DO NOTHING); id tagihan baru
+    dikembalikan lewat RETURNING.
+    """
+    kolom = Tagihan.__table__.c
+    now = datetime.now(timezone.utc)
+    nilai = {
+        "sekolah_id": sekolah_id,
+        "jenis_tagihan": JenisPembayaran.spp,
+        "nama_tagihan": f"SPP {NAMA_BULAN_ID[bulan]} {tahun}",
+        "jumlah_tagihan": jumlah,
+        "jumlah_terbayar": Decimal("0.00"),
+        "status_tagihan": StatusTagihan.belum_dibayar,
+        "periode_bulan": bulan,
+        "periode_tahun": tahun,
+        "tanggal_tagihan": date.today(),
+        "tanggal_jatuh_tempo": tanggal_jatuh_tempo,
+        "dibuat_pada": now,
+        "diperbarui_pada": now,
+    }
+    siswa_id = siswa_select.selected_columns[0]
+    sumber = siswa_select.with_only_columns(
+        cast(func.gen_random_uuid(), String),
+        siswa_id,
+        *(literal(value, kolom[name].type) for name, value in nilai.items()),
+    )
+    return (
+        pg_insert(Tagihan.__table__)
+        .from_select(["id", "siswa_id", *nilai], sumber)
+        .on_conflict_do_nothing(
+            index_elements=[
+                kolom.sekolah_id,
+                kolom.siswa_id,
+                kolom.periode_bulan,
+                kolom.periode_tahun,
+            ],
+            index_where=kolom.jenis_tagihan == JenisPembayaran.spp,
+        )
+        .returning(kolom.id)
+    )
+
+
+def kelompok_tarif(
+    sekolah_id: str, parameter: JobTagihanSPPCreate
+) -> list[tuple[Select, Decimal]]:
+    """Pasangan (query siswa, tarif) sesuai ``tarif_kelas`` dan tarif default.
+
+    Kelompok saling lepas: siswa yang aktif di beberapa kelas pada
+    ``tarif_kelas`` memakai tarif kelas yang disebut pertama, dan tarif
+    default ``jumlah`` hanya berlaku untuk siswa aktif yang tidak berada di
+    salah satu kelas tersebut.
+    """
+    kelompok = []
+    kelas_ids: list[str] = []
+    for tarif in parameter.tarif_kelas:
+        query = siswa_aktif_select(sekolah_id, tarif.kelas_id)
+        if kelas_ids:
+            query = query.where(Siswa.id.not_in(_anggota_kelas_aktif(kelas_ids)))
+        kelompok.append((query, tarif.jumlah))
+        kelas_ids.append(tarif.kelas_id)
+    if parameter.jumlah is not None:
+        query = siswa_aktif_select(sekolah_id)
+        if kelas_ids:
+            query = query.where(Siswa.id.not_in(_anggota_kelas_aktif(kelas_ids)))
+        kelompok.append((query, parameter.jumlah))
+    return kelompok
+
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.spp_job_workers, thread_name_prefix="job-tagihan-spp"
+)
+_berhenti = threading.Event()
+
+# Job yang sudah masuk antrean ``_executor`` proses ini, agar pemulihan berkala
+# tidak menjadwalkannya dua kali.
+_dijadwalkan: set[str] = set()
+_dijadwalkan_lock = threading.Lock()
+
+
+class _SewaHilang(Exception):
+    """Sewa job sudah diambil alih worker lain."""
+
+
+def jadwalkan_job_tagihan_spp(job_id: str) -> None:
+    with _dijadwalkan_lock:
+        if job_id in _dijadwalkan:
+            return
+        _dijadwalkan.add(job_id)
+    _executor.submit(jalankan_job_tagihan_spp, job_id)
+
+
+def hentikan_worker_tagihan_spp() -> None:
+    """Hentikan worker: job yang sedang berjalan berhenti setelah potongan
+    aktifnya dan dikembalikan ke ``menunggu`` agar dilanjutkan saat start
+    berikutnya; job yang masih antre tetap ``menunggu``."""
+    _berhenti.set()
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _job_terbengkalai(now: datetime):
+    return or_(
+        JobTagihanSPP.status == StatusJob.menunggu,
+        and_(
+            JobTagihanSPP.status == StatusJob.berjalan,
+            or_(JobTagihanSPP.sewa_sampai.is_(None), JobTagihanSPP.sewa_sampai < now),
+        ),
+    )
+
+
+def pulihkan_job_tagihan_spp() -> int:
+    """Jadwalkan ulang job ``menunggu`` dan job ``berjalan`` yang sewanya habis.
+
+    Job seperti itu tertinggal bila proses berhenti (restart, deploy, crash)
+    sebelum atau ketika memprosesnya. Mengembalikan jumlah job yang
+    dijadwalkan; klaim di ``jalankan_job_tagihan_spp`` memastikan satu job
+    hanya dikerjakan satu worker meskipun beberapa proses memulihkannya.
+    """
+    db = SessionLocal()
+    try:
+        job_ids = (
+            db.execute(
+                select(JobTagihanSPP.id)
+                .where(_job_terbengkalai(datetime.now(timezone.utc)))
+                .order_by(JobTagihanSPP.dibuat_pada)
+            )
+            .scalars()
+            .all()
+        )
+    finally:
+        db.close()
+    for job_id in job_ids:
+        jadwalkan_job_tagihan_spp(job_id)
+    return len(job_ids)
+
+
+async def jalankan_pemulihan_job_spp() -> None:
+    while True:
+        try:
+            jumlah = await asyncio.to_thread(pulihkan_job_tagihan_spp)
+            if jumlah:
+                logger.info("Menjadwalkan ulang %s job tagihan SPP", jumlah)
+        except Exception:
+            logger.exception("Pemulihan job tagihan SPP gagal")
+        await asyncio.sleep(settings.spp_job_sewa_detik)
+
+
+def _sewa_baru() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=settings.spp_job_sewa_detik)
+
+
+def _perbarui_job(db, job_id: str, sewa: datetime, **nilai) -> None:
+    """UPDATE job hanya bila sewanya masih milik worker ini."""
+    diperbarui = db.execute(
+        update(JobTagihanSPP)
+        .where(JobTagihanSPP.id == job_id, JobTagihanSPP.sewa_sampai == sewa)
+        .values(**nilai)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not diperbarui:
+        raise _SewaHilang(job_id)
+
+
+def jalankan_job_tagihan_spp(job_id: str) -> None:
+    """Proses job di thread worker per potongan siswa.
+
+    Setiap potongan berisi paling banyak ``spp_job_chunk_size`` siswa untuk
+    satu periode dan di-commit bersama progres, checkpoint, dan perpanjangan
+    sewanya, sehingga ``GET /tagihan/spp/jobs/{id}`` dapat memantau jalannya
+    job dan job yang terputus dilanjutkan dari potongan berikutnya. Karena
+    ``uq_tagihan_periode`` membuat insert idempoten, job yang diulang tidak
+    menghasilkan tagihan ganda.
+    """
+    db = SessionLocal()
+    sewa = _sewa_baru()
+    try:
+        now = datetime.now(timezone.utc)
+        diklaim = db.execute(
+            update(JobTagihanSPP)
+            .where(JobTagihanSPP.id == job_id, _job_terbengkalai(now))
+            .values(
+                status=StatusJob.berjalan,
+                dimulai_pada=func.coalesce(JobTagihanSPP.dimulai_pada, now),
+                sewa_sampai=sewa,
+            )
+        ).rowcount
+        db.commit()
+        if not diklaim:
+            return
+
+        job = db.get(JobTagihanSPP, job_id)
+        sekolah_id = job.sekolah_id
+        checkpoint = job.checkpoint
+        parameter = JobTagihanSPPCreate.model_validate(job.parameter)
+        periode = list(
+            daftar_periode(
+                parameter.bulan_awal,
+                parameter.tahun_awal,
+                parameter.bulan_akhir,
+                parameter.tahun_akhir,
+            )
+        )
+        kelompok = kelompok_tarif(sekolah_id, parameter)
+
+        if checkpoint is None:
+            # Target dihitung dari siswa unik (UNION membuang duplikat), sama
+            # dengan baris yang dapat dihasilkan INSERT ... SELECT per periode.
+            semua_siswa = union(*(query for query, _ in kelompok)).subquery()
+            total_target = len(periode) * db.execute(
+                select(func.count()).select_from(semua_siswa)
+            ).scalar_one()
+            _perbarui_job(db, job_id, sewa, total_target=total_target)
+            db.commit()
+            posisi_awal = (0, 0)
+        else:
+            logger.info("Melanjutkan job tagihan SPP %s dari %s", job_id, checkpoint)
+            posisi_awal = (checkpoint["periode"], checkpoint["kelompok"])
+
+        for indeks_periode, (bulan, tahun) in enumerate(periode):
+            tanggal_jatuh_tempo = default_jatuh_tempo(tahun, bulan)
+            for indeks_kelompok, (query, jumlah) in enumerate(kelompok):
+                posisi = (indeks_periode, indeks_kelompok)
+                if posisi < posisi_awal:
+                    continue
+                siswa_terakhir = (
+                    checkpoint["siswa_terakhir"]
+                    if checkpoint is not None and posisi == posisi_awal
+                    else None
+                )
+                while True:
+                    if _berhenti.is_set():
+                        _perbarui_job(
+                            db, job_id, sewa, status=StatusJob.menunggu, sewa_sampai=None
+                        )
+                        db.commit()
+                        logger.info("Job tagihan SPP %s dijeda karena worker berhenti", job_id)
+                        return
+
+                    potongan = query.order_by(Siswa.id).limit(settings.spp_job_chunk_size)
+                    if siswa_terakhir is not None:
+                        potongan = potongan.where(Siswa.id > siswa_terakhir)
+                    siswa_ids = db.execute(potongan).scalars().all()
+                    if not siswa_ids:
+                        break
+
+                    created_ids = (
+                        db.execute(
+                            insert_tagihan_spp(
+                                select(Siswa.id).where(Siswa.id.in_(siswa_ids)),
+                                sekolah_id=sekolah_id,
+                                bulan=bulan,
+                                tahun=tahun,
+                                jumlah=jumlah,
+                                tanggal_jatuh_tempo=tanggal_jatuh_tempo,
+                            )
+                        )
+                        .scalars()
+                        .all()
+                    )
+                    siswa_terakhir = siswa_ids[-1]
+                    sewa_lanjut = _sewa_baru()
+                    _perbarui_job(
+                        db,
+                        job_id,
+                        sewa,
+                        jumlah_diproses=JobTagihanSPP.jumlah_diproses + len(siswa_ids),
+                        jumlah_dibuat=JobTagihanSPP.jumlah_dibuat + len(created_ids),
+                        jumlah_dilewati=JobTagihanSPP.jumlah_dilewati
+                        + len(siswa_ids)
+                        - len(created_ids),
+                        checkpoint={
+                            "periode": indeks_periode,
+                            "kelompok": indeks_kelompok,
+                            "siswa_terakhir": siswa_terakhir,
+                        },
+                        sewa_sampai=sewa_lanjut,
+                    )
+                    if created_ids:
+                        invalidasi_laporan(db, sekolah_id)
+                    db.commit()
+                    sewa = sewa_lanjut
+
+        _perbarui_job(
+            db,
+            job_id,
+            sewa,
+            status=StatusJob.selesai,
+            selesai_pada=datetime.now(timezone.utc),
+            sewa_sampai=None,
+        )
+        db.commit()
+    except _SewaHilang:
+        db.rollback()
+        logger.warning("Job tagihan SPP %s diambil alih worker lain", job_id)
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Job tagihan SPP %s gagal", job_id)
+        db.execute(
+            update(JobTagihanSPP)
+            .where(JobTagihanSPP.id == job_id, JobTagihanSPP.sewa_sampai == sewa)
+            .values(
+                status=StatusJob.gagal,
+                pesan_error=str(exc)[:1000],
+                selesai_pada=datetime.now(timezone.utc),
+                sewa_sampai=None,
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+        with _dijadwalkan_lock:
+            _dijadwalkan.discard(job_id)
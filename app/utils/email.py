@@ -1,55 +1,290 @@
+import json
 import logging
-from typing import Optional
+import re
+import smtplib
+import threading
+import uuid
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Any, NamedTuple, Optional, Protocol
 
 from sib_api_v3_sdk import (
     ApiClient,
     Configuration,
     TransactionalEmailsApi,
     SendSmtpEmail,
+    SendSmtpEmailMessageVersions,
 )
 from sib_api_v3_sdk.rest import ApiException
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.models.email import EmailOutbox
 
 logger = logging.getLogger(__name__)
 
 
-def send_email(
+class PesanEmail(NamedTuple):
+    tujuan: str
+    subjek: str
+    isi_html: str
+    pengirim_email: str
+    pengirim_nama: str
+
+
+class VersiEmail(NamedTuple):
+    """Satu penerima pada kiriman massal beserta parameter personalisasinya."""
+
+    tujuan: str
+    params: dict[str, Any] | None = None
+    nama: str | None = None
+
+
+class PesanEmailMassal(NamedTuple):
+    """Email dengan isi yang sama untuk banyak penerima.
+
+    ``isi_html`` dan ``subjek`` boleh memuat placeholder ``{{ params.kunci }}``
+    yang diisi dari ``VersiEmail.params`` masing-masing penerima.
+    """
+
+    subjek: str
+    isi_html: str
+    versi: list[VersiEmail]
+    pengirim_email: str
+    pengirim_nama: str
+
+
+_PLACEHOLDER = re.compile(r"{{\s*params\.(\w+)\s*}}")
+
+
+def render_params(template: str, params: dict[str, Any]) -> str:
+    return _PLACEHOLDER.sub(lambda m: str(params.get(m.group(1), "")), template)
+
+
+def pecah_per_penerima(pesan: PesanEmailMassal) -> list[PesanEmail]:
+    return [
+        PesanEmail(
+            tujuan=versi.tujuan,
+            subjek=render_params(pesan.subjek, versi.params or {}),
+            isi_html=render_params(pesan.isi_html, versi.params or {}),
+            pengirim_email=pesan.pengirim_email,
+            pengirim_nama=pesan.pengirim_nama,
+        )
+        for versi in pesan.versi
+    ]
+
+
+class TransportEmail(Protocol):
+    def kirim(self, pesan: PesanEmail) -> None:
+        """Kirim satu email; lempar exception bila gagal agar bisa dicoba ulang."""
+
+    def kirim_massal(self, pesan: PesanEmailMassal) -> None:
+        """Kirim satu email ke banyak penerima dengan personalisasi masing-masing."""
+
+
+_klien_brevo: TransactionalEmailsApi | None = None
+_klien_brevo_lock = threading.Lock()
+
+
+def klien_brevo() -> TransactionalEmailsApi:
+    """Klien Brevo bersama untuk seluruh proses, dibuat saat pertama dipakai.
+
+    Satu ``ApiClient`` berarti satu pool koneksi urllib3 (maksimal
+    ``BREVO_POOL_SIZE`` koneksi) sehingga koneksi TLS dipakai ulang antar
+    pengiriman dan aman dipakai dari beberapa thread worker.
+    """
+    global _klien_brevo
+    if _klien_brevo is None:
+        with _klien_brevo_lock:
+            if _klien_brevo is None:
+                configuration = Configuration()
+                configuration.api_key["api-key"] = settings.brevo_api_key
+                configuration.connection_pool_maxsize = settings.brevo_pool_size
+                if settings.brevo_host:
+                    configuration.host = settings.brevo_host
+                _klien_brevo = TransactionalEmailsApi(ApiClient(configuration))
+    return _klien_brevo
+
+
+class TransportBrevo:
+    """Transport produksi lewat Brevo transactional API.
+
+    ``_request_timeout`` diberikan sebagai ``int`` karena klien SDK diam-diam
+    mengabaikan nilai ``float``.
+    """
+
+    def __init__(self, api_key: str | None) -> None:
+        self.api_key = api_key
+
+    def kirim(self, pesan: PesanEmail) -> None:
+        if not self.api_key:
+            logger.warning("Brevo API key belum disetel; email tidak dikirim.")
+            return
+
+        klien_brevo().send_transac_email(
+            SendSmtpEmail(
+                to=[{"email": pesan.tujuan}],
+                sender={"email": pesan.pengirim_email, "name": pesan.pengirim_nama},
+                subject=pesan.subjek,
+                html_content=pesan.isi_html,
+            ),
+            _request_timeout=settings.brevo_timeout_detik,
+        )
+
+    def kirim_massal(self, pesan: PesanEmailMassal) -> None:
+        """Kirim per kelompok ``BREVO_BATCH_MAKS`` penerima memakai
+        ``messageVersions`` sehingga satu request melayani banyak penerima."""
+        if not self.api_key:
+            logger.warning("Brevo API key belum disetel; email tidak dikirim.")
+            return
+
+        for awal in range(0, len(pesan.versi), settings.brevo_batch_maks):
+            kelompok = pesan.versi[awal : awal + settings.brevo_batch_maks]
+            klien_brevo().send_transac_email(
+                SendSmtpEmail(
+                    sender={"email": pesan.pengirim_email, "name": pesan.pengirim_nama},
+                    subject=pesan.subjek,
+                    html_content=pesan.isi_html,
+                    message_versions=[
+                        SendSmtpEmailMessageVersions(
+                            to=[
+                                {"email": versi.tujuan, "name": versi.nama}
+                                if versi.nama
+                                else {"email": versi.tujuan}
+                            ],
+                            params=versi.params or None,
+                        )
+                        for versi in kelompok
+                    ],
+                ),
+                _request_timeout=settings.brevo_timeout_detik,
+            )
+
+
+class TransportFile:
+    """Tulis setiap email sebagai file JSON; untuk pengembangan dan pengujian."""
+
+    def __init__(self, direktori: str) -> None:
+        self.direktori = Path(direktori)
+
+    def kirim(self, pesan: PesanEmail) -> None:
+        self.direktori.mkdir(parents=True, exist_ok=True)
+        path = self.direktori / f"{uuid.uuid4()}.json"
+        path.write_text(json.dumps(pesan._asdict(), ensure_ascii=False), encoding="utf-8")
+
+    def kirim_massal(self, pesan: PesanEmailMassal) -> None:
+        for satuan in pecah_per_penerima(pesan):
+            self.kirim(satuan)
+
+
+class TransportSMTP:
+    """Kirim lewat server SMTP, mis. SMTP sink lokal seperti MailHog/Mailpit."""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+
+    @staticmethod
+    def _pesan_smtp(pesan: PesanEmail) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = f"{pesan.pengirim_nama} <{pesan.pengirim_email}>"
+        email["To"] = pesan.tujuan
+        email["Subject"] = pesan.subjek
+        email.set_content(pesan.isi_html, subtype="html")
+        return email
+
+    def kirim(self, pesan: PesanEmail) -> None:
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            smtp.send_message(self._pesan_smtp(pesan))
+
+    def kirim_massal(self, pesan: PesanEmailMassal) -> None:
+        # Satu koneksi SMTP untuk seluruh penerima.
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            for satuan in pecah_per_penerima(pesan):
+                smtp.send_message(self._pesan_smtp(satuan))
+
+
+def buat_transport() -> TransportEmail:
+    if settings.email_transport == "file":
+        return TransportFile(settings.email_file_dir)
+    if settings.email_transport == "smtp":
+        return TransportSMTP(settings.email_smtp_host, settings.email_smtp_port)
+    return TransportBrevo(settings.brevo_api_key)
+
+
+def antrekan_email(
+    db: Session,
     to_email: str,
     subject: str,
     html_content: str,
     sender_email: Optional[str] = None,
     sender_name: Optional[str] = None,
-) -> None:
-    """Kirim email menggunakan Brevo transactional API.
+) -> EmailOutbox:
+    """Masukkan email ke ``email_outbox`` dalam transaksi ``db`` pemanggil.
 
-    Jika API key tidak tersedia, fungsi hanya akan mencatat log tanpa melempar error.
+    Email baru terlihat oleh worker setelah pemanggil commit, sehingga email
+    tidak pernah terkirim untuk perubahan yang di-rollback.
     """
-    if not settings.brevo_api_key:
-        logger.warning("Brevo API key belum disetel; email tidak dikirim.")
-        return
+    outbox = EmailOutbox(
+        tujuan=to_email,
+        subjek=subject,
+        isi_html=html_content,
+        pengirim_email=sender_email,
+        pengirim_nama=sender_name,
+    )
+    db.add(outbox)
+    return outbox
 
-    configuration = Configuration()
-    configuration.api_key["api-key"] = settings.brevo_api_key
 
-    api_client = ApiClient(configuration)
-    api_instance = TransactionalEmailsApi(api_client)
+def send_email(
+    to_email: str,
+    subject: str,
+    html_content: str,
+    sender_email: Optional[str] = None,
+    sender_name: Optional[str] = None,
+) -> None:
+    """Kirim email langsung lewat transport aktif tanpa melalui outbox.
 
-    email = SendSmtpEmail(
-        to=[{"email": to_email}],
-        sender={
-            "email": sender_email or settings.email_sender,
-            "name": sender_name or settings.email_sender_name,
-        },
-        subject=subject,
-        html_content=html_content,
+    Kegagalan hanya dicatat ke log tanpa melempar error.
+    """
+    pesan = PesanEmail(
+        tujuan=to_email,
+        subjek=subject,
+        isi_html=html_content,
+        pengirim_email=sender_email or settings.email_sender,
+        pengirim_nama=sender_name or settings.email_sender_name,
     )
-
     try:
-        api_instance.send_transac_email(email)
+        buat_transport().kirim(pesan)
         logger.info("Email dikirim ke %s dengan subjek %s", to_email, subject)
     except ApiException as exc:
         logger.error("Gagal mengirim email ke %s: %s", to_email, exc, exc_info=True)
     except Exception as exc:  # noqa: BLE001
         logger.exception("Kesalahan tak terduga saat mengirim email: %s", exc)
 
+
+def kirim_email_massal(
+    penerima: list[VersiEmail],
+    subject: str,
+    html_content: str,
+    sender_email: Optional[str] = None,
+    sender_name: Optional[str] = None,
+) -> None:
+    """Kirim email yang sama ke banyak penerima, mis. pengingat pembayaran.
+
+    Dengan transport Brevo penerima dikelompokkan ke sedikit request
+    ``messageVersions``; ``{{ params.kunci }}`` pada subjek/isi diisi per
+    penerima. Berbeda dengan ``send_email``, kegagalan dilempar ke pemanggil.
+    """
+    if not penerima:
+        return
+    buat_transport().kirim_massal(
+        PesanEmailMassal(
+            subjek=subject,
+            isi_html=html_content,
+            versi=penerima,
+            pengirim_email=sender_email or settings.email_sender,
+            pengirim_nama=sender_name or settings.email_sender_name,
+        )
+    )
+    logger.info("Email massal dikirim ke %s penerima dengan subjek %s", len(penerima), subject)
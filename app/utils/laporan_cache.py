@@ -0,0 +1,156 @@
+import time
+from itertools import chain
+from typing import Any, Hashable, NamedTuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models import GenerasiLaporan, Kelas, Pembayaran, Siswa, SiswaKelas, Tagihan
+from app.utils.cache import TTLCache
+
+
+laporan_cache = TTLCache(
+    maxsize=settings.laporan_cache_maxsize, ttl=settings.laporan_cache_ttl_detik
+)
+
+# Salinan lokal generasi per sekolah. Perubahan dari proses ini langsung
+# tercatat; perubahan dari proses lain terlihat paling lambat setelah
+# ``LAPORAN_GENERASI_TTL_DETIK``.
+_generasi = TTLCache(
+    maxsize=settings.laporan_cache_maxsize, ttl=settings.laporan_generasi_ttl_detik
+)
+
+# Model yang barisnya ikut menentukan isi laporan pembayaran. ``Kelas`` dan
+# ``SiswaKelas`` dipakai rincian ``group_by=kelas`` (label dan keanggotaan).
+_MODEL_LAPORAN = (Tagihan, Pembayaran, Kelas)
+
+_tabel = GenerasiLaporan.__table__
+
+
+class StatusGenerasi(NamedTuple):
+    sekolah_id: str
+    generasi: int
+    # Epoch detik invalidasi terakhir; ``None`` bila belum pernah diinvalidasi.
+    diubah_pada: float | None
+
+
+def generasi_laporan(sekolah_id: str) -> StatusGenerasi:
+    """Generasi laporan sekolah dari salinan lokal, dibaca ulang dari tabel
+    ``generasi_laporan`` di primary bila salinannya sudah kedaluwarsa."""
+    status = _generasi.get(sekolah_id)
+    if status is None:
+        with engine.connect() as conn:
+            row = conn.execute(
+                select(
+                    _tabel.c.generasi, func.extract("epoch", _tabel.c.diubah_pada)
+                ).where(_tabel.c.sekolah_id == sekolah_id)
+            ).first()
+        status = StatusGenerasi(
+            sekolah_id, row[0] if row else 0, float(row[1]) if row else None
+        )
+        _generasi.set(sekolah_id, status)
+    return status
+
+
+def invalidasi_laporan(db: Session, *sekolah_ids: str) -> None:
+    """Tandai laporan sekolah berubah pada commit ``db`` berikutnya.
+
+    Dipakai setelah statement massal (INSERT/UPDATE tanpa ORM); perubahan ORM
+    pada ``Tagihan``, ``Pembayaran``, ``Kelas``, dan ``SiswaKelas`` sudah
+    tercatat otomatis. Harus dipanggil sebelum ``db.commit()``.
+    """
+    db.info.setdefault("laporan_perubahan", set()).update(sekolah_ids)
+
+
+def boleh_cache_dari_replika(status: StatusGenerasi) -> bool:
+    """Apakah laporan yang dihitung di replika aman disimpan ke cache.
+
+    Perubahan yang baru di-commit di primary mungkin belum sampai di replika;
+    menyimpan hasil replika pada generasi baru akan menahan data lama sampai
+    TTL. Selama jendela lag maksimum sejak invalidasi terakhir, hasil replika
+    hanya dikembalikan tanpa disimpan.
+    """
+    if status.diubah_pada is None:
+        return True
+    jendela = settings.replika_lag_maks_detik + settings.replika_cek_interval_detik
+    return time.time() - status.diubah_pada >= jendela
+
+
+def kunci_laporan(status: StatusGenerasi, *parameter: Hashable) -> tuple[Hashable, ...]:
+    return (status.sekolah_id, status.generasi, *parameter)
+
+
+def metrik_laporan_cache() -> dict[str, Any]:
+    return laporan_cache.stats()
+
+
+@event.listens_for(Session, "after_flush")
+def _catat_perubahan_laporan(session: Session, flush_context: Any) -> None:
+    sekolah_ids = session.info.setdefault("laporan_perubahan", set())
+    kelas_ids = session.info.setdefault("laporan_perubahan_kelas", set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, _MODEL_LAPORAN):
+            sekolah_ids.add(obj.sekolah_id)
+        elif isinstance(obj, SiswaKelas):
+            kelas_ids.add(obj.kelas_id)
+    # Siswa yang dihapus ikut menghapus tagihan dan pembayarannya (CASCADE).
+    for obj in session.deleted:
+        if isinstance(obj, Siswa):
+            sekolah_ids.add(obj.sekolah_id)
+
+
+@event.listens_for(Session, "before_commit")
+def _naikkan_generasi_sebelum_commit(session: Session) -> None:
+    """Naikkan generasi di transaksi yang sama dengan perubahannya.
+
+    Upsert dijalankan tepat sebelum COMMIT sehingga kunci baris
+    ``generasi_laporan`` hanya ditahan sebentar, tidak perlu koneksi kedua,
+    dan generasi tidak mungkin tertinggal dari data yang sudah di-commit.
+    """
+    session.flush()
+    sekolah_ids = session.info.pop("laporan_perubahan", set())
+    kelas_ids = session.info.pop("laporan_perubahan_kelas", set())
+    if not sekolah_ids and not kelas_ids:
+        return
+    conn = session.connection()
+    if kelas_ids:
+        sekolah_ids.update(
+            conn.execute(
+                select(Kelas.sekolah_id).where(Kelas.id.in_(kelas_ids)).distinct()
+            ).scalars()
+        )
+    if not sekolah_ids:
+        return
+    statement = pg_insert(_tabel).values(
+        [
+            {"sekolah_id": sekolah_id, "generasi": 1, "diubah_pada": func.now()}
+            for sekolah_id in sorted(sekolah_ids)
+        ]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[_tabel.c.sekolah_id],
+        set_={"generasi": _tabel.c.generasi + 1, "diubah_pada": func.now()},
+    ).returning(
+        _tabel.c.sekolah_id,
+        _tabel.c.generasi,
+        func.extract("epoch", _tabel.c.diubah_pada),
+    )
+    session.info["laporan_generasi_baru"] = conn.execute(statement).all()
+
+
+@event.listens_for(Session, "after_commit")
+def _simpan_generasi_setelah_commit(session: Session) -> None:
+    for sekolah_id, generasi, diubah_pada in session.info.pop(
+        "laporan_generasi_baru", ()
+    ):
+        _generasi.set(sekolah_id, StatusGenerasi(sekolah_id, generasi, float(diubah_pada)))
+
+
+@event.listens_for(Session, "after_rollback")
+def _buang_perubahan_laporan(session: Session) -> None:
+    session.info.pop("laporan_perubahan", None)
+    session.info.pop("laporan_perubahan_kelas", None)
+    session.info.pop("laporan_generasi_baru", None)
@@ -1,12 +1,326 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from enum import Enum as PyEnum
+from itertools import chain
 from math import ceil
-from sqlalchemy.orm import Query
+from typing import Any, Hashable
 
+from fastapi import HTTPException
+from sqlalchemy import Select, and_, event, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.util import find_tables
 
-def paginate_query(query: Query, page: int, limit: int):
+from app.core.config import settings
+from app.schemas.pagination import PaginationMeta
+from app.utils.cache import TTLCache
+
+
+class ModeTotal(PyEnum):
+    exact = "exact"
+    cached = "cached"
+    none = "none"
+
+
+_count_cache = TTLCache(
+    maxsize=settings.count_cache_maxsize, ttl=settings.count_cache_ttl_seconds
+)
+
+
+def _count_cache_key(statement: Select, tenant: Hashable) -> tuple[Hashable, ...]:
+    compiled = statement.compile()
+    params = repr(sorted(compiled.params.items()))
+    return (tenant, str(compiled), params)
+
+
+def _tabel_statement(statement: Select) -> frozenset[str]:
+    return frozenset(
+        table.name
+        for table in find_tables(statement, include_joins=True)
+        if hasattr(table, "name")
+    )
+
+
+def _hitung_total(query: Query, mode_total: ModeTotal, tenant: Hashable) -> int:
     count_query = query.order_by(None)
+    if mode_total != ModeTotal.cached:
+        return count_query.count()
+
+    key = _count_cache_key(count_query.statement, tenant)
+    cached = _count_cache.get(key)
+    if cached is not None:
+        return cached[0]
     total = count_query.count()
-    if total == 0:
-        return [], 0, 0
-    items = query.offset((page - 1) * limit).limit(limit).all()
-    total_pages = ceil(total / limit)
-    return items, total, total_pages
+    _count_cache.set(key, (total, _tabel_statement(count_query.statement)))
+    return total
+
+
+async def _hitung_total_async(
+    db: AsyncSession, statement: Select, mode_total: ModeTotal, tenant: Hashable
+) -> int:
+    count_statement = statement.order_by(None)
+    key = None
+    if mode_total == ModeTotal.cached:
+        key = _count_cache_key(count_statement, tenant)
+        cached = _count_cache.get(key)
+        if cached is not None:
+            return cached[0]
+    total = (
+        await db.execute(select(func.count()).select_from(count_statement.subquery()))
+    ).scalar_one()
+    if key is not None:
+        _count_cache.set(key, (total, _tabel_statement(count_statement)))
+    return total
+
+
+def invalidate_count_cache(table: str, tenant: Hashable = None) -> int:
+    """Hapus total tersimpan yang bergantung pada ``table`` untuk tenant tertentu.
+
+    ``tenant=None`` berarti perubahan tidak diketahui tenant-nya sehingga semua
+    tenant untuk tabel tersebut ikut dibuang.
+    """
+    return _count_cache.discard_where(
+        lambda key, value: table in value[1]
+        and (tenant is None or key[0] is None or key[0] == tenant)
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _catat_perubahan_tabel(session: Session, flush_context: Any) -> None:
+    perubahan = session.info.setdefault("count_cache_perubahan", set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            perubahan.add((table, getattr(obj, "sekolah_id", None)))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _catat_perubahan_massal(orm_execute_state: Any) -> None:
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None:
+        perubahan = orm_execute_state.session.info.setdefault(
+            "count_cache_perubahan", set()
+        )
+        perubahan.add((table.name, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidasi_setelah_commit(session: Session) -> None:
+    for table, tenant in session.info.pop("count_cache_perubahan", ()):
+        invalidate_count_cache(table, tenant)
+
+
+@event.listens_for(Session, "after_rollback")
+def _buang_perubahan_setelah_rollback(session: Session) -> None:
+    session.info.pop("count_cache_perubahan", None)
+
+
+def paginate_query(
+    query: Query,
+    page: int,
+    limit: int,
+    *,
+    mode_total: ModeTotal = ModeTotal.exact,
+    tenant: Hashable = None,
+):
+    """Ambil satu halaman dengan OFFSET beserta ``PaginationMeta``-nya.
+
+    ``mode_total`` menentukan cara menghitung total: ``exact`` menjalankan
+    COUNT setiap request, ``cached`` memakai hasil COUNT per (tenant, filter)
+    selama TTL singkat, dan ``none`` melewati COUNT sama sekali.
+    """
+    total = None
+    if mode_total != ModeTotal.none:
+        total = _hitung_total(query, mode_total, tenant)
+        if total == 0:
+            return [], _build_meta(page, limit, 0, False)
+
+    items = query.offset((page - 1) * limit).limit(limit + 1).all()
+    has_next = len(items) > limit
+    return items[:limit], _build_meta(page, limit, total, has_next)
+
+
+async def paginate_query_async(
+    db: AsyncSession,
+    statement: Select,
+    page: int,
+    limit: int,
+    *,
+    mode_total: ModeTotal = ModeTotal.exact,
+    tenant: Hashable = None,
+):
+    """Varian ``paginate_query`` untuk ``select()`` pada ``AsyncSession``."""
+    total = None
+    if mode_total != ModeTotal.none:
+        total = await _hitung_total_async(db, statement, mode_total, tenant)
+        if total == 0:
+            return [], _build_meta(page, limit, 0, False)
+
+    items = (
+        (await db.execute(statement.offset((page - 1) * limit).limit(limit + 1)))
+        .scalars()
+        .all()
+    )
+    has_next = len(items) > limit
+    return items[:limit], _build_meta(page, limit, total, has_next)
+
+
+def _build_meta(
+    page: int,
+    limit: int,
+    total: int | None,
+    has_next: bool,
+    next_cursor: str | None = None,
+) -> PaginationMeta:
+    return PaginationMeta(
+        page=page,
+        limit=limit,
+        total=total,
+        total_pages=None if total is None else ceil(total / limit),
+        has_next=has_next,
+        next_cursor=next_cursor,
+    )
+
+
+def encode_cursor(value: Any, item_id: str) -> str:
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    raw = json.dumps([value, item_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_column) -> tuple[Any, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        if value is not None:
+            value = sort_column.type.python_type.fromisoformat(value)
+        if not isinstance(item_id, str):
+            raise ValueError(item_id)
+    except (binascii.Error, TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail="Cursor tidak valid") from exc
+    return value, item_id
+
+
+def _seek_clause(sort_column, id_column, value: Any, item_id: str, descending: bool):
+    # Urutan mengikuti default PostgreSQL: NULL di akhir untuk ASC dan di awal
+    # untuk DESC, dengan id sebagai pemecah urutan yang sama.
+    if descending:
+        if value is None:
+            return or_(
+                and_(sort_column.is_(None), id_column < item_id),
+                sort_column.is_not(None),
+            )
+        return or_(
+            sort_column < value,
+            and_(sort_column == value, id_column < item_id),
+        )
+    if value is None:
+        return and_(sort_column.is_(None), id_column > item_id)
+    return or_(
+        sort_column > value,
+        and_(sort_column == value, id_column > item_id),
+        sort_column.is_(None),
+    )
+
+
+def paginate_keyset(
+    query: Query,
+    page: int,
+    limit: int,
+    *,
+    sort_column,
+    id_column,
+    descending: bool = False,
+    cursor: str | None = None,
+    mode_total: ModeTotal = ModeTotal.exact,
+    tenant: Hashable = None,
+):
+    """Pagination dengan urutan stabil ``(sort_column, id)``.
+
+    Tanpa ``cursor`` halaman diambil dengan OFFSET seperti ``paginate_query``.
+    Dengan ``cursor`` query langsung mencari posisi setelah baris terakhir
+    halaman sebelumnya sehingga biaya halaman dalam tidak bertambah.
+    Selalu mengisi ``next_cursor`` bila masih ada halaman berikutnya.
+    """
+    seek = decode_cursor(cursor, sort_column) if cursor else None
+
+    total = None
+    if mode_total != ModeTotal.none:
+        total = _hitung_total(query, mode_total, tenant)
+        if total == 0:
+            return [], _build_meta(page, limit, 0, False)
+
+    query = _urutkan_keyset(
+        query, page, limit, sort_column, id_column, descending, seek
+    )
+    items = query.all()
+    return _halaman_keyset(items, page, limit, total, sort_column, id_column)
+
+
+async def paginate_keyset_async(
+    db: AsyncSession,
+    statement: Select,
+    page: int,
+    limit: int,
+    *,
+    sort_column,
+    id_column,
+    descending: bool = False,
+    cursor: str | None = None,
+    mode_total: ModeTotal = ModeTotal.exact,
+    tenant: Hashable = None,
+):
+    """Varian ``paginate_keyset`` untuk ``select()`` pada ``AsyncSession``."""
+    seek = decode_cursor(cursor, sort_column) if cursor else None
+
+    total = None
+    if mode_total != ModeTotal.none:
+        total = await _hitung_total_async(db, statement, mode_total, tenant)
+        if total == 0:
+            return [], _build_meta(page, limit, 0, False)
+
+    statement = _urutkan_keyset(
+        statement, page, limit, sort_column, id_column, descending, seek
+    )
+    items = (await db.execute(statement)).scalars().all()
+    return _halaman_keyset(items, page, limit, total, sort_column, id_column)
+
+
+def _urutkan_keyset(query, page, limit, sort_column, id_column, descending, seek):
+    """Terapkan urutan ``(sort_column, id)`` dan posisi halaman.
+
+    Berlaku untuk ``Query`` maupun ``Select`` karena keduanya memiliki
+    ``order_by``/``filter``/``offset``/``limit`` yang sama.
+    """
+    if descending:
+        ordering = (sort_column.desc().nulls_first(), id_column.desc())
+    else:
+        ordering = (sort_column.asc().nulls_last(), id_column.asc())
+    query = query.order_by(None).order_by(*ordering)
+
+    if seek is not None:
+        query = query.filter(_seek_clause(sort_column, id_column, *seek, descending))
+    else:
+        query = query.offset((page - 1) * limit)
+    return query.limit(limit + 1)
+
+
+def _halaman_keyset(items, page, limit, total, sort_column, id_column):
+    has_next = len(items) > limit
+    next_cursor = None
+    if has_next:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(
+            getattr(last, sort_column.key), getattr(last, id_column.key)
+        )
+    return items, _build_meta(page, limit, total, has_next, next_cursor)
@@ -0,0 +1,12 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+
+
+def sekarang() -> datetime:
+    return datetime.now(ZoneInfo(settings.timezone))
+
+
+def hari_ini() -> date:
+    return sekarang().date()
@@ -0,0 +1,201 @@
+"""Benchmark route async vs sync pada banyak klien bersamaan.
+
+Script menjalankan aplikasi dengan uvicorn di subprocess, menambahkan salinan
+sync (``def`` + ``Session``) dari ``/auth/me`` dan
+``/website/public/konten`` di bawah prefix ``/_bench/sync``, lalu menembakkan
+request dari ``--klien`` klien bersamaan ke kedua varian dan mencetak
+throughput serta latensi. Membutuhkan database yang sudah terisi (mis. lewat
+``scripts/seed_demo_data.py``) dan akun yang bisa login.
+
+Contoh:
+    python scripts/bench_async.py --email admin@contoh.sch.id --kata-sandi rahasia123
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import httpx
+
+
+def buat_app_bench():
+    from fastapi import Depends, Query
+    from sqlalchemy.orm import Session, selectinload
+
+    from app.core.deps import get_db, get_pengguna_aktif
+    from app.main import app
+    from app.models import Pengguna, StatusKonten, WebsiteKonten
+    from app.schemas.auth import PenggunaProfile
+    from app.schemas.pagination import PaginatedResponse
+    from app.schemas.website import WebsiteKontenDetail
+    from app.utils.pagination import ModeTotal, paginate_query
+
+    @app.get("/_bench/sync/auth/me", response_model=PenggunaProfile)
+    def me_sync(pengguna: Pengguna = Depends(get_pengguna_aktif)) -> Pengguna:
+        return pengguna
+
+    @app.get(
+        "/_bench/sync/website/public/konten",
+        response_model=PaginatedResponse[WebsiteKontenDetail],
+    )
+    def konten_public_sync(
+        sekolah_id: str,
+        page: int = Query(default=1, ge=1),
+        limit: int = Query(default=20, ge=1, le=100),
+        db: Session = Depends(get_db),
+    ):
+        query = (
+            db.query(WebsiteKonten)
+            .options(selectinload(WebsiteKonten.penulis))
+            .filter(
+                WebsiteKonten.sekolah_id == sekolah_id,
+                WebsiteKonten.status == StatusKonten.terbit,
+            )
+            .order_by(WebsiteKonten.tanggal_terbit.desc(), WebsiteKonten.dibuat_pada.desc())
+        )
+        items, meta = paginate_query(
+            query, page, limit, mode_total=ModeTotal.exact, tenant=sekolah_id
+        )
+        return PaginatedResponse[WebsiteKontenDetail](items=items, meta=meta)
+
+    return app
+
+
+def port_bebas() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def tunggu_server(base_url: str, batas_detik: float = 30) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as klien:
+        akhir = time.monotonic() + batas_detik
+        while time.monotonic() < akhir:
+            try:
+                if (await klien.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Server benchmark tidak merespons")
+
+
+async def serbu(
+    base_url: str, path: str, headers: dict[str, str], klien: int, durasi: float
+) -> dict[str, float]:
+    latensi: list[float] = []
+    gagal = 0
+    akhir = time.monotonic() + durasi
+    limits = httpx.Limits(max_connections=klien, max_keepalive_connections=klien)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, headers=headers, limits=limits, timeout=60
+    ) as http:
+
+        async def satu_klien() -> None:
+            nonlocal gagal
+            while time.monotonic() < akhir:
+                mulai = time.perf_counter()
+                try:
+                    respons = await http.get(path)
+                    if respons.status_code != 200:
+                        gagal += 1
+                        continue
+                except httpx.HTTPError:
+                    gagal += 1
+                    continue
+                latensi.append(time.perf_counter() - mulai)
+
+        mulai = time.perf_counter()
+        await asyncio.gather(*(satu_klien() for _ in range(klien)))
+        total = time.perf_counter() - mulai
+
+    latensi.sort()
+    persentil = lambda p: latensi[min(len(latensi) - 1, int(len(latensi) * p))] * 1000
+    return {
+        "rps": len(latensi) / total,
+        "p50_ms": persentil(0.5) if latensi else 0.0,
+        "p95_ms": persentil(0.95) if latensi else 0.0,
+        "rata_ms": statistics.fmean(latensi) * 1000 if latensi else 0.0,
+        "gagal": gagal,
+    }
+
+
+async def jalankan(args: argparse.Namespace, base_url: str) -> None:
+    await tunggu_server(base_url)
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        login = await http.post(
+            "/auth/login", json={"email": args.email, "kata_sandi": args.kata_sandi}
+        )
+        login.raise_for_status()
+        token = login.json()["data"]["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        profil = (await http.get("/auth/me", headers=headers)).json()["data"]
+    sekolah_id = profil["sekolah_id"]
+
+    pasangan = [
+        ("/auth/me", headers),
+        (f"/website/public/konten?sekolah_id={sekolah_id}", {}),
+    ]
+    print(f"{args.klien} klien bersamaan, {args.durasi:.0f} detik per endpoint\n")
+    print(f"{'endpoint':<46} {'req/detik':>10} {'p50 ms':>9} {'p95 ms':>9} {'gagal':>6}")
+    for path, hdr in pasangan:
+        for label, url in (("async", path), ("sync", f"/_bench/sync{path}")):
+            hasil = await serbu(base_url, url, hdr, args.klien, args.durasi)
+            nama = f"{label:<5} {path.split('?')[0]}"
+            print(
+                f"{nama:<46} {hasil['rps']:>10.1f} {hasil['p50_ms']:>9.1f}"
+                f" {hasil['p95_ms']:>9.1f} {hasil['gagal']:>6}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--kata-sandi", required=True)
+    parser.add_argument("--klien", type=int, default=500)
+    parser.add_argument("--durasi", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    port = port_bebas()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "scripts.bench_async:app",
+            "--factory",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(args.workers),
+            "--log-level",
+            "warning",
+            "--backlog",
+            str(max(2048, args.klien * 2)),
+        ],
+        cwd=ROOT_DIR,
+    )
+    try:
+        asyncio.run(jalankan(args, f"http://127.0.0.1:{port}"))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+app = buat_app_bench
+
+if __name__ == "__main__":
+    main()
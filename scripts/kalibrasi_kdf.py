@@ -0,0 +1,56 @@
+"""Kalibrasi jumlah putaran PBKDF2 untuk mesin saat ini.
+
+Script menaikkan jumlah putaran sampai satu kali hash mendekati target
+latensi, lalu mencetak nilai ``KDF_ROUNDS`` yang disarankan untuk ``.env``.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app.core.kdf import buat_konteks_kdf
+
+
+def ukur_latensi_ms(rounds: int, ulangan: int) -> float:
+    konteks = buat_konteks_kdf(rounds)
+    durasi = []
+    for _ in range(ulangan):
+        mulai = time.perf_counter()
+        konteks.hash("kalibrasi-kata-sandi")
+        durasi.append((time.perf_counter() - mulai) * 1000)
+    return statistics.median(durasi)
+
+
+def kalibrasi(target_ms: float, ulangan: int, rounds_awal: int) -> int:
+    rounds = rounds_awal
+    latensi = ukur_latensi_ms(rounds, ulangan)
+    print(f"rounds={rounds:>9} latensi={latensi:8.1f} ms")
+    while latensi < target_ms:
+        rounds *= 2
+        latensi = ukur_latensi_ms(rounds, ulangan)
+        print(f"rounds={rounds:>9} latensi={latensi:8.1f} ms")
+    # Biaya PBKDF2 linear terhadap jumlah putaran.
+    return max(1000, int(rounds * target_ms / latensi))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--ulangan", type=int, default=3)
+    parser.add_argument("--rounds-awal", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rounds = kalibrasi(args.target_ms, args.ulangan, args.rounds_awal)
+    latensi = ukur_latensi_ms(rounds, args.ulangan)
+    print(f"\nLatensi dengan {rounds} putaran: {latensi:.1f} ms")
+    print(f"KDF_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Ukur throughput pengiriman Brevo terhadap stub HTTP lokal.
+
+Membandingkan tiga cara kirim: klien baru per email (perilaku lama), klien
+bersama yang di-pool, dan kiriman massal ``messageVersions``. Stub menjawab
+setiap request dengan ``201`` sehingga yang terukur hanya biaya sisi klien
+(serialisasi, koneksi, dan jumlah round-trip).
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+class StubBrevo(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    jumlah_request = 0
+
+    def do_POST(self) -> None:  # noqa: N802
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        StubBrevo.jumlah_request += 1
+        body = json.dumps({"messageId": "<stub@brevo>"}).encode()
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jumlah", type=int, default=500)
+    parser.add_argument("--thread", type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBrevo)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.setdefault("BREVO_API_KEY", "stub")
+    os.environ["BREVO_HOST"] = f"http://127.0.0.1:{server.server_port}/v3"
+
+    from sib_api_v3_sdk import ApiClient, Configuration, SendSmtpEmail, TransactionalEmailsApi
+
+    from app.core.config import settings
+    from app.utils.email import (
+        PesanEmail,
+        TransportBrevo,
+        VersiEmail,
+        kirim_email_massal,
+    )
+
+    pesan = [
+        PesanEmail(
+            tujuan=f"wali{i}@contoh.sch.id",
+            subjek="Pengingat Pembayaran SPP",
+            isi_html=f"<p>Tagihan siswa {i} jatuh tempo.</p>",
+            pengirim_email=settings.email_sender,
+            pengirim_nama=settings.email_sender_name,
+        )
+        for i in range(args.jumlah)
+    ]
+
+    def kirim_klien_baru(item: PesanEmail) -> None:
+        configuration = Configuration()
+        configuration.api_key["api-key"] = settings.brevo_api_key
+        configuration.host = settings.brevo_host
+        TransactionalEmailsApi(ApiClient(configuration)).send_transac_email(
+            SendSmtpEmail(
+                to=[{"email": item.tujuan}],
+                sender={"email": item.pengirim_email, "name": item.pengirim_nama},
+                subject=item.subjek,
+                html_content=item.isi_html,
+            )
+        )
+
+    transport = TransportBrevo(settings.brevo_api_key)
+
+    def ukur(nama: str, fungsi) -> None:
+        StubBrevo.jumlah_request = 0
+        mulai = time.perf_counter()
+        fungsi()
+        durasi = time.perf_counter() - mulai
+        print(
+            f"{nama:<28} {args.jumlah / durasi:9.1f} email/detik"
+            f"  ({StubBrevo.jumlah_request} request, {durasi:.2f} detik)"
+        )
+
+    with ThreadPoolExecutor(max_workers=args.thread) as executor:
+        ukur("klien baru per email", lambda: list(executor.map(kirim_klien_baru, pesan)))
+        ukur("klien bersama (pool)", lambda: list(executor.map(transport.kirim, pesan)))
+    ukur(
+        "kirim massal",
+        lambda: kirim_email_massal(
+            [VersiEmail(tujuan=item.tujuan, params={"siswa": i}) for i, item in enumerate(pesan)],
+            subject="Pengingat Pembayaran SPP",
+            html_content="<p>Tagihan siswa {{ params.siswa }} jatuh tempo.</p>",
+        ),
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()